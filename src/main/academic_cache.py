@@ -0,0 +1,205 @@
+"""
+Academic Hierarchy Cache
+In-process, per-school cache of the track -> department -> class -> subject
+tree. Entries are evicted LRU across schools, invalidated by SQLAlchemy
+events whenever one of the underlying rows changes in this process, and
+expire after a TTL so changes made by other processes show up within it.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from shared.models.unified_models import (
+    db, EducationTrack, Department, Class, Subject, ClassSubject
+)
+
+
+TrackInfo = namedtuple('TrackInfo', 'name is_active')
+DepartmentInfo = namedtuple('DepartmentInfo', 'name track_id is_active')
+ClassInfo = namedtuple('ClassInfo', 'name department_id track_id academic_year is_active')
+SubjectInfo = namedtuple('SubjectInfo', 'name code is_active')
+
+
+class AcademicTree:
+    """Compact, read-only snapshot of one school's academic hierarchy."""
+
+    __slots__ = ('school_id', 'tracks', 'departments', 'classes', 'subjects', 'class_subjects')
+
+    def __init__(self, school_id, tracks, departments, classes, subjects, class_subjects):
+        self.school_id = school_id
+        self.tracks = tracks
+        self.departments = departments
+        self.classes = classes
+        self.subjects = subjects
+        self.class_subjects = class_subjects
+
+    @classmethod
+    def load(cls, school_id):
+        """Load the tree for a school with one column-only query per table."""
+        tracks = {
+            row.id: TrackInfo(row.name, row.is_active)
+            for row in db.session.query(
+                EducationTrack.id, EducationTrack.name, EducationTrack.is_active
+            ).filter(EducationTrack.school_id == school_id)
+        }
+        departments = {
+            row.id: DepartmentInfo(row.name, row.track_id, row.is_active)
+            for row in db.session.query(
+                Department.id, Department.name, Department.track_id, Department.is_active
+            ).filter(Department.school_id == school_id)
+        }
+        classes = {
+            row.id: ClassInfo(row.class_name, row.department_id, row.track_id, row.academic_year, row.is_active)
+            for row in db.session.query(
+                Class.id, Class.class_name, Class.department_id, Class.track_id,
+                Class.academic_year, Class.is_active
+            ).filter(Class.school_id == school_id)
+        }
+        subjects = {
+            row.id: SubjectInfo(row.subject_name, row.subject_code, row.is_active)
+            for row in db.session.query(
+                Subject.id, Subject.subject_name, Subject.subject_code, Subject.is_active
+            ).filter(Subject.school_id == school_id)
+        }
+        class_subjects = {}
+        for row in db.session.query(ClassSubject.class_id, ClassSubject.subject_id).filter(
+            ClassSubject.school_id == school_id,
+            ClassSubject.is_active == True
+        ):
+            class_subjects.setdefault(row.class_id, []).append(row.subject_id)
+        class_subjects = {key: tuple(value) for key, value in class_subjects.items()}
+        return cls(school_id, tracks, departments, classes, subjects, class_subjects)
+
+    def subject_name(self, subject_id):
+        subject = self.subjects.get(subject_id)
+        return subject.name if subject else None
+
+    def class_name(self, class_id):
+        class_info = self.classes.get(class_id)
+        return class_info.name if class_info else None
+
+    def class_path(self, class_id):
+        """Get (track_name, department_name) through the class's department."""
+        class_info = self.classes.get(class_id)
+        department = self.departments.get(class_info.department_id) if class_info else None
+        if not department:
+            return None, None
+        track = self.tracks.get(department.track_id)
+        return (track.name if track else None), department.name
+
+    def subjects_for_class(self, class_id):
+        """Subject ids offered by a class (active assignments only)."""
+        return self.class_subjects.get(class_id, ())
+
+
+class AcademicCache:
+    """LRU cache of AcademicTree snapshots keyed by school_id."""
+
+    def __init__(self, ttl=300, max_schools=256):
+        self.ttl = ttl
+        self.max_schools = max_schools
+        self._trees = OrderedDict()  # school_id -> (AcademicTree, valid until (monotonic))
+        self._generations = {}  # school_id -> invalidation count
+        self._epoch = 0  # bumped when everything is invalidated
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, school_id):
+        """Get the tree for a school, loading it on a miss."""
+        with self._lock:
+            cached = self._trees.get(school_id)
+            if cached is not None:
+                if cached[1] > time.monotonic():
+                    self._trees.move_to_end(school_id)
+                    self.hits += 1
+                    return cached[0]
+                del self._trees[school_id]
+            self.misses += 1
+            generation = (self._epoch, self._generations.get(school_id, 0))
+
+        tree = AcademicTree.load(school_id)
+        with self._lock:
+            # An invalidation during the load may have made this tree stale already
+            if generation == (self._epoch, self._generations.get(school_id, 0)):
+                self._trees[school_id] = (tree, time.monotonic() + self.ttl)
+                self._trees.move_to_end(school_id)
+                while len(self._trees) > self.max_schools:
+                    self._trees.popitem(last=False)
+                    self.evictions += 1
+        return tree
+
+    def peek(self, school_id):
+        """Get the cached tree for a school without loading or counting."""
+        cached = self._trees.get(school_id)
+        return cached[0] if cached is not None else None
+
+    def invalidate(self, school_id=None):
+        """Drop one school's tree, or every tree when school_id is None."""
+        with self._lock:
+            if school_id is None:
+                self._epoch += 1
+                self._trees.clear()
+            else:
+                self._generations[school_id] = self._generations.get(school_id, 0) + 1
+                self._trees.pop(school_id, None)
+            self.invalidations += 1
+
+    def stats(self):
+        """Hit/miss counters for sizing the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'schools': len(self._trees),
+                'max_schools': self.max_schools,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations
+            }
+
+
+academic_cache = AcademicCache()
+
+
+# ============================================================================
+# INVALIDATION
+# ============================================================================
+
+_DIRTY_KEY = 'academic_cache_dirty_schools'
+
+
+def _on_change(mapper, connection, target):
+    """Invalidate on flush, and again after commit or rollback so reloads of
+    uncommitted data do not survive."""
+    academic_cache.invalidate(target.school_id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_DIRTY_KEY, set()).add(target.school_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _on_commit(session):
+    for school_id in session.info.pop(_DIRTY_KEY, ()):
+        academic_cache.invalidate(school_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _on_rollback(session):
+    # Trees reloaded after the flush may hold the rolled-back changes
+    for school_id in session.info.pop(_DIRTY_KEY, ()):
+        academic_cache.invalidate(school_id)
+
+
+for _model in (EducationTrack, Department, Class, Subject, ClassSubject):
+    for _event in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event, _on_change)
+
+
+__all__ = ['AcademicTree', 'AcademicCache', 'academic_cache']
@@ -0,0 +1,435 @@
+"""
+Attendance Registers and Summaries
+Writes a whole class register for one day with a single
+INSERT ... ON CONFLICT statement (PostgreSQL), returning only the rows that
+were inserted or actually changed, and maintains the per-term
+attendance_summaries and attendance_bitmaps tables.
+
+Backfill: flask rebuild-attendance-summaries [--school-id ID]
+          flask rebuild-attendance-bitmaps [--school-id ID]
+"""
+from datetime import datetime
+import uuid
+
+import click
+from flask.cli import with_appcontext
+import numpy as np
+from sqlalchemy import case, func, literal_column, or_, select
+from sqlalchemy.dialects.postgresql import insert
+
+from shared.models.unified_models import (
+    db, Attendance, AttendanceStatus, AttendanceSummary, AttendanceBitmap,
+    ATTENDANCE_COUNT_COLUMNS, School, SchoolCalendar, StudentClasses
+)
+
+
+ATTENDANCE_STATUSES = frozenset(status.value for status in AttendanceStatus)
+CONFLICT_COLUMNS = ('student_id', 'class_id', 'attendance_date', 'school_id')
+
+
+def _as_uuid(value):
+    return value if isinstance(value, uuid.UUID) else uuid.UUID(str(value))
+
+
+def mark_attendance(school_id, class_id, attendance_date, staff_id, statuses,
+                    arrival_times=None, notes=None):
+    """Upsert a class register for one date.
+
+    ``statuses`` maps student_id -> status ('present', 'absent', 'late' or
+    'excused'); ``arrival_times`` and ``notes`` optionally map student_id to an
+    arrival datetime and a note. Students must be actively enrolled in the
+    class. Existing rows are only rewritten when status, arrival time or notes
+    differ, and ``staff_id`` records who made the change. On a correction a
+    student missing from ``arrival_times``/``notes`` keeps the stored value;
+    map them to None to clear it.
+
+    Returns the changed rows as dicts with a 'change' of 'inserted' or
+    'updated'. Raises ValueError for unknown statuses or students not in the
+    class. The caller commits.
+    """
+    arrival_times = {_as_uuid(key): value for key, value in (arrival_times or {}).items()}
+    notes = {_as_uuid(key): value for key, value in (notes or {}).items()}
+    statuses = {_as_uuid(key): value for key, value in statuses.items()}
+    if not statuses:
+        return []
+
+    invalid = sorted(value for value in set(statuses.values()) if value not in ATTENDANCE_STATUSES)
+    if invalid:
+        raise ValueError('Invalid attendance status: %s' % ', '.join(map(str, invalid)))
+
+    enrolled = {
+        row.student_id for row in db.session.query(StudentClasses.student_id).filter(
+            StudentClasses.school_id == school_id,
+            StudentClasses.class_id == class_id,
+            StudentClasses.student_id.in_(list(statuses)),
+            StudentClasses.is_active == True
+        )
+    }
+    missing = set(statuses) - enrolled
+    if missing:
+        raise ValueError('Students not enrolled in this class: %s' % ', '.join(sorted(map(str, missing))))
+
+    now = datetime.utcnow()
+    table = Attendance.__table__
+    # Rows go in student order so concurrent submissions lock in the same order
+    statement = insert(table).values([
+        {
+            'id': uuid.uuid4(),
+            'school_id': school_id,
+            'student_id': student_id,
+            'class_id': class_id,
+            'staff_id': staff_id,
+            'attendance_date': attendance_date,
+            'status': statuses[student_id],
+            'arrival_time': arrival_times.get(student_id),
+            'notes': notes.get(student_id),
+            'created_at': now,
+            'updated_at': now,
+            'is_active': True
+        }
+        for student_id in sorted(statuses)
+    ])
+    excluded = statement.excluded
+
+    def given(column, student_ids):
+        # The submitted value for students the caller passed one for, else the stored one
+        if not student_ids:
+            return table.c[column]
+        if len(student_ids) == len(statuses):
+            return excluded[column]
+        return case((excluded.student_id.in_(list(student_ids)), excluded[column]), else_=table.c[column])
+
+    new_values = {
+        'status': excluded.status,
+        'arrival_time': given('arrival_time', arrival_times.keys() & statuses.keys()),
+        'notes': given('notes', notes.keys() & statuses.keys()),
+        'is_active': True
+    }
+    statement = statement.on_conflict_do_update(
+        index_elements=list(CONFLICT_COLUMNS),
+        set_=dict(new_values, staff_id=excluded.staff_id, updated_at=excluded.updated_at),
+        where=or_(*[
+            table.c[column].is_distinct_from(value)
+            for column, value in new_values.items()
+            if value is not table.c[column]
+        ])
+    ).returning(
+        table.c.id,
+        table.c.student_id,
+        table.c.status,
+        table.c.arrival_time,
+        table.c.notes,
+        table.c.staff_id,
+        # xmax is 0 only for freshly inserted rows
+        literal_column('(xmax = 0)').label('inserted')
+    )
+
+    changed = [
+        {
+            'id': str(row.id),
+            'student_id': str(row.student_id),
+            'status': row.status,
+            'arrival_time': row.arrival_time.isoformat() if row.arrival_time else None,
+            'notes': row.notes,
+            'staff_id': str(row.staff_id),
+            'change': 'inserted' if row.inserted else 'updated'
+        }
+        for row in db.session.execute(statement)
+    ]
+
+    # Core upserts bypass the Attendance model events, so recount the changed students
+    if changed:
+        term_id = db.session.execute(AttendanceSummary.term_select(school_id, attendance_date)).scalar()
+        if term_id:
+            student_ids = [uuid.UUID(row['student_id']) for row in changed]
+            rebuild_attendance_summaries(school_id, class_id=class_id, term_id=term_id, student_ids=student_ids)
+            rebuild_attendance_bitmaps(school_id, class_id=class_id, term_id=term_id, student_ids=student_ids)
+    return changed
+
+
+def _scoped_rows(executor, school_id, class_id, term_id, student_ids):
+    """Subquery of active attendance rows in scope, with the term each date falls in."""
+    attendance = Attendance.__table__
+    calendar = SchoolCalendar.__table__
+    term_expression = AttendanceSummary.term_select(
+        attendance.c.school_id, attendance.c.attendance_date
+    ).correlate(attendance).scalar_subquery()
+
+    rows = select(
+        attendance.c.school_id,
+        attendance.c.student_id,
+        attendance.c.class_id,
+        term_expression.label('term_id'),
+        attendance.c.attendance_date,
+        attendance.c.status
+    ).where(attendance.c.is_active == True)
+    if school_id:
+        rows = rows.where(attendance.c.school_id == school_id)
+    if class_id:
+        rows = rows.where(attendance.c.class_id == class_id)
+    if student_ids is not None:
+        rows = rows.where(attendance.c.student_id.in_(student_ids))
+    if term_id:
+        # Only dates inside the term can resolve to it
+        term = executor.execute(
+            select(calendar.c.term_start_date, calendar.c.term_end_date).where(calendar.c.id == term_id)
+        ).one()
+        rows = rows.where(attendance.c.attendance_date >= term.term_start_date)
+        if term.term_end_date:
+            rows = rows.where(attendance.c.attendance_date <= term.term_end_date)
+    return rows.subquery()
+
+
+def _replace_scope(executor, model, rows, school_id, class_id, term_id, student_ids, batch_size):
+    """Delete a model's rows in scope and insert ``rows`` (dicts) in batches."""
+    table = model.__table__
+    stale = table.delete()
+    if school_id:
+        stale = stale.where(table.c.school_id == school_id)
+    if class_id:
+        stale = stale.where(table.c.class_id == class_id)
+    if term_id:
+        stale = stale.where(table.c.term_id == term_id)
+    if student_ids is not None:
+        stale = stale.where(table.c.student_id.in_(student_ids))
+    executor.execute(stale)
+
+    now = datetime.utcnow()
+    for row in rows:
+        row.update(id=uuid.uuid4(), created_at=now, updated_at=now, is_active=True)
+    for start in range(0, len(rows), batch_size):
+        executor.execute(table.insert(), rows[start:start + batch_size])
+    return len(rows)
+
+
+# ============================================================================
+# SUMMARIES
+# ============================================================================
+
+def rebuild_attendance_summaries(school_id=None, class_id=None, term_id=None, student_ids=None,
+                                 batch_size=1000):
+    """Recount attendance_summaries from attendance rows.
+
+    With no arguments every school is rebuilt (backfill); the filters narrow
+    the rebuild to a school, class, term or set of students. Existing summary
+    rows in scope are replaced. Returns the number of summary rows written.
+    The caller commits.
+    """
+    rows = _scoped_rows(db.session, school_id, class_id, term_id, student_ids)
+    counts = select(
+        rows.c.school_id, rows.c.student_id, rows.c.class_id, rows.c.term_id,
+        *[
+            func.sum(case((rows.c.status == status, 1), else_=0)).label(column)
+            for status, column in ATTENDANCE_COUNT_COLUMNS.items()
+        ]
+    ).where(rows.c.term_id.isnot(None))
+    if term_id:
+        counts = counts.where(rows.c.term_id == term_id)
+    counts = counts.group_by(rows.c.school_id, rows.c.student_id, rows.c.class_id, rows.c.term_id)
+
+    summaries = [dict(row._mapping) for row in db.session.execute(counts)]
+    return _replace_scope(db.session, AttendanceSummary, summaries,
+                          school_id, class_id, term_id, student_ids, batch_size)
+
+
+def term_attendance(school_id, term_id, class_id=None):
+    """Attendance summaries for a school term (optionally one class), as dicts."""
+    query = AttendanceSummary.query_for_school(school_id).filter_by(term_id=term_id)
+    if class_id:
+        query = query.filter_by(class_id=class_id)
+    return [summary.to_dict() for summary in query]
+
+
+# ============================================================================
+# BITMAPS
+# ============================================================================
+
+BITMAP_STATUSES = tuple(ATTENDANCE_COUNT_COLUMNS)
+
+
+def popcount(bits):
+    return bin(bits).count('1')
+
+
+def run_starts(bits, length):
+    """Bits marking days that start a run of ``length`` consecutive set days."""
+    runs = bits
+    for offset in range(1, length):
+        runs &= bits >> offset
+    return runs
+
+
+def _set_days(bits):
+    day = 0
+    while bits:
+        if bits & 1:
+            yield day
+        bits >>= 1
+        day += 1
+
+
+def rebuild_attendance_bitmaps(school_id=None, class_id=None, term_id=None, student_ids=None,
+                               connection=None, batch_size=1000):
+    """Re-encode attendance_bitmaps from attendance rows.
+
+    Scoping matches rebuild_attendance_summaries. ``connection`` lets flush
+    events write through the flushing connection instead of the session.
+    Weekend rows have no school-day bit and are left out. Returns the number
+    of bitmap rows written. The caller commits.
+    """
+    executor = connection if connection is not None else db.session
+    calendar = SchoolCalendar.__table__
+    rows = _scoped_rows(executor, school_id, class_id, term_id, student_ids)
+    query = select(
+        rows.c.school_id, rows.c.student_id, rows.c.class_id, rows.c.term_id,
+        calendar.c.term_start_date, rows.c.attendance_date, rows.c.status
+    ).join(calendar, calendar.c.id == rows.c.term_id)
+    if term_id:
+        query = query.where(rows.c.term_id == term_id)
+    records = executor.execute(query).all()
+
+    bitmaps = {}
+    if records:
+        starts = np.array([record.term_start_date for record in records], dtype='datetime64[D]')
+        dates = np.array([record.attendance_date for record in records], dtype='datetime64[D]')
+        school_days = np.busday_count(starts, dates)
+        weekdays = np.is_busday(dates)
+        for record, day, weekday in zip(records, school_days.tolist(), weekdays.tolist()):
+            if not weekday or record.status not in ATTENDANCE_COUNT_COLUMNS:
+                continue
+            key = (record.school_id, record.student_id, record.class_id, record.term_id)
+            statuses = bitmaps.setdefault(key, dict.fromkeys(BITMAP_STATUSES, 0))
+            statuses[record.status] |= 1 << day
+
+    encoded = [
+        dict(
+            school_id=key[0], student_id=key[1], class_id=key[2], term_id=key[3],
+            **{status + '_bits': AttendanceBitmap.pack(bits) for status, bits in statuses.items()}
+        )
+        for key, statuses in bitmaps.items()
+    ]
+    return _replace_scope(executor, AttendanceBitmap, encoded,
+                          school_id, class_id, term_id, student_ids, batch_size)
+
+
+def refresh_attendance_bitmap(school_id, student_id, class_id, on_date, connection=None):
+    """Re-encode one student's bitmap for the term containing ``on_date``."""
+    executor = connection if connection is not None else db.session
+    term_id = executor.execute(AttendanceSummary.term_select(school_id, on_date)).scalar()
+    if term_id:
+        rebuild_attendance_bitmaps(school_id, class_id=class_id, term_id=term_id,
+                                   student_ids=[student_id], connection=connection)
+
+
+class TermBitmaps:
+    """A school term's attendance bitsets keyed by (student_id, class_id).
+
+    Set operations are plain int AND/OR, so whole-term questions such as
+    "present on both days" or "absent three school days running" cost a few
+    big-int operations per student instead of a scan over daily rows.
+    """
+
+    def __init__(self, term_start, bitmaps):
+        self.term_start = term_start
+        self.bitmaps = bitmaps
+
+    @classmethod
+    def load(cls, school_id, term_id, class_id=None):
+        """Load a term's bitmaps with one indexed read."""
+        term = SchoolCalendar.get_by_id_and_school(term_id, school_id)
+        if not term:
+            raise ValueError('Term not found for this school')
+        query = AttendanceBitmap.query_for_school(school_id).filter_by(term_id=term_id)
+        if class_id:
+            query = query.filter_by(class_id=class_id)
+        bitmaps = {
+            (bitmap.student_id, bitmap.class_id): {status: bitmap.bits(status) for status in BITMAP_STATUSES}
+            for bitmap in query
+        }
+        return cls(term.term_start_date, bitmaps)
+
+    def day_index(self, on_date):
+        return int(np.busday_count(self.term_start, on_date))
+
+    def day_date(self, index):
+        return np.busday_offset(self.term_start, index, roll='forward').astype(object)
+
+    def bits(self, key, *statuses):
+        """OR of a student's bitsets for ``statuses`` (all statuses when omitted)."""
+        student = self.bitmaps.get(key, {})
+        bits = 0
+        for status in statuses or BITMAP_STATUSES:
+            bits |= student.get(status, 0)
+        return bits
+
+    def count(self, key, *statuses):
+        return popcount(self.bits(key, *statuses))
+
+    def days(self, key, *statuses):
+        """Dates on which a student had any of ``statuses``."""
+        return [self.day_date(day) for day in _set_days(self.bits(key, *statuses))]
+
+    def on_day(self, on_date, *statuses):
+        """Keys with any of ``statuses`` on a date."""
+        mask = 1 << self.day_index(on_date)
+        return [key for key in self.bitmaps if self.bits(key, *statuses) & mask]
+
+    def consecutive(self, length=3, statuses=('absent',)):
+        """{key: [first dates]} for runs of ``length`` school days with any of ``statuses``.
+
+        Overlapping runs each report their first day.
+        """
+        found = {}
+        for key in self.bitmaps:
+            starts = run_starts(self.bits(key, *statuses), length)
+            if starts:
+                found[key] = [self.day_date(day) for day in _set_days(starts)]
+        return found
+
+
+@click.command('rebuild-attendance-summaries')
+@click.option('--school-id', default=None, help='Rebuild one school (default: every school).')
+@with_appcontext
+def rebuild_attendance_summaries_command(school_id):
+    """Backfill attendance_summaries from attendance rows, one school per transaction."""
+    if school_id:
+        school_ids = [uuid.UUID(school_id)]
+    else:
+        school_ids = [row.id for row in db.session.query(School.id).order_by(School.id)]
+    total = 0
+    for current in school_ids:
+        written = rebuild_attendance_summaries(current)
+        db.session.commit()
+        total += written
+        click.echo('%s: %d summaries' % (current, written))
+    click.echo('attendance summaries rebuilt: %d rows' % total)
+
+
+@click.command('rebuild-attendance-bitmaps')
+@click.option('--school-id', default=None, help='Rebuild one school (default: every school).')
+@with_appcontext
+def rebuild_attendance_bitmaps_command(school_id):
+    """Backfill attendance_bitmaps from attendance rows, one school per transaction."""
+    if school_id:
+        school_ids = [uuid.UUID(school_id)]
+    else:
+        school_ids = [row.id for row in db.session.query(School.id).order_by(School.id)]
+    total = 0
+    for current in school_ids:
+        written = rebuild_attendance_bitmaps(current)
+        db.session.commit()
+        total += written
+        click.echo('%s: %d bitmaps' % (current, written))
+    click.echo('attendance bitmaps rebuilt: %d rows' % total)
+
+
+def register_commands(app):
+    app.cli.add_command(rebuild_attendance_summaries_command)
+    app.cli.add_command(rebuild_attendance_bitmaps_command)
+
+
+__all__ = [
+    'mark_attendance', 'rebuild_attendance_summaries', 'term_attendance',
+    'rebuild_attendance_bitmaps', 'refresh_attendance_bitmap', 'TermBitmaps',
+    'popcount', 'run_starts', 'register_commands', 'ATTENDANCE_STATUSES', 'BITMAP_STATUSES'
+]
@@ -0,0 +1,136 @@
+"""
+Attendance Bitmap Micro-Benchmark
+Compares per-day attendance rows against per-student term bitsets for memory
+and for two typical queries (days present, absent 3+ school days running) on
+synthetic data, and checks both give the same answers.
+
+Usage: python -m shared.models.attendance_benchmark [students] [school_days]
+"""
+import random
+import sys
+import time
+import tracemalloc
+import uuid
+from collections import namedtuple
+from datetime import date
+
+import numpy as np
+
+from shared.models.attendance import BITMAP_STATUSES, popcount, run_starts
+
+
+AttendanceRow = namedtuple('AttendanceRow', 'student_id attendance_date status')
+
+TERM_START = date(2024, 1, 8)
+STATUS_WEIGHTS = (0.85, 0.08, 0.05, 0.02)
+
+
+def build_rows(students, school_days, seed=7):
+    """Synthetic daily rows, as a row-based query would materialize them."""
+    rng = random.Random(seed)
+    dates = np.busday_offset(TERM_START, np.arange(school_days), roll='forward').astype(object)
+    rows = []
+    for index in range(students):
+        student_id = uuid.UUID(int=index + 1)
+        for day in dates:
+            status = rng.choices(BITMAP_STATUSES, STATUS_WEIGHTS)[0]
+            rows.append(AttendanceRow(student_id, day, status))
+    return rows
+
+
+def build_bitmaps(rows):
+    """Encode rows the way rebuild_attendance_bitmaps does."""
+    bitmaps = {}
+    for row in rows:
+        day = int(np.busday_count(TERM_START, row.attendance_date))
+        statuses = bitmaps.setdefault(row.student_id, dict.fromkeys(BITMAP_STATUSES, 0))
+        statuses[row.status] |= 1 << day
+    return bitmaps
+
+
+def rows_present_counts(rows):
+    counts = {}
+    for row in rows:
+        if row.status == 'present':
+            counts[row.student_id] = counts.get(row.student_id, 0) + 1
+    return counts
+
+
+def rows_absent_runs(rows, length=3):
+    by_student = {}
+    for row in rows:
+        by_student.setdefault(row.student_id, []).append(row)
+    flagged = set()
+    for student_id, student_rows in by_student.items():
+        student_rows.sort(key=lambda row: row.attendance_date)
+        run = 0
+        for row in student_rows:
+            run = run + 1 if row.status == 'absent' else 0
+            if run >= length:
+                flagged.add(student_id)
+                break
+    return flagged
+
+
+def bitmap_present_counts(bitmaps):
+    return {
+        student_id: popcount(statuses['present'])
+        for student_id, statuses in bitmaps.items()
+        if statuses['present']
+    }
+
+
+def bitmap_absent_runs(bitmaps, length=3):
+    return {
+        student_id
+        for student_id, statuses in bitmaps.items()
+        if run_starts(statuses['absent'], length)
+    }
+
+
+def _measure(build):
+    tracemalloc.start()
+    value = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return value, size
+
+
+def _time(fn, data, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn(data)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+
+def main(students=2000, school_days=65):
+    rows, rows_bytes = _measure(lambda: build_rows(students, school_days))
+    bitmaps, bitmap_bytes = _measure(lambda: build_bitmaps(rows))
+    stored_bytes = sum(
+        (bits.bit_length() + 7) // 8
+        for statuses in bitmaps.values() for bits in statuses.values()
+    )
+
+    present_rows, present_rows_seconds = _time(rows_present_counts, rows)
+    present_bits, present_bits_seconds = _time(bitmap_present_counts, bitmaps)
+    runs_rows, runs_rows_seconds = _time(rows_absent_runs, rows)
+    runs_bits, runs_bits_seconds = _time(bitmap_absent_runs, bitmaps)
+    mismatches = int(present_rows != present_bits) + int(runs_rows != runs_bits)
+
+    print('students:         %d x %d school days (%d rows)' % (students, school_days, len(rows)))
+    print('mismatches:       %d' % mismatches)
+    print('memory rows:      %.1f MB' % (rows_bytes / 1e6))
+    print('memory bitmaps:   %.1f MB (%.1f KB of stored bitsets)' % (bitmap_bytes / 1e6, stored_bytes / 1e3))
+    print('present rows:     %.4fs' % present_rows_seconds)
+    print('present bitmaps:  %.4fs (%.1fx)' % (present_bits_seconds, present_rows_seconds / present_bits_seconds))
+    print('3+ absent rows:   %.4fs (%d students)' % (runs_rows_seconds, len(runs_rows)))
+    print('3+ absent bitmaps:%.4fs (%.1fx)' % (runs_bits_seconds, runs_rows_seconds / runs_bits_seconds))
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    arguments = [int(value) for value in sys.argv[1:3]]
+    sys.exit(main(*arguments))
@@ -0,0 +1,255 @@
+"""
+Term Billing
+Generates a school's term invoices set-wise: fees are indexed by grade level
+once, every enrolled student's class is resolved in one query, and invoices
+and items are written with a few bulk INSERT statements in the caller's
+transaction.
+"""
+from collections import namedtuple
+from datetime import date, datetime
+import hashlib
+import uuid
+
+from sqlalchemy import BigInteger, func, literal, or_, select
+
+from shared.models.unified_models import (
+    db, FeeStructure, Invoice, InvoiceItem, InvoiceStatus, ParentStudent, StudentClasses, Class,
+    FinancialSummary, ReceivableAging, apply_financial_deltas, apply_aging_deltas
+)
+from shared.models.invoice_numbers import invoice_number_allocator
+
+
+ALL_GRADES = '*'
+
+FeeLine = namedtuple('FeeLine', 'id name amount due_date once_per_year')
+
+
+def build_fee_index(school_id, academic_year, term, include_optional=False):
+    """Map grade level -> applicable fees for a term.
+
+    Fees for the term and year-wide fees (no term) both apply. Year-wide
+    fees that are not recurring are marked ``once_per_year``: bill_term
+    charges them only to students not already invoiced for them that year.
+    Fees with an empty grade_levels list apply to every grade and are
+    indexed under ALL_GRADES. Optional fees are left out unless
+    ``include_optional``.
+    """
+    query = FeeStructure.query_for_school(school_id).filter(
+        FeeStructure.academic_year == academic_year,
+        or_(FeeStructure.term == term, FeeStructure.term.is_(None))
+    )
+    if not include_optional:
+        query = query.filter(FeeStructure.is_mandatory == True)
+
+    index = {}
+    for fee in query.order_by(FeeStructure.fee_type, FeeStructure.fee_name):
+        line = FeeLine(fee.id, fee.fee_name, fee.amount, fee.due_date, fee.term is None and fee.is_recurring is False)
+        for grade in fee.grade_levels or [ALL_GRADES]:
+            index.setdefault(str(grade), []).append(line)
+    return index
+
+
+def _enrollments(school_id, academic_year):
+    """student_id -> grade key, from each student's latest active class enrollment."""
+    rows = db.session.query(
+        StudentClasses.student_id, Class.grade_level, Class.class_name
+    ).join(
+        Class, Class.id == StudentClasses.class_id
+    ).filter(
+        StudentClasses.school_id == school_id,
+        StudentClasses.academic_year == academic_year,
+        StudentClasses.is_active == True
+    ).order_by(StudentClasses.created_at.desc())
+
+    grades = {}
+    for row in rows:
+        # Classes without a grade_level are matched by name
+        grades.setdefault(row.student_id, row.grade_level or row.class_name)
+    return grades
+
+
+def _billing_parents(school_id):
+    """student_id -> parent_id, using each student's earliest active relationship."""
+    parents = {}
+    for row in db.session.query(ParentStudent.student_id, ParentStudent.parent_id).filter(
+        ParentStudent.school_id == school_id,
+        ParentStudent.is_active == True
+    ).order_by(ParentStudent.created_at):
+        parents.setdefault(row.student_id, row.parent_id)
+    return parents
+
+
+def _lock_term(school_id, academic_year, term):
+    """Serialize billing runs for one school term until the caller's transaction ends.
+
+    Takes a transaction-scoped PostgreSQL advisory lock keyed by the term, so
+    a concurrent run waits and then sees this run's invoices as already
+    billed. Other schools and terms are not blocked.
+    """
+    if db.session.get_bind().dialect.name != 'postgresql':
+        return
+    digest = hashlib.blake2b(
+        ('bill_term:%s:%s:%s' % (school_id, academic_year, term)).encode('utf-8'), digest_size=8
+    ).digest()
+    key = int.from_bytes(digest, 'big', signed=True)
+    db.session.execute(select(func.pg_advisory_xact_lock(literal(key, BigInteger))))
+
+
+def _already_billed(school_id, academic_year, term):
+    return {
+        row.student_id for row in db.session.query(Invoice.student_id).filter(
+            Invoice.school_id == school_id,
+            Invoice.academic_year == academic_year,
+            Invoice.term == term,
+            Invoice.status != InvoiceStatus.CANCELLED.value
+        )
+    }
+
+
+def _billed_once_fees(school_id, academic_year, fee_index):
+    """(student_id, fee_id) pairs of once-per-year fees already on a non-cancelled invoice this year."""
+    fee_ids = {fee.id for fees in fee_index.values() for fee in fees if fee.once_per_year}
+    if not fee_ids:
+        return set()
+    return {
+        (row.student_id, row.fee_structure_id) for row in db.session.query(
+            Invoice.student_id, InvoiceItem.fee_structure_id
+        ).join(
+            Invoice, Invoice.id == InvoiceItem.invoice_id
+        ).filter(
+            InvoiceItem.school_id == school_id,
+            InvoiceItem.fee_structure_id.in_(fee_ids),
+            InvoiceItem.is_active == True,
+            Invoice.academic_year == academic_year,
+            Invoice.status != InvoiceStatus.CANCELLED.value
+        )
+    }
+
+
+def bill_term(school_id, academic_year, term, due_date=None, issue_date=None, dry_run=False,
+              include_optional=False, status=InvoiceStatus.DRAFT.value, invoice_numbers=None,
+              batch_size=1000):
+    """Create one invoice (with an item per fee) for every enrolled student of a term.
+
+    Students already holding a non-cancelled invoice for the term, students
+    with no applicable fees and students with no linked parent are skipped
+    and counted. Recurring fees without a term are charged every term;
+    non-recurring ones only once per student and academic year (a cancelled
+    invoice does not count). ``due_date`` defaults to the earliest fee due
+    date of each invoice. ``invoice_numbers(school_id, count)`` supplies the
+    numbers (default: the shared per-school block allocator).
+
+    With ``dry_run`` nothing is written and only the totals are returned.
+    Otherwise invoices and items are bulk inserted; the caller commits, so
+    the whole run is one transaction. Concurrent runs for the same term wait
+    for that transaction, so a student is never billed twice.
+    """
+    if not dry_run:
+        _lock_term(school_id, academic_year, term)
+    fee_index = build_fee_index(school_id, academic_year, term, include_optional)
+    grades = _enrollments(school_id, academic_year)
+    parents = _billing_parents(school_id)
+    billed = _already_billed(school_id, academic_year, term)
+    billed_once = _billed_once_fees(school_id, academic_year, fee_index)
+    issue_date = issue_date or date.today()
+    invoice_numbers = invoice_numbers or invoice_number_allocator
+
+    summary = {
+        'students': len(grades),
+        'invoices': 0,
+        'items': 0,
+        'total_amount': 0,
+        'by_grade': {},
+        'skipped': {'already_billed': 0, 'no_fees': 0, 'no_parent': 0, 'no_due_date': 0},
+        'dry_run': dry_run
+    }
+
+    planned = []
+    for student_id, grade in grades.items():
+        if student_id in billed:
+            summary['skipped']['already_billed'] += 1
+            continue
+        fees = [
+            fee for fee in fee_index.get(str(grade), []) + fee_index.get(ALL_GRADES, [])
+            if not (fee.once_per_year and (student_id, fee.id) in billed_once)
+        ]
+        if not fees:
+            summary['skipped']['no_fees'] += 1
+            continue
+        parent_id = parents.get(student_id)
+        if parent_id is None:
+            summary['skipped']['no_parent'] += 1
+            continue
+        invoice_due = due_date or min((fee.due_date for fee in fees if fee.due_date), default=None)
+        if invoice_due is None:
+            summary['skipped']['no_due_date'] += 1
+            continue
+
+        total = sum(fee.amount for fee in fees)
+        planned.append((student_id, parent_id, invoice_due, total, fees))
+        summary['invoices'] += 1
+        summary['items'] += len(fees)
+        summary['total_amount'] += total
+        grade_totals = summary['by_grade'].setdefault(str(grade), {'invoices': 0, 'total_amount': 0})
+        grade_totals['invoices'] += 1
+        grade_totals['total_amount'] += total
+
+    if dry_run or not planned:
+        return summary
+
+    now = datetime.utcnow()
+    numbers = invoice_numbers(school_id, len(planned))
+    invoices = []
+    items = []
+    for number, (student_id, parent_id, invoice_due, total, fees) in zip(numbers, planned):
+        invoice_id = uuid.uuid4()
+        invoices.append({
+            'id': invoice_id,
+            'school_id': school_id,
+            'student_id': student_id,
+            'parent_id': parent_id,
+            'invoice_number': number,
+            'total_amount': total,
+            'amount_paid': 0,
+            'balance_due': total,
+            'issue_date': issue_date,
+            'due_date': invoice_due,
+            'status': status,
+            'term': term,
+            'academic_year': academic_year,
+            'created_at': now,
+            'updated_at': now,
+            'is_active': True
+        })
+        for fee in fees:
+            items.append({
+                'id': uuid.uuid4(),
+                'school_id': school_id,
+                'invoice_id': invoice_id,
+                'fee_structure_id': fee.id,
+                'description': fee.name,
+                'quantity': 1,
+                'unit_amount': fee.amount,
+                'total_amount': fee.amount,
+                'created_at': now,
+                'updated_at': now,
+                'is_active': True
+            })
+
+    for table, rows in ((Invoice.__table__, invoices), (InvoiceItem.__table__, items)):
+        for start in range(0, len(rows), batch_size):
+            db.session.execute(table.insert(), rows[start:start + batch_size])
+    # Core inserts bypass the Invoice model events, so the term summary and
+    # receivable aging are bumped once here
+    apply_financial_deltas(db.session, school_id, [
+        (academic_year, term, FinancialSummary.invoice_contribution(status, total, 0, total), 1)
+        for _, _, _, total, _ in planned
+    ])
+    apply_aging_deltas(db.session, school_id, [
+        (invoice_due, ReceivableAging.invoice_contribution(status, total), 1)
+        for _, _, invoice_due, total, _ in planned
+    ])
+    return summary
+
+
+__all__ = ['bill_term', 'build_fee_index', 'ALL_GRADES']
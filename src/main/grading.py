@@ -0,0 +1,153 @@
+"""
+Results Engine
+Computes subject totals, grades, tie-aware subject positions and overall class
+positions for a whole class (or school) term in one vectorized pass, then
+writes them back with one batched UPDATE per table.
+"""
+import numpy as np
+from sqlalchemy import case, literal
+
+from shared.models.unified_models import (
+    db, Assessment, SubjectScore, ClassSubject, GradingScheme
+)
+
+
+def grade_labels(totals, boundaries):
+    """Map an array of totals to grade labels using scheme boundaries."""
+    ordered = sorted(boundaries, key=lambda boundary: boundary['min_score'])
+    minimums = np.array([boundary['min_score'] for boundary in ordered], dtype=float)
+    labels = np.array([boundary['grade'] for boundary in ordered], dtype=object)
+    index = np.searchsorted(minimums, totals, side='right') - 1
+    # Totals below the lowest boundary take the lowest grade
+    return labels[np.clip(index, 0, len(labels) - 1)]
+
+
+def grade_case(total, boundaries):
+    """SQL CASE grading a total expression with scheme boundaries, as grade_for_total does."""
+    ordered = sorted(boundaries, key=lambda boundary: boundary['min_score'], reverse=True)
+    if len(ordered) == 1:
+        return literal(ordered[0]['grade'])
+    return case(
+        *[(total >= boundary['min_score'], boundary['grade']) for boundary in ordered[:-1]],
+        else_=ordered[-1]['grade']
+    )
+
+
+def competition_rank(groups, values):
+    """Rank values descending within each group; ties share a rank (1, 2, 2, 4).
+
+    ``groups`` are integer group codes aligned with ``values``.
+    """
+    count = len(values)
+    if not count:
+        return np.zeros(0, dtype=np.int64)
+    order = np.lexsort((-values, groups))
+    sorted_groups = groups[order]
+    sorted_values = values[order]
+    positions = np.arange(count)
+
+    new_group = np.ones(count, dtype=bool)
+    new_group[1:] = sorted_groups[1:] != sorted_groups[:-1]
+    new_run = new_group.copy()
+    new_run[1:] |= sorted_values[1:] != sorted_values[:-1]
+
+    group_start = np.maximum.accumulate(np.where(new_group, positions, 0))
+    run_start = np.maximum.accumulate(np.where(new_run, positions, 0))
+
+    ranks = np.empty(count, dtype=np.int64)
+    ranks[order] = run_start - group_start + 1
+    return ranks
+
+
+def _codes(values):
+    """Integer codes for arbitrary hashable values (e.g. UUIDs)."""
+    lookup = {}
+    return np.fromiter((lookup.setdefault(value, len(lookup)) for value in values),
+                       dtype=np.int64, count=len(values))
+
+
+def compute_results(school_id, session, term, class_id=None, boundaries=None):
+    """Grade and rank every subject score for a school term (optionally one class).
+
+    Scores are read in one query. Totals, grades, subject positions (per class
+    subject) and overall class positions (by average, per class) are computed
+    with NumPy, then written back with one batched UPDATE for subject_scores
+    and one for assessments. The caller commits.
+    """
+    if boundaries is None:
+        boundaries = GradingScheme.boundaries_for_school(school_id)
+
+    query = db.session.query(
+        SubjectScore.id,
+        SubjectScore.assessment_id,
+        SubjectScore.class_subject_id,
+        ClassSubject.class_id,
+        SubjectScore.first_ca,
+        SubjectScore.second_ca,
+        SubjectScore.exam
+    ).join(
+        Assessment, Assessment.id == SubjectScore.assessment_id
+    ).join(
+        ClassSubject, ClassSubject.id == SubjectScore.class_subject_id
+    ).filter(
+        Assessment.school_id == school_id,
+        Assessment.session == session,
+        Assessment.term == term,
+        Assessment.is_active == True,
+        SubjectScore.is_active == True
+    )
+    if class_id:
+        query = query.filter(ClassSubject.class_id == class_id)
+    rows = query.all()
+    if not rows:
+        return {'scores': 0, 'students': 0, 'classes': 0}
+
+    score_ids, assessment_ids, class_subject_ids, class_ids, first_ca, second_ca, exam = zip(*rows)
+
+    # Missing components count as zero; round so float noise cannot split ties
+    components = np.array([first_ca, second_ca, exam], dtype=float)
+    totals = np.round(np.nan_to_num(components).sum(axis=0), 2)
+    grades = grade_labels(totals, boundaries)
+    subject_positions = competition_rank(_codes(class_subject_ids), totals)
+
+    # Overall results per assessment (one assessment per student per term)
+    assessment_codes = _codes(assessment_ids)
+    student_count = int(assessment_codes.max()) + 1
+    student_totals = np.round(np.bincount(assessment_codes, weights=totals, minlength=student_count), 2)
+    subject_counts = np.bincount(assessment_codes, minlength=student_count)
+    student_averages = np.round(student_totals / subject_counts, 2)
+
+    # Each assessment's class, taken from its first score row
+    first_row = np.full(student_count, len(rows), dtype=np.int64)
+    np.minimum.at(first_row, assessment_codes, np.arange(len(rows)))
+    class_codes = _codes(class_ids)[first_row]
+    class_positions = competition_rank(class_codes, student_averages)
+
+    db.session.bulk_update_mappings(SubjectScore, [
+        {
+            'id': score_ids[i],
+            'total_score': float(totals[i]),
+            'grade': grades[i],
+            'position': int(subject_positions[i])
+        }
+        for i in range(len(rows))
+    ])
+
+    db.session.bulk_update_mappings(Assessment, [
+        {
+            'id': assessment_ids[first_row[code]],
+            'total_score': float(student_totals[code]),
+            'average_score': float(student_averages[code]),
+            'class_position': int(class_positions[code])
+        }
+        for code in range(student_count)
+    ])
+
+    return {
+        'scores': len(rows),
+        'students': student_count,
+        'classes': int(class_codes.max()) + 1
+    }
+
+
+__all__ = ['grade_labels', 'grade_case', 'competition_rank', 'compute_results']
@@ -0,0 +1,127 @@
+"""
+Invoice Number Allocation
+Hands out globally unique invoice numbers ("<prefix>-<n>") from per-school
+blocks. A block is reserved by bumping the school's counter in its own short
+transaction, then served from memory, so billing runs for different schools
+never wait on each other and a long billing transaction holds no counter lock.
+Numbers left in a block when a process exits are simply skipped (gaps are
+allowed; reuse is not).
+"""
+from datetime import datetime
+import threading
+import uuid
+
+from sqlalchemy.dialects.postgresql import insert
+
+from shared.models.unified_models import db, School, InvoiceNumberSequence
+
+
+def candidate_prefixes(school):
+    """Prefixes to try for a school, in order: 'INV-<SLUG>' for short slugs,
+    then ever longer id-derived ones (up to 26 hex digits, the column width)."""
+    slug = (school.slug or '').upper()
+    if slug and len(slug) <= 24:
+        yield 'INV-%s' % slug
+    for length in (8, 12, 16, 26):
+        yield 'INV-%s' % school.id.hex[:length].upper()
+
+
+def default_prefix(school):
+    """The preferred prefix for a school; taken prefixes fall through to the next candidate."""
+    return next(candidate_prefixes(school))
+
+
+class InvoiceNumberAllocator:
+    """In-process cache of reserved invoice number blocks, keyed by school."""
+
+    def __init__(self, block_size=500, width=6):
+        self.block_size = block_size
+        self.width = width
+        self._blocks = {}  # school_id -> [prefix, next, end)
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+        self.reservations = 0
+
+    def _lock_for(self, school_id):
+        with self._locks_lock:
+            return self._locks.setdefault(school_id, threading.Lock())
+
+    def _reserve(self, school_id, size):
+        """Advance the school's counter by ``size`` in a separate transaction.
+
+        Returns (prefix, first number). The row lock lasts only for this
+        statement's transaction; other schools touch other rows.
+        """
+        table = InvoiceNumberSequence.__table__
+        bump = table.update().where(table.c.school_id == school_id).values(
+            next_value=table.c.next_value + size,
+            updated_at=datetime.utcnow()
+        ).returning(table.c.prefix, table.c.next_value)
+
+        with db.engine.begin() as connection:
+            row = connection.execute(bump).first()
+            if row is None:
+                school = connection.execute(
+                    School.__table__.select().where(School.__table__.c.id == school_id)
+                ).first()
+                if school is None:
+                    raise ValueError('School not found')
+                now = datetime.utcnow()
+                for prefix in candidate_prefixes(school):
+                    # No conflict target: skips both a concurrent insert for this
+                    # school and a prefix another school already holds
+                    connection.execute(insert(table).values(
+                        id=uuid.uuid4(),
+                        school_id=school_id,
+                        prefix=prefix,
+                        next_value=1,
+                        created_at=now,
+                        updated_at=now,
+                        is_active=True
+                    ).on_conflict_do_nothing())
+                    row = connection.execute(bump).first()
+                    if row is not None:
+                        break
+                else:
+                    raise ValueError('No free invoice number prefix for school %s' % school_id)
+        self.reservations += 1
+        return row.prefix, row.next_value - size
+
+    def allocate(self, school_id, count=1):
+        """Return ``count`` new invoice numbers for a school."""
+        numbers = []
+        with self._lock_for(school_id):
+            while len(numbers) < count:
+                block = self._blocks.get(school_id)
+                if block is None or block[1] >= block[2]:
+                    size = max(self.block_size, count - len(numbers))
+                    prefix, first = self._reserve(school_id, size)
+                    block = self._blocks[school_id] = [prefix, first, first + size]
+                prefix, start, end = block
+                take = min(end - start, count - len(numbers))
+                numbers.extend('%s-%0*d' % (prefix, self.width, value) for value in range(start, start + take))
+                block[1] = start + take
+        return numbers
+
+    def __call__(self, school_id, count=1):
+        return self.allocate(school_id, count)
+
+    def discard(self, school_id=None):
+        """Forget cached blocks (their unused numbers become gaps)."""
+        if school_id is None:
+            self._blocks.clear()
+        else:
+            self._blocks.pop(school_id, None)
+
+    def stats(self):
+        return {
+            'schools': len(self._blocks),
+            'reservations': self.reservations,
+            'remaining': {str(school_id): end - start for school_id, (_, start, end) in self._blocks.items()}
+        }
+
+
+invoice_number_allocator = InvoiceNumberAllocator()
+
+
+__all__ = ['InvoiceNumberAllocator', 'invoice_number_allocator', 'default_prefix', 'candidate_prefixes']
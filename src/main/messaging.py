@@ -0,0 +1,722 @@
+"""
+Messaging
+Fan-out-on-write delivery of announcements. Sending creates the thread, the
+message and a MessageDelivery job in the request's transaction and returns
+at once; after commit a background worker resolves the audience and
+bulk-inserts MessageRecipient rows in chunks, committing progress as it
+goes, then bumps the thread's message_count/last_message_at in the same
+transaction that marks the job completed.
+
+Every send also maintains the inbox index: one ThreadParticipant row per
+(user, thread) carrying the thread's last_message_at and the user's unread
+count, and one InboxCounter per user. Header badges read the counter through
+an in-process cache, so a cached badge costs no query.
+
+Deliveries left queued or failed, or running without progress for
+STALE_DELIVERY_MINUTES (orphaned by a crash or restart), are picked up by:
+flask deliver-messages [--school-id ID] [--stale-minutes N]
+Backfill or repair the inbox index with:
+flask rebuild-inbox-index [--school-id ID]
+"""
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+import logging
+import threading
+import time
+import uuid
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import and_, case, event, func, or_, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from shared.models.unified_models import (
+    db, DeliveryStatus, InboxCounter, Message, MessageDelivery, MessageRecipient, MessageThread,
+    Parent, Staff, ThreadParticipant, UserSchoolRole
+)
+
+
+logger = logging.getLogger(__name__)
+
+AUDIENCES = ('parents', 'staff', 'all')
+RETRYABLE_STATUSES = (DeliveryStatus.QUEUED.value, DeliveryStatus.FAILED.value)
+# A running job commits progress after every chunk; one silent this long lost its worker
+STALE_DELIVERY_MINUTES = 10
+
+
+def audience_query(school_id, audience):
+    """Select distinct recipient user ids for an audience, in id order."""
+    if audience == 'parents':
+        source = Parent
+    elif audience == 'staff':
+        source = Staff
+    elif audience == 'all':
+        source = UserSchoolRole
+    else:
+        raise ValueError('Unknown audience: %s' % audience)
+    return select(source.user_id).where(
+        source.school_id == school_id,
+        source.is_active == True
+    ).distinct().order_by(source.user_id)
+
+
+def send_announcement(school_id, sender_id, subject, content, audience='parents',
+                      priority='normal', attachments=None):
+    """Create an announcement and queue its delivery; returns the MessageDelivery.
+
+    Nothing is fanned out here. The caller commits; the delivery is handed
+    to the background worker only once that commit succeeds.
+    """
+    if audience not in AUDIENCES:
+        raise ValueError('Unknown audience: %s' % audience)
+    now = datetime.utcnow()
+    thread = MessageThread(
+        school_id=school_id,
+        subject=subject,
+        thread_type='announcement',
+        participants=[str(sender_id)],
+        message_count=0
+    )
+    db.session.add(thread)
+    db.session.flush()
+    message = Message(
+        school_id=school_id,
+        thread_id=thread.id,
+        sender_id=sender_id,
+        content=content,
+        message_type='announcement',
+        attachments=attachments or [],
+        priority=priority,
+        sent_at=now
+    )
+    db.session.add(message)
+    db.session.flush()
+    delivery = MessageDelivery(
+        school_id=school_id,
+        thread_id=thread.id,
+        message_id=message.id,
+        audience=audience,
+        status=DeliveryStatus.QUEUED.value
+    )
+    db.session.add(delivery)
+    db.session.flush()
+    # The sender sees the thread in their inbox straight away
+    index_message(db.session, school_id, thread.id, now, [sender_id], unread=False)
+    db.session.info.setdefault(_QUEUED_KEY, []).append(delivery.id)
+    return delivery
+
+
+def start_thread(school_id, sender_id, subject, participant_ids, content, thread_type='individual', **options):
+    """Create a thread between the sender and ``participant_ids`` with a first message.
+
+    Returns (thread, message); the caller commits.
+    """
+    members = list(dict.fromkeys([str(sender_id)] + [str(user_id) for user_id in participant_ids]))
+    thread = MessageThread(
+        school_id=school_id,
+        subject=subject,
+        thread_type=thread_type,
+        participants=members,
+        message_count=0
+    )
+    db.session.add(thread)
+    db.session.flush()
+    return thread, send_message(school_id, thread.id, sender_id, content, **options)
+
+
+def send_message(school_id, thread_id, sender_id, content, message_type='text', priority='normal',
+                 attachments=None):
+    """Post a message to a thread's participants synchronously; the caller commits.
+
+    Recipient rows, the inbox index and the thread counters are written with
+    a handful of statements regardless of the number of participants. Use
+    send_announcement for school-wide audiences.
+    """
+    thread = MessageThread.get_by_id_and_school(thread_id, school_id)
+    if thread is None:
+        raise ValueError('Thread not found')
+    now = datetime.utcnow()
+    message = Message(
+        school_id=school_id,
+        thread_id=thread.id,
+        sender_id=sender_id,
+        content=content,
+        message_type=message_type,
+        attachments=attachments or [],
+        priority=priority,
+        sent_at=now
+    )
+    db.session.add(message)
+    db.session.flush()
+
+    recipient_ids = sorted(
+        {uuid.UUID(str(user_id)) for user_id in thread.participants or []} - {uuid.UUID(str(sender_id))}
+    )
+    if recipient_ids:
+        db.session.execute(MessageRecipient.__table__.insert(), [
+            {
+                'id': uuid.uuid4(),
+                'school_id': school_id,
+                'message_id': message.id,
+                'recipient_id': user_id,
+                'is_read': False,
+                'created_at': now,
+                'updated_at': now,
+                'is_active': True
+            }
+            for user_id in recipient_ids
+        ])
+        index_message(db.session, school_id, thread.id, now, recipient_ids)
+    index_message(db.session, school_id, thread.id, now, [sender_id], unread=False)
+
+    threads = MessageThread.__table__
+    db.session.execute(threads.update().where(threads.c.id == thread.id).values(
+        message_count=threads.c.message_count + 1,
+        last_message_at=now,
+        updated_at=now
+    ))
+    db.session.expire(thread, ['message_count', 'last_message_at'])
+    return message
+
+
+def _claimable(table, now, stale_minutes):
+    """Queued or failed jobs, and running ones with no progress for ``stale_minutes``."""
+    return or_(
+        table.c.status.in_(RETRYABLE_STATUSES),
+        and_(
+            table.c.status == DeliveryStatus.RUNNING.value,
+            table.c.updated_at < now - timedelta(minutes=stale_minutes)
+        )
+    )
+
+
+def deliver(delivery_id, chunk_size=1000, stale_minutes=STALE_DELIVERY_MINUTES):
+    """Run one delivery job to completion in the current app context.
+
+    The job is claimed with a conditional UPDATE, so two workers never run
+    the same delivery; a RUNNING job whose worker died (no progress for
+    ``stale_minutes``) is claimable again. Recipient rows are inserted with
+    ON CONFLICT DO NOTHING and each chunk is committed with its progress,
+    which makes an interrupted job safe to run again. Returns the final
+    MessageDelivery, or None when the job was not claimable.
+    """
+    table = MessageDelivery.__table__
+    now = datetime.utcnow()
+    claimed = db.session.execute(
+        table.update().where(
+            table.c.id == delivery_id,
+            _claimable(table, now, stale_minutes)
+        ).values(
+            status=DeliveryStatus.RUNNING.value,
+            attempts=table.c.attempts + 1,
+            started_at=now,
+            error=None,
+            updated_at=now
+        ).returning(table.c.school_id, table.c.thread_id, table.c.message_id, table.c.audience)
+    ).first()
+    db.session.commit()
+    if claimed is None:
+        return None
+
+    try:
+        _fan_out(delivery_id, claimed, chunk_size)
+    except Exception as exc:
+        db.session.rollback()
+        logger.exception('Message delivery %s failed', delivery_id)
+        db.session.execute(table.update().where(table.c.id == delivery_id).values(
+            status=DeliveryStatus.FAILED.value,
+            error=str(exc)[:2000],
+            updated_at=datetime.utcnow()
+        ))
+        db.session.commit()
+    return db.session.get(MessageDelivery, delivery_id, populate_existing=True)
+
+
+def _fan_out(delivery_id, job, chunk_size):
+    deliveries = MessageDelivery.__table__
+    recipients = MessageRecipient.__table__
+    threads = MessageThread.__table__
+    sender_id, sent_at = db.session.execute(
+        select(Message.sender_id, Message.sent_at).where(Message.id == job.message_id)
+    ).one()
+
+    user_ids = [
+        user_id for user_id in db.session.execute(audience_query(job.school_id, job.audience)).scalars()
+        if user_id != sender_id
+    ]
+    db.session.execute(deliveries.update().where(deliveries.c.id == delivery_id).values(
+        total_recipients=len(user_ids),
+        delivered_count=0
+    ))
+    db.session.commit()
+
+    for start in range(0, len(user_ids), chunk_size):
+        now = datetime.utcnow()
+        chunk = user_ids[start:start + chunk_size]
+        # Only rows inserted now are counted as unread, so a re-run never double counts
+        inserted = db.session.execute(
+            insert(recipients).values([
+                {
+                    'id': uuid.uuid4(),
+                    'school_id': job.school_id,
+                    'message_id': job.message_id,
+                    'recipient_id': user_id,
+                    'is_read': False,
+                    'created_at': now,
+                    'updated_at': now,
+                    'is_active': True
+                }
+                for user_id in chunk
+            ]).on_conflict_do_nothing(
+                index_elements=['message_id', 'recipient_id', 'school_id']
+            ).returning(recipients.c.recipient_id)
+        ).scalars().all()
+        index_message(db.session, job.school_id, job.thread_id, sent_at, inserted)
+        db.session.execute(deliveries.update().where(deliveries.c.id == delivery_id).values(
+            delivered_count=start + len(chunk),
+            updated_at=now
+        ))
+        db.session.commit()
+
+    # Counters and completion commit together, so a retry never double counts
+    now = datetime.utcnow()
+    db.session.execute(threads.update().where(threads.c.id == job.thread_id).values(
+        message_count=threads.c.message_count + 1,
+        last_message_at=case(
+            (threads.c.last_message_at.is_(None), sent_at),
+            (threads.c.last_message_at < sent_at, sent_at),
+            else_=threads.c.last_message_at
+        ),
+        updated_at=now
+    ))
+    db.session.execute(deliveries.update().where(deliveries.c.id == delivery_id).values(
+        status=DeliveryStatus.COMPLETED.value,
+        completed_at=now,
+        updated_at=now
+    ))
+    db.session.commit()
+
+
+# ============================================================================
+# INBOX INDEX
+# ============================================================================
+
+def index_message(executor, school_id, thread_id, sent_at, user_ids, unread=True):
+    """Record a message in the inbox index of ``user_ids``.
+
+    Upserts each user's ThreadParticipant row (moving the thread to
+    ``sent_at`` and, with ``unread``, adding one unread message) and bumps
+    their InboxCounter. Two statements per call; the caller commits.
+    """
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+    now = datetime.utcnow()
+    participants = ThreadParticipant.__table__
+    statement = insert(participants).values([
+        {
+            'id': uuid.uuid4(),
+            'school_id': school_id,
+            'thread_id': thread_id,
+            'user_id': user_id,
+            'last_message_at': sent_at,
+            'unread_count': 1 if unread else 0,
+            'created_at': now,
+            'updated_at': now,
+            'is_active': True
+        }
+        for user_id in user_ids
+    ])
+    executor.execute(statement.on_conflict_do_update(
+        index_elements=['school_id', 'user_id', 'thread_id'],
+        set_={
+            'unread_count': participants.c.unread_count + statement.excluded.unread_count,
+            'last_message_at': case(
+                (participants.c.last_message_at < statement.excluded.last_message_at,
+                 statement.excluded.last_message_at),
+                else_=participants.c.last_message_at
+            ),
+            'updated_at': now
+        }
+    ))
+    if unread:
+        _add_unread(executor, school_id, [(user_id, 1) for user_id in user_ids], now)
+    _counters_changed(school_id, user_ids)
+
+
+def _add_unread(executor, school_id, amounts, now=None):
+    """Add (user_id, amount) pairs to the users' InboxCounter rows."""
+    now = now or datetime.utcnow()
+    counters = InboxCounter.__table__
+    statement = insert(counters).values([
+        {
+            'id': uuid.uuid4(),
+            'school_id': school_id,
+            'user_id': user_id,
+            'unread_count': max(amount, 0),
+            'created_at': now,
+            'updated_at': now,
+            'is_active': True
+        }
+        for user_id, amount in amounts
+    ])
+    executor.execute(statement.on_conflict_do_update(
+        index_elements=['school_id', 'user_id'],
+        set_={
+            'unread_count': counters.c.unread_count + statement.excluded.unread_count,
+            'updated_at': now
+        }
+    ))
+
+
+def mark_thread_read(school_id, user_id, thread_id):
+    """Mark every unread message of a thread read for a user; returns how many.
+
+    The caller commits.
+    """
+    now = datetime.utcnow()
+    recipients = MessageRecipient.__table__
+    participants = ThreadParticipant.__table__
+    counters = InboxCounter.__table__
+    read = db.session.execute(recipients.update().where(
+        recipients.c.school_id == school_id,
+        recipients.c.recipient_id == user_id,
+        recipients.c.is_read == False,
+        recipients.c.message_id.in_(select(Message.id).where(Message.thread_id == thread_id))
+    ).values(is_read=True, read_at=now, updated_at=now)).rowcount
+    db.session.execute(participants.update().where(
+        participants.c.school_id == school_id,
+        participants.c.user_id == user_id,
+        participants.c.thread_id == thread_id
+    ).values(unread_count=0, last_read_at=now, updated_at=now))
+    if read:
+        remaining = counters.c.unread_count - read
+        db.session.execute(counters.update().where(
+            counters.c.school_id == school_id,
+            counters.c.user_id == user_id
+        ).values(unread_count=case((remaining < 0, 0), else_=remaining), updated_at=now))
+        _counters_changed(school_id, [user_id])
+    return read
+
+
+def mark_message_read(school_id, user_id, message_id):
+    """Mark one message read for a user; returns False if it was already read.
+
+    The caller commits.
+    """
+    now = datetime.utcnow()
+    recipients = MessageRecipient.__table__
+    participants = ThreadParticipant.__table__
+    counters = InboxCounter.__table__
+    read = db.session.execute(recipients.update().where(
+        recipients.c.school_id == school_id,
+        recipients.c.recipient_id == user_id,
+        recipients.c.message_id == message_id,
+        recipients.c.is_read == False
+    ).values(is_read=True, read_at=now, updated_at=now)).rowcount
+    if not read:
+        return False
+    thread_id = select(Message.thread_id).where(Message.id == message_id).scalar_subquery()
+    for table, condition in (
+        (participants, participants.c.thread_id == thread_id),
+        (counters, True)
+    ):
+        remaining = table.c.unread_count - 1
+        db.session.execute(table.update().where(
+            table.c.school_id == school_id,
+            table.c.user_id == user_id,
+            condition
+        ).values(unread_count=case((remaining < 0, 0), else_=remaining), updated_at=now))
+    _counters_changed(school_id, [user_id])
+    return True
+
+
+def inbox(school_id, user_id, cursor=None, limit=20):
+    """A user's threads, most recent first, keyset-paginated over the inbox index.
+
+    Returns the paginate_for_school page with 'items' as thread dicts that
+    also carry the user's 'unread_count'.
+    """
+    page = ThreadParticipant.paginate_for_school(
+        school_id, order_by=('last_message_at',), cursor=cursor, limit=limit,
+        descending=True, user_id=user_id
+    )
+    threads = {
+        thread.id: thread
+        for thread in MessageThread.query.filter(
+            MessageThread.id.in_([entry.thread_id for entry in page['items']])
+        )
+    } if page['items'] else {}
+    items = []
+    for entry in page['items']:
+        thread = threads.get(entry.thread_id)
+        if thread is None:
+            continue
+        item = thread.to_dict()
+        item['unread_count'] = entry.unread_count
+        item['last_read_at'] = entry.last_read_at.isoformat() if entry.last_read_at else None
+        items.append(item)
+    page['items'] = items
+    return page
+
+
+class UnreadCounterCache:
+    """In-process LRU of (school_id, user_id) -> unread total with a TTL.
+
+    Local writes invalidate entries immediately; the TTL bounds staleness
+    from writes made by other processes.
+    """
+
+    def __init__(self, max_entries=50000, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._counts = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, school_id, user_id):
+        key = (school_id, user_id)
+        with self._lock:
+            entry = self._counts.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._counts.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        count = db.session.execute(
+            select(InboxCounter.unread_count).where(
+                InboxCounter.school_id == school_id,
+                InboxCounter.user_id == user_id
+            )
+        ).scalar() or 0
+        with self._lock:
+            self._counts[key] = (count, time.monotonic() + self.ttl)
+            self._counts.move_to_end(key)
+            while len(self._counts) > self.max_entries:
+                self._counts.popitem(last=False)
+        return count
+
+    def invalidate(self, school_id=None, user_ids=None):
+        with self._lock:
+            if school_id is None:
+                self._counts.clear()
+            else:
+                for user_id in user_ids or ():
+                    self._counts.pop((school_id, user_id), None)
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._counts), 'hits': self.hits, 'misses': self.misses}
+
+
+unread_counter_cache = UnreadCounterCache()
+
+
+def unread_count(school_id, user_id):
+    """Header badge count; no query when the user's counter is cached."""
+    return unread_counter_cache.get(school_id, user_id)
+
+
+def _counters_changed(school_id, user_ids):
+    unread_counter_cache.invalidate(school_id, user_ids)
+    db.session.info.setdefault(_COUNTERS_KEY, set()).update((school_id, user_id) for user_id in user_ids)
+
+
+def rebuild_inbox_index(school_id, batch_size=1000):
+    """Recreate a school's ThreadParticipant and InboxCounter rows from source tables.
+
+    Participants come from MessageThread.participants and from message
+    recipients; unread counts are unread MessageRecipient rows. The caller
+    commits. Returns the number of participant rows written.
+    """
+    entries = {}
+    for thread in db.session.query(
+        MessageThread.id, MessageThread.participants, MessageThread.last_message_at, MessageThread.created_at
+    ).filter(MessageThread.school_id == school_id, MessageThread.is_active == True):
+        for user_id in thread.participants or []:
+            entries[(uuid.UUID(str(user_id)), thread.id)] = [thread.last_message_at or thread.created_at, 0]
+
+    recipients = MessageRecipient.__table__
+    messages = Message.__table__
+    for row in db.session.execute(
+        select(
+            recipients.c.recipient_id, messages.c.thread_id,
+            func.max(messages.c.sent_at).label('last_message_at'),
+            func.coalesce(func.sum(case((recipients.c.is_read == False, 1), else_=0)), 0).label('unread')
+        ).select_from(
+            recipients.join(messages, messages.c.id == recipients.c.message_id)
+        ).where(
+            recipients.c.school_id == school_id,
+            recipients.c.is_active == True
+        ).group_by(recipients.c.recipient_id, messages.c.thread_id)
+    ):
+        entry = entries.setdefault((row.recipient_id, row.thread_id), [row.last_message_at, 0])
+        if row.last_message_at and (entry[0] is None or row.last_message_at > entry[0]):
+            entry[0] = row.last_message_at
+        entry[1] = int(row.unread)
+
+    now = datetime.utcnow()
+    participant_rows = [
+        {
+            'id': uuid.uuid4(), 'school_id': school_id, 'thread_id': thread_id, 'user_id': user_id,
+            'last_message_at': last_message_at or now, 'unread_count': unread,
+            'created_at': now, 'updated_at': now, 'is_active': True
+        }
+        for (user_id, thread_id), (last_message_at, unread) in entries.items()
+    ]
+    totals = {}
+    for (user_id, _), (_, unread) in entries.items():
+        totals[user_id] = totals.get(user_id, 0) + unread
+    counter_rows = [
+        {
+            'id': uuid.uuid4(), 'school_id': school_id, 'user_id': user_id, 'unread_count': unread,
+            'created_at': now, 'updated_at': now, 'is_active': True
+        }
+        for user_id, unread in totals.items()
+    ]
+
+    for model, rows in ((ThreadParticipant, participant_rows), (InboxCounter, counter_rows)):
+        table = model.__table__
+        db.session.execute(table.delete().where(table.c.school_id == school_id))
+        for start in range(0, len(rows), batch_size):
+            db.session.execute(table.insert(), rows[start:start + batch_size])
+    unread_counter_cache.invalidate()
+    db.session.info.setdefault(_COUNTERS_KEY, set()).add((None, None))
+    return len(participant_rows)
+
+
+def delivery_status(school_id, delivery_id):
+    """Progress of a delivery job as a dict, or None when it does not exist."""
+    delivery = MessageDelivery.get_by_id_and_school(delivery_id, school_id)
+    return delivery.to_dict() if delivery else None
+
+
+class DeliveryWorker:
+    """Small in-process thread pool that runs deliveries outside the request."""
+
+    def __init__(self, max_workers=2, chunk_size=1000):
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self._executor = None
+        self._lock = threading.Lock()
+        self.submitted = 0
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix='message-delivery')
+            return self._executor
+
+    def submit(self, delivery_id, app=None):
+        """Run ``deliver(delivery_id)`` on a worker thread; returns the Future."""
+        app = app or current_app._get_current_object()
+        self.submitted += 1
+        return self._pool().submit(self._run, app, delivery_id)
+
+    def _run(self, app, delivery_id):
+        with app.app_context():
+            try:
+                delivery = deliver(delivery_id, self.chunk_size)
+                return delivery.to_dict() if delivery else None
+            finally:
+                db.session.remove()
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+delivery_worker = DeliveryWorker()
+
+
+# ============================================================================
+# DISPATCH
+# ============================================================================
+
+_QUEUED_KEY = 'message_deliveries_queued'
+_COUNTERS_KEY = 'inbox_counters_dirty_users'
+
+
+def _invalidate_dirty_counters(session):
+    # (None, None) marks a rebuild, which may have touched any counter
+    for school_id, user_id in session.info.pop(_COUNTERS_KEY, ()):
+        if school_id is None:
+            unread_counter_cache.invalidate()
+        else:
+            unread_counter_cache.invalidate(school_id, [user_id])
+
+
+@event.listens_for(Session, 'after_commit')
+def _on_commit(session):
+    _invalidate_dirty_counters(session)
+    queued = session.info.pop(_QUEUED_KEY, ())
+    if queued:
+        app = current_app._get_current_object()
+        for delivery_id in queued:
+            delivery_worker.submit(delivery_id, app)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _on_rollback(session):
+    session.info.pop(_QUEUED_KEY, None)
+    # Counts reloaded after the write may hold the rolled-back values
+    _invalidate_dirty_counters(session)
+
+
+@click.command('deliver-messages')
+@click.option('--school-id', default=None, help='Only deliveries of one school.')
+@click.option('--chunk-size', default=1000, show_default=True)
+@click.option('--stale-minutes', default=STALE_DELIVERY_MINUTES, show_default=True,
+              help='Reclaim running deliveries with no progress for this long.')
+@with_appcontext
+def deliver_messages_command(school_id, chunk_size, stale_minutes):
+    """Run queued, failed and orphaned message deliveries in this process."""
+    query = db.session.query(MessageDelivery.id).filter(
+        _claimable(MessageDelivery.__table__, datetime.utcnow(), stale_minutes)
+    )
+    if school_id:
+        query = query.filter(MessageDelivery.school_id == uuid.UUID(school_id))
+    pending = [row.id for row in query.order_by(MessageDelivery.created_at)]
+    for delivery_id in pending:
+        delivery = deliver(delivery_id, chunk_size, stale_minutes)
+        if delivery is not None:
+            click.echo('%s: %s (%d/%d)' % (
+                delivery_id, delivery.status, delivery.delivered_count or 0, delivery.total_recipients or 0
+            ))
+
+
+@click.command('rebuild-inbox-index')
+@click.option('--school-id', default=None, help='Rebuild one school (default: every school).')
+@with_appcontext
+def rebuild_inbox_index_command(school_id):
+    """Recreate thread participant rows and unread counters."""
+    if school_id:
+        school_ids = [uuid.UUID(school_id)]
+    else:
+        school_ids = [row.school_id for row in db.session.query(MessageThread.school_id).distinct()]
+    total = 0
+    for current in school_ids:
+        total += rebuild_inbox_index(current)
+        db.session.commit()
+    click.echo('participant rows written: %d' % total)
+
+
+def register_commands(app):
+    app.cli.add_command(deliver_messages_command)
+    app.cli.add_command(rebuild_inbox_index_command)
+
+
+__all__ = [
+    'send_announcement', 'start_thread', 'send_message', 'deliver', 'delivery_status', 'audience_query',
+    'index_message', 'mark_thread_read', 'mark_message_read', 'inbox', 'unread_count',
+    'rebuild_inbox_index', 'UnreadCounterCache', 'unread_counter_cache',
+    'DeliveryWorker', 'delivery_worker', 'register_commands', 'AUDIENCES',
+    'STALE_DELIVERY_MINUTES'
+]
@@ -0,0 +1,350 @@
+"""
+Notifications
+Publishes a Notification by resolving its recipients once - user ids as is,
+role names expanded through UserSchoolRole - and writing one NotificationFeed
+row per user. Role membership is served from an in-process per-school map
+that is invalidated by UserSchoolRole/Role events and expires by itself when
+the earliest role assignment in it lapses, or after a short TTL so role
+changes made by other processes reach new notifications quickly.
+
+Backfill feeds for existing notifications with:
+flask rebuild-notification-feeds [--school-id ID]
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, event, or_
+from sqlalchemy.orm import Session, object_session
+
+from shared.models.unified_models import db, Notification, NotificationFeed, Role, UserSchoolRole
+
+
+ALL_MEMBERS = ('*', 'all')
+
+
+def _as_user_id(target):
+    if isinstance(target, uuid.UUID):
+        return target
+    try:
+        return uuid.UUID(str(target))
+    except ValueError:
+        return None
+
+
+class RoleMembership:
+    """One school's role -> user ids map, keyed by lowercased role name and role type."""
+
+    __slots__ = ('school_id', 'members', 'everyone', 'valid_until')
+
+    def __init__(self, school_id, members, everyone, valid_until):
+        self.school_id = school_id
+        self.members = members
+        self.everyone = everyone
+        self.valid_until = valid_until
+
+    @classmethod
+    def load(cls, school_id, now=None):
+        """Load active, unexpired assignments of active roles with one query."""
+        now = now or datetime.utcnow()
+        members = {}
+        valid_until = None
+        for row in db.session.query(
+            UserSchoolRole.user_id, UserSchoolRole.expires_at, Role.name, Role.role_type
+        ).join(
+            Role, Role.id == UserSchoolRole.role_id
+        ).filter(
+            UserSchoolRole.school_id == school_id,
+            UserSchoolRole.is_active == True,
+            Role.is_active == True,
+            or_(UserSchoolRole.expires_at.is_(None), UserSchoolRole.expires_at > now)
+        ):
+            for key in {(row.name or '').lower(), (row.role_type or '').lower()} - {''}:
+                members.setdefault(key, set()).add(row.user_id)
+            if row.expires_at is not None and (valid_until is None or row.expires_at < valid_until):
+                valid_until = row.expires_at
+        members = {key: frozenset(user_ids) for key, user_ids in members.items()}
+        everyone = frozenset().union(*members.values()) if members else frozenset()
+        return cls(school_id, members, everyone, valid_until)
+
+    def users_for(self, role):
+        role = role.lower()
+        if role in ALL_MEMBERS:
+            return self.everyone
+        return self.members.get(role, frozenset())
+
+
+class RoleMembershipCache:
+    """LRU cache of RoleMembership maps keyed by school_id, each entry with a TTL.
+
+    Feed rows are written from this map once per notification, so the TTL
+    is kept short.
+    """
+
+    def __init__(self, ttl=30, max_schools=256):
+        self.ttl = ttl
+        self.max_schools = max_schools
+        self._maps = OrderedDict()  # school_id -> (RoleMembership, valid until (monotonic))
+        self._generations = {}  # school_id -> invalidation count
+        self._epoch = 0  # bumped when everything is invalidated
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, school_id):
+        now = datetime.utcnow()
+        with self._lock:
+            cached = self._maps.get(school_id)
+            if cached is not None:
+                membership, expires_at = cached
+                if expires_at > time.monotonic() and (
+                    membership.valid_until is None or membership.valid_until > now
+                ):
+                    self._maps.move_to_end(school_id)
+                    self.hits += 1
+                    return membership
+                del self._maps[school_id]
+            self.misses += 1
+            generation = (self._epoch, self._generations.get(school_id, 0))
+
+        membership = RoleMembership.load(school_id, now)
+        with self._lock:
+            # An invalidation during the load may have made this map stale already
+            if generation == (self._epoch, self._generations.get(school_id, 0)):
+                self._maps[school_id] = (membership, time.monotonic() + self.ttl)
+                self._maps.move_to_end(school_id)
+                while len(self._maps) > self.max_schools:
+                    self._maps.popitem(last=False)
+        return membership
+
+    def invalidate(self, school_id=None):
+        with self._lock:
+            if school_id is None:
+                self._epoch += 1
+                self._maps.clear()
+            else:
+                self._generations[school_id] = self._generations.get(school_id, 0) + 1
+                self._maps.pop(school_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {'schools': len(self._maps), 'hits': self.hits, 'misses': self.misses}
+
+
+role_membership_cache = RoleMembershipCache()
+
+
+def resolve_recipients(school_id, targets):
+    """Expand a recipients list (user ids and role names) into sorted user ids."""
+    membership = None
+    user_ids = set()
+    for target in targets or ():
+        user_id = _as_user_id(target)
+        if user_id is not None:
+            user_ids.add(user_id)
+            continue
+        if membership is None:
+            membership = role_membership_cache.get(school_id)
+        user_ids.update(membership.users_for(str(target)))
+    return sorted(user_ids)
+
+
+def _write_feed(notification, user_ids, batch_size):
+    now = datetime.utcnow()
+    table = NotificationFeed.__table__
+    rows = [
+        {
+            'id': uuid.uuid4(),
+            'school_id': notification.school_id,
+            'user_id': user_id,
+            'notification_id': notification.id,
+            'notification_type': notification.notification_type,
+            'expires_at': notification.expires_at,
+            'is_read': False,
+            'created_at': notification.created_at or now,
+            'updated_at': now,
+            'is_active': True
+        }
+        for user_id in user_ids
+    ]
+    for start in range(0, len(rows), batch_size):
+        db.session.execute(table.insert(), rows[start:start + batch_size])
+    return len(rows)
+
+
+def publish_notification(school_id, title, content, notification_type, recipients, priority='normal',
+                         expires_at=None, batch_size=1000):
+    """Create a notification and its per-user feed rows; returns (notification, feed rows).
+
+    ``recipients`` mixes user ids and role names (matched against Role.name
+    or Role.role_type; '*' or 'all' means every member of the school). The
+    caller commits.
+    """
+    notification = Notification(
+        school_id=school_id,
+        title=title,
+        content=content,
+        notification_type=notification_type,
+        recipients=[str(target) for target in recipients or []],
+        priority=priority,
+        expires_at=expires_at
+    )
+    db.session.add(notification)
+    db.session.flush()
+    return notification, _write_feed(notification, resolve_recipients(school_id, recipients), batch_size)
+
+
+def notification_feed(school_id, user_id, cursor=None, limit=20, notification_type=None, unread_only=False):
+    """A user's unexpired notifications, newest first, keyset-paginated.
+
+    Returns the paginate_for_school page with 'items' as notification dicts
+    that also carry the user's 'is_read'/'read_at'.
+    """
+    query = NotificationFeed.query_for_school(school_id).filter(
+        or_(NotificationFeed.expires_at.is_(None), NotificationFeed.expires_at > datetime.utcnow())
+    )
+    filters = {'user_id': user_id}
+    if notification_type:
+        filters['notification_type'] = notification_type
+    if unread_only:
+        filters['is_read'] = False
+    page = NotificationFeed.paginate_for_school(
+        school_id, order_by=('created_at',), cursor=cursor, limit=limit, descending=True,
+        query=query, **filters
+    )
+    notifications = {
+        notification.id: notification
+        for notification in Notification.query.filter(
+            Notification.id.in_([entry.notification_id for entry in page['items']])
+        )
+    } if page['items'] else {}
+    items = []
+    for entry in page['items']:
+        notification = notifications.get(entry.notification_id)
+        if notification is None:
+            continue
+        item = notification.to_dict()
+        item['is_read'] = entry.is_read
+        item['read_at'] = entry.read_at.isoformat() if entry.read_at else None
+        items.append(item)
+    page['items'] = items
+    return page
+
+
+def mark_notification_read(school_id, user_id, notification_id):
+    """Mark a feed entry read; returns False if it was missing or already read. The caller commits."""
+    now = datetime.utcnow()
+    table = NotificationFeed.__table__
+    return db.session.execute(table.update().where(
+        table.c.school_id == school_id,
+        table.c.user_id == user_id,
+        table.c.notification_id == notification_id,
+        table.c.is_read == False
+    ).values(is_read=True, read_at=now, updated_at=now)).rowcount > 0
+
+
+def rebuild_notification_feeds(school_id, include_expired=False, batch_size=1000):
+    """Recreate a school's feed rows from Notification.recipients; returns rows written.
+
+    Read state is kept for entries that survive. The caller commits.
+    """
+    table = NotificationFeed.__table__
+    read = {
+        (row.user_id, row.notification_id): row.read_at
+        for row in db.session.execute(table.select().where(
+            table.c.school_id == school_id,
+            table.c.is_read == True
+        ))
+    }
+    db.session.execute(table.delete().where(table.c.school_id == school_id))
+
+    query = Notification.query_for_school(school_id)
+    if not include_expired:
+        query = query.filter(or_(Notification.expires_at.is_(None), Notification.expires_at > datetime.utcnow()))
+    written = 0
+    for notification in query.order_by(Notification.created_at):
+        written += _write_feed(notification, resolve_recipients(school_id, notification.recipients), batch_size)
+    if read:
+        db.session.execute(
+            table.update().where(
+                table.c.school_id == school_id,
+                table.c.user_id == bindparam('user'),
+                table.c.notification_id == bindparam('notification')
+            ).values(is_read=True, read_at=bindparam('read')),
+            [
+                {'user': user_id, 'notification': notification_id, 'read': read_at}
+                for (user_id, notification_id), read_at in read.items()
+            ]
+        )
+    return written
+
+
+# ============================================================================
+# INVALIDATION
+# ============================================================================
+
+_DIRTY_KEY = 'role_membership_dirty_schools'
+
+
+def _on_assignment_change(mapper, connection, target):
+    role_membership_cache.invalidate(target.school_id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_DIRTY_KEY, set()).add(target.school_id)
+
+
+def _on_role_change(mapper, connection, target):
+    # Roles are shared across schools
+    role_membership_cache.invalidate()
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_DIRTY_KEY, set()).add(None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _on_commit(session):
+    for school_id in session.info.pop(_DIRTY_KEY, ()):
+        role_membership_cache.invalidate(school_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _on_rollback(session):
+    # Maps reloaded after the flush may hold the rolled-back assignments
+    for school_id in session.info.pop(_DIRTY_KEY, ()):
+        role_membership_cache.invalidate(school_id)
+
+
+for _event in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(UserSchoolRole, _event, _on_assignment_change)
+    event.listen(Role, _event, _on_role_change)
+
+
+@click.command('rebuild-notification-feeds')
+@click.option('--school-id', default=None, help='Rebuild one school (default: every school).')
+@with_appcontext
+def rebuild_notification_feeds_command(school_id):
+    """Re-resolve notification recipients into per-user feed rows."""
+    if school_id:
+        school_ids = [uuid.UUID(school_id)]
+    else:
+        school_ids = [row.school_id for row in db.session.query(Notification.school_id).distinct()]
+    total = 0
+    for current in school_ids:
+        total += rebuild_notification_feeds(current)
+        db.session.commit()
+    click.echo('feed rows written: %d' % total)
+
+
+def register_commands(app):
+    app.cli.add_command(rebuild_notification_feeds_command)
+
+
+__all__ = [
+    'publish_notification', 'resolve_recipients', 'notification_feed', 'mark_notification_read',
+    'rebuild_notification_feeds', 'RoleMembership', 'RoleMembershipCache', 'role_membership_cache',
+    'register_commands'
+]
@@ -0,0 +1,245 @@
+"""
+Permissions
+Interns permission names to bit positions and compiles each user's roles in
+a school into one integer mask, so a check is a dict lookup and an AND.
+
+A user's mask in a school is the OR of the masks of their active, unexpired
+UserSchoolRole assignments. Each assignment contributes its Role.permissions
+plus role_data['permissions'], minus role_data['denied_permissions']. A '*'
+permission grants everything. Masks are cached per (user, school) until the
+earliest assignment in them expires, a Role/UserSchoolRole change in this
+process invalidates them, or the TTL passes, which bounds how long changes
+made elsewhere (other workers, bulk updates, SQL) take to show up.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+
+from sqlalchemy import event, or_
+from sqlalchemy.orm import Session, object_session
+
+from shared.models.unified_models import db, Role, UserSchoolRole
+
+
+ALL_PERMISSIONS = -1  # every bit set
+WILDCARD = '*'
+
+
+class PermissionRegistry:
+    """Process-wide name <-> bit position table; positions are never reused."""
+
+    def __init__(self):
+        self._bits = {}
+        self._names = []
+        self._lock = threading.Lock()
+
+    def bit(self, name):
+        """The mask bit for a permission name, interning it on first use."""
+        bit = self._bits.get(name)
+        if bit is None:
+            with self._lock:
+                bit = self._bits.get(name)
+                if bit is None:
+                    bit = 1 << len(self._names)
+                    self._names.append(name)
+                    self._bits[name] = bit
+        return bit
+
+    def mask(self, names):
+        """OR of the bits of ``names``; ALL_PERMISSIONS if it contains '*'."""
+        mask = 0
+        for name in names or ():
+            if name == WILDCARD:
+                return ALL_PERMISSIONS
+            mask |= self.bit(name)
+        return mask
+
+    def names(self, mask):
+        """Permission names set in a mask ('*' for ALL_PERMISSIONS)."""
+        if mask == ALL_PERMISSIONS:
+            return [WILDCARD]
+        return [name for position, name in enumerate(self._names) if mask >> position & 1]
+
+    def __len__(self):
+        return len(self._names)
+
+
+permission_registry = PermissionRegistry()
+
+
+PermissionSet = namedtuple('PermissionSet', 'mask role_ids valid_until')
+
+
+def compile_assignment(role_permissions, role_data):
+    """Mask for one assignment: the role's permissions adjusted by its role_data."""
+    role_data = role_data or {}
+    mask = permission_registry.mask(role_permissions)
+    extra = permission_registry.mask(role_data.get('permissions'))
+    if mask != ALL_PERMISSIONS:
+        mask = ALL_PERMISSIONS if extra == ALL_PERMISSIONS else mask | extra
+    denied = permission_registry.mask(role_data.get('denied_permissions'))
+    if denied:
+        mask &= ~denied
+    return mask
+
+
+class PermissionCache:
+    """LRU of compiled PermissionSets keyed by (user_id, school_id), each entry with a TTL."""
+
+    def __init__(self, ttl=60, max_entries=50000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._sets = OrderedDict()  # (user_id, school_id) -> (PermissionSet, valid until (monotonic))
+        self._role_masks = {}  # role_id -> (Role.permissions, compiled mask)
+        self._generation = 0  # bumped by invalidate(); loads that straddle one are not stored
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _role_mask(self, role_id, permissions):
+        names = tuple(permissions or ())
+        cached = self._role_masks.get(role_id)
+        if cached is None or cached[0] != names:
+            cached = self._role_masks[role_id] = (names, permission_registry.mask(names))
+        return cached[1]
+
+    def load(self, user_id, school_id, now=None):
+        """Compile a user's permissions in a school with one query."""
+        now = now or datetime.utcnow()
+        mask = 0
+        role_ids = []
+        valid_until = None
+        for row in db.session.query(
+            UserSchoolRole.role_id, UserSchoolRole.role_data, UserSchoolRole.expires_at, Role.permissions
+        ).join(
+            Role, Role.id == UserSchoolRole.role_id
+        ).filter(
+            UserSchoolRole.user_id == user_id,
+            UserSchoolRole.school_id == school_id,
+            UserSchoolRole.is_active == True,
+            Role.is_active == True,
+            or_(UserSchoolRole.expires_at.is_(None), UserSchoolRole.expires_at > now)
+        ):
+            role_ids.append(row.role_id)
+            if row.role_data and (row.role_data.get('permissions') or row.role_data.get('denied_permissions')):
+                mask |= compile_assignment(row.permissions, row.role_data)
+            else:
+                mask |= self._role_mask(row.role_id, row.permissions)
+            if row.expires_at is not None and (valid_until is None or row.expires_at < valid_until):
+                valid_until = row.expires_at
+        return PermissionSet(mask, tuple(role_ids), valid_until)
+
+    def get(self, user_id, school_id):
+        key = (user_id, school_id)
+        with self._lock:
+            cached = self._sets.get(key)
+            if cached is not None:
+                entry, expires_at = cached
+                if expires_at > time.monotonic() and (
+                    entry.valid_until is None or entry.valid_until > datetime.utcnow()
+                ):
+                    self._sets.move_to_end(key)
+                    self.hits += 1
+                    return entry
+                del self._sets[key]
+            self.misses += 1
+            generation = self._generation
+        entry = self.load(user_id, school_id)
+        with self._lock:
+            # An invalidation during the load may have made this mask stale already
+            if generation == self._generation:
+                self._sets[key] = (entry, time.monotonic() + self.ttl)
+                self._sets.move_to_end(key)
+                while len(self._sets) > self.max_entries:
+                    self._sets.popitem(last=False)
+        return entry
+
+    def invalidate(self, user_id=None, school_id=None):
+        """Drop one (user, school) entry, or everything when user_id is None."""
+        with self._lock:
+            self._generation += 1
+            if user_id is None:
+                self._sets.clear()
+                self._role_masks.clear()
+            else:
+                self._sets.pop((user_id, school_id), None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._sets),
+                'roles': len(self._role_masks),
+                'permissions': len(permission_registry),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+permission_cache = PermissionCache()
+
+
+def permission_mask(user_id, school_id):
+    return permission_cache.get(user_id, school_id).mask
+
+
+def has_permission(user_id, school_id, permission):
+    """True if the user holds ``permission`` (a name or a precomputed bit) in the school."""
+    bit = permission if isinstance(permission, int) else permission_registry.bit(permission)
+    return bool(permission_cache.get(user_id, school_id).mask & bit)
+
+
+def has_all_permissions(user_id, school_id, permissions):
+    required = permission_registry.mask(permissions)
+    return permission_cache.get(user_id, school_id).mask & required == required
+
+
+# ============================================================================
+# INVALIDATION
+# ============================================================================
+
+_DIRTY_KEY = 'permission_cache_dirty'
+
+
+def _mark(session, key):
+    if session is not None:
+        session.info.setdefault(_DIRTY_KEY, set()).add(key)
+
+
+def _on_assignment_change(mapper, connection, target):
+    permission_cache.invalidate(target.user_id, target.school_id)
+    _mark(object_session(target), (target.user_id, target.school_id))
+
+
+def _on_role_change(mapper, connection, target):
+    # A role is shared by every school; recompile everything
+    permission_cache.invalidate()
+    _mark(object_session(target), (None, None))
+
+
+def _invalidate_dirty(session):
+    # (None, None) is a Role change and clears everything
+    for user_id, school_id in session.info.pop(_DIRTY_KEY, ()):
+        permission_cache.invalidate(user_id, school_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _on_commit(session):
+    _invalidate_dirty(session)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _on_rollback(session):
+    # A mask compiled after the flush may include a rolled-back grant
+    _invalidate_dirty(session)
+
+
+for _event in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(UserSchoolRole, _event, _on_assignment_change)
+    event.listen(Role, _event, _on_role_change)
+
+
+__all__ = [
+    'PermissionRegistry', 'permission_registry', 'PermissionSet', 'PermissionCache', 'permission_cache',
+    'compile_assignment', 'permission_mask', 'has_permission', 'has_all_permissions', 'ALL_PERMISSIONS'
+]
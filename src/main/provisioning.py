@@ -0,0 +1,229 @@
+"""
+Account Provisioning
+Creates User rows in bulk for school onboarding. Passwords are hashed in a
+process pool sized to the available cores while the main process inserts
+finished batches, so hashing never runs on a request thread and the
+database sees a few multi-row INSERTs per batch.
+
+Hashes are BCrypt "$2a$" with cost 10 - the format Spring's
+BCryptPasswordEncoder produces and login verifies. The bcrypt package is
+imported on first use, so apps that never hash passwords do not need it.
+
+Usage: flask provision-users accounts.csv [--workers N]
+(CSV columns: phone_number, password, first_name, last_name, email, ...)
+"""
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import csv
+import os
+import time
+import uuid
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy.dialects.postgresql import insert
+
+from shared.models.unified_models import db, User, UserStatus
+
+
+BCRYPT_ROUNDS = 10
+BCRYPT_PREFIX = b'2a'
+MAX_PASSWORD_BYTES = 72  # BCrypt ignores (newer encoders reject) anything longer
+
+USER_FIELDS = (
+    'phone_number', 'email', 'first_name', 'last_name', 'middle_name', 'date_of_birth', 'gender',
+    'address_line1', 'address_line2', 'city', 'state', 'postal_code', 'country', 'status',
+    'is_verified', 'verification_status', 'approval_status', 'user_metadata'
+)
+
+
+def _field_defaults():
+    """Column defaults for USER_FIELDS, so every row of a multi-row INSERT has the same keys."""
+    defaults = {}
+    for field in USER_FIELDS:
+        default = User.__table__.c[field].default
+        if default is None:
+            defaults[field] = None
+        elif default.is_callable:
+            defaults[field] = default.arg(None)
+        else:
+            defaults[field] = default.arg
+    return defaults
+
+
+def hash_password(password, rounds=BCRYPT_ROUNDS):
+    """BCrypt hash in the encoder's format ($2a$<rounds>$...)."""
+    import bcrypt
+    encoded = password.encode('utf-8')
+    if len(encoded) > MAX_PASSWORD_BYTES:
+        raise ValueError('Password longer than %d bytes' % MAX_PASSWORD_BYTES)
+    return bcrypt.hashpw(encoded, bcrypt.gensalt(rounds, BCRYPT_PREFIX)).decode('ascii')
+
+
+def verify_password(password, password_hash):
+    if not password or not password_hash:
+        return False
+    import bcrypt
+    return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('ascii'))
+
+
+def _hash_chunk(rounds, items):
+    """Worker side: hash (index, password) pairs; returns (results, cpu seconds)."""
+    started = time.process_time()
+    results = []
+    for index, password in items:
+        try:
+            results.append((index, hash_password(password, rounds), None))
+        except ValueError as error:
+            results.append((index, None, str(error)))
+    return results, time.process_time() - started
+
+
+def available_cores():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _batches(accounts, size):
+    batch = []
+    for account in accounts:
+        batch.append(account)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def provision_users(accounts, rounds=BCRYPT_ROUNDS, workers=None, batch_size=500, chunk_size=32,
+                    status=UserStatus.PENDING.value):
+    """Create users from an iterable of account dicts and return a throughput report.
+
+    Each dict needs 'phone_number'; 'password' is hashed when present (users
+    without one activate later), and other User columns are copied. Accounts
+    whose phone number already exists, or repeats in the input, are skipped.
+    ``accounts`` is consumed lazily with at most ~2 batches per worker in
+    flight. Each batch is inserted and committed as soon as its hashes are
+    ready, so an interrupted run can simply be repeated.
+
+    Returns {'accounts', 'created', 'skipped', 'failed', 'user_ids'
+    (phone -> id), 'workers', 'hashes', 'elapsed', 'hash_cpu_seconds',
+    'accounts_per_second', 'hashes_per_second'}.
+    """
+    workers = workers or available_cores()
+    started = time.perf_counter()
+    report = {
+        'accounts': 0,
+        'created': 0,
+        'skipped': 0,
+        'failed': [],
+        'user_ids': {},
+        'workers': workers,
+        'hashes': 0,
+        'hash_cpu_seconds': 0.0
+    }
+    seen = set()
+    in_flight = deque()
+    defaults = _field_defaults()
+    defaults['status'] = status
+
+    def prepare(batch):
+        now = datetime.utcnow()
+        rows = []
+        passwords = []
+        for account in batch:
+            report['accounts'] += 1
+            phone = (account.get('phone_number') or '').strip()
+            if not phone:
+                report['failed'].append({'phone_number': None, 'error': 'Missing phone_number'})
+                continue
+            if phone in seen:
+                report['skipped'] += 1
+                continue
+            seen.add(phone)
+            row = dict(defaults)
+            row.update((field, account[field]) for field in USER_FIELDS if account.get(field) not in (None, ''))
+            row.update(
+                id=uuid.uuid4(), phone_number=phone, password_hash=None,
+                created_at=now, updated_at=now, is_active=True
+            )
+            if account.get('password'):
+                passwords.append((len(rows), account['password']))
+            rows.append(row)
+        return rows, passwords
+
+    def finish(rows, futures):
+        failed = set()
+        for future in futures:
+            results, cpu_seconds = future.result()
+            report['hash_cpu_seconds'] += cpu_seconds
+            for index, password_hash, error in results:
+                if error:
+                    failed.add(index)
+                    report['failed'].append({'phone_number': rows[index]['phone_number'], 'error': error})
+                else:
+                    rows[index]['password_hash'] = password_hash
+                    report['hashes'] += 1
+        rows = [row for index, row in enumerate(rows) if index not in failed]
+        if not rows:
+            return
+        created = db.session.execute(
+            insert(User.__table__).values(rows).on_conflict_do_nothing(
+                index_elements=['phone_number']
+            ).returning(User.__table__.c.id, User.__table__.c.phone_number)
+        ).all()
+        db.session.commit()
+        report['created'] += len(created)
+        report['skipped'] += len(rows) - len(created)
+        report['user_ids'].update((row.phone_number, row.id) for row in created)
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for batch in _batches(accounts, batch_size):
+            rows, passwords = prepare(batch)
+            futures = [
+                pool.submit(_hash_chunk, rounds, passwords[start:start + chunk_size])
+                for start in range(0, len(passwords), chunk_size)
+            ]
+            in_flight.append((rows, futures))
+            while len(in_flight) > workers * 2:
+                finish(*in_flight.popleft())
+        while in_flight:
+            finish(*in_flight.popleft())
+
+    elapsed = time.perf_counter() - started
+    report['elapsed'] = elapsed
+    report['accounts_per_second'] = report['accounts'] / elapsed if elapsed else 0.0
+    report['hashes_per_second'] = report['hashes'] / elapsed if elapsed else 0.0
+    return report
+
+
+@click.command('provision-users')
+@click.argument('accounts_file', type=click.File('r', encoding='utf-8-sig'))
+@click.option('--workers', default=None, type=int, help='Hashing processes (default: available cores).')
+@click.option('--batch-size', default=500, show_default=True)
+@click.option('--rounds', default=BCRYPT_ROUNDS, show_default=True, help='BCrypt cost; login accepts any.')
+@with_appcontext
+def provision_users_command(accounts_file, workers, batch_size, rounds):
+    """Create user accounts from a CSV file, hashing passwords in parallel."""
+    report = provision_users(csv.DictReader(accounts_file), rounds=rounds, workers=workers, batch_size=batch_size)
+    click.echo('accounts: %d, created: %d, skipped: %d, failed: %d' % (
+        report['accounts'], report['created'], report['skipped'], len(report['failed'])
+    ))
+    click.echo('%.1fs with %d workers: %.1f accounts/s, %.1f hashes/s' % (
+        report['elapsed'], report['workers'], report['accounts_per_second'], report['hashes_per_second']
+    ))
+    for failure in report['failed'][:20]:
+        click.echo('  %s: %s' % (failure['phone_number'], failure['error']))
+
+
+def register_commands(app):
+    app.cli.add_command(provision_users_command)
+
+
+__all__ = [
+    'provision_users', 'hash_password', 'verify_password', 'available_cores',
+    'register_commands', 'BCRYPT_ROUNDS'
+]
@@ -0,0 +1,330 @@
+"""
+Receivables
+Moves past-due invoices from SENT to OVERDUE in small, index-ordered batches
+driven by idx_invoice_school_status (school_id, status, due_date), and
+reports per-school aging buckets from the receivable_aging table (open
+balance per due date, maintained by the Invoice events and the bulk invoice
+writers). Also reads, rebuilds and verifies that table and the per-term
+financial_summaries table.
+
+Scheduled sweep: flask sweep-overdue-invoices [--school-id ID]
+"""
+from datetime import date, datetime, timedelta
+import time
+import uuid
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import case, func, select
+
+from shared.models.unified_models import (
+    db, Invoice, InvoiceStatus, PaymentNotification, PaymentStatus, School,
+    FinancialSummary, FINANCIAL_SUMMARY_COLUMNS, ReceivableAging, RECEIVABLE_AGING_COLUMNS,
+    apply_financial_deltas, apply_aging_deltas
+)
+
+
+AGING_BUCKETS = ('current', '0-30', '31-60', '61-90', '90+')
+OPEN_STATUSES = ReceivableAging.OPEN_STATUSES
+
+
+def sweep_overdue_batch(school_id, as_of=None, batch_size=500):
+    """Mark up to ``batch_size`` active SENT invoices due before ``as_of`` as OVERDUE.
+
+    Rows other transactions hold are skipped. Does NOT commit: the locks
+    taken here last until the caller commits, so commit after every batch
+    (sweep-overdue-invoices does) and call again until fewer than
+    ``batch_size`` rows come back. Returns the number of invoices updated.
+    """
+    as_of = as_of or date.today()
+    table = Invoice.__table__
+    due = select(table.c.id).where(
+        table.c.school_id == school_id,
+        table.c.is_active == True,
+        table.c.status == InvoiceStatus.SENT.value,
+        table.c.due_date < as_of,
+        table.c.balance_due > 0
+    ).order_by(table.c.due_date).limit(batch_size).with_for_update(skip_locked=True)
+    swept = db.session.execute(
+        table.update().where(table.c.id.in_(due.scalar_subquery())).values(
+            status=InvoiceStatus.OVERDUE.value,
+            updated_at=datetime.utcnow()
+        ).returning(
+            table.c.academic_year, table.c.term, table.c.total_amount,
+            table.c.amount_paid, table.c.balance_due, table.c.due_date
+        )
+    ).all()
+    # Core updates bypass the Invoice model events
+    statuses = ((InvoiceStatus.SENT.value, -1), (InvoiceStatus.OVERDUE.value, 1))
+    apply_financial_deltas(db.session, school_id, [
+        (row.academic_year, row.term, FinancialSummary.invoice_contribution(
+            status, row.total_amount, row.amount_paid, row.balance_due), sign)
+        for row in swept
+        for status, sign in statuses
+    ])
+    apply_aging_deltas(db.session, school_id, [
+        (row.due_date, ReceivableAging.invoice_contribution(status, row.balance_due), sign)
+        for row in swept
+        for status, sign in statuses
+    ])
+    return len(swept)
+
+
+def aging_summary(school_id, as_of=None):
+    """Open invoice counts and balance_due sums by days past due.
+
+    Invoices not yet due are reported as 'current'. Reads receivable_aging
+    (one row per open due date), never the invoices table.
+    """
+    as_of = as_of or date.today()
+    table = ReceivableAging.__table__
+    bucket = case(
+        (table.c.due_date >= as_of, 'current'),
+        (table.c.due_date >= as_of - timedelta(days=30), '0-30'),
+        (table.c.due_date >= as_of - timedelta(days=60), '31-60'),
+        (table.c.due_date >= as_of - timedelta(days=90), '61-90'),
+        else_='90+'
+    ).label('bucket')
+    rows = db.session.execute(
+        select(
+            bucket, func.coalesce(func.sum(table.c.open_count), 0), func.coalesce(func.sum(table.c.open_balance), 0)
+        ).where(
+            table.c.school_id == school_id,
+            table.c.open_count > 0
+        ).group_by(bucket)
+    )
+
+    buckets = {name: {'count': 0, 'balance_due': 0} for name in AGING_BUCKETS}
+    for name, count, balance in rows:
+        buckets[name] = {'count': int(count), 'balance_due': int(balance)}
+    return {
+        'school_id': str(school_id),
+        'as_of': as_of.isoformat(),
+        'buckets': buckets,
+        'total': {
+            'count': sum(value['count'] for value in buckets.values()),
+            'balance_due': sum(value['balance_due'] for value in buckets.values())
+        }
+    }
+
+
+def compute_receivable_aging(school_id):
+    """Recompute due_date -> receivable_aging columns from open invoices."""
+    invoices = Invoice.__table__
+    rows = db.session.execute(
+        select(
+            invoices.c.due_date,
+            func.count().label('open_count'),
+            func.coalesce(func.sum(invoices.c.balance_due), 0).label('open_balance')
+        ).where(
+            invoices.c.school_id == school_id,
+            invoices.c.is_active == True,
+            invoices.c.status.in_(OPEN_STATUSES),
+            invoices.c.balance_due > 0
+        ).group_by(invoices.c.due_date)
+    )
+    return {row.due_date: {'open_count': int(row.open_count), 'open_balance': int(row.open_balance)} for row in rows}
+
+
+def check_receivable_aging(school_id, repair=False):
+    """Compare receivable_aging with totals recomputed from open invoices.
+
+    Returns a list of {'due_date', 'column', 'stored', 'actual'}
+    differences. With ``repair`` the school's rows are replaced by the
+    recomputed totals; the caller commits.
+    """
+    actual = compute_receivable_aging(school_id)
+    stored_query = ReceivableAging.query.filter_by(school_id=school_id)
+    stored = {
+        row.due_date: {name: getattr(row, name) for name in RECEIVABLE_AGING_COLUMNS}
+        for row in stored_query
+    }
+
+    empty = dict.fromkeys(RECEIVABLE_AGING_COLUMNS, 0)
+    differences = []
+    for due_date in sorted(set(actual) | set(stored)):
+        expected = actual.get(due_date, empty)
+        found = stored.get(due_date, empty)
+        for name in RECEIVABLE_AGING_COLUMNS:
+            if expected[name] != found[name]:
+                differences.append({
+                    'due_date': due_date.isoformat(), 'column': name,
+                    'stored': found[name], 'actual': expected[name]
+                })
+
+    if repair and differences:
+        stored_query.delete(synchronize_session=False)
+        now = datetime.utcnow()
+        rows = [
+            dict(values, id=uuid.uuid4(), school_id=school_id, due_date=due_date,
+                 created_at=now, updated_at=now, is_active=True)
+            for due_date, values in actual.items()
+        ]
+        if rows:
+            db.session.execute(ReceivableAging.__table__.insert(), rows)
+    return differences
+
+
+# ============================================================================
+# FINANCIAL SUMMARIES
+# ============================================================================
+
+def compute_financial_totals(school_id, academic_year=None):
+    """Recompute (academic_year, term) -> summary columns from invoices and payments."""
+    invoices = Invoice.__table__
+    payments = PaymentNotification.__table__
+    term = func.coalesce(invoices.c.term, '')
+
+    def total(condition, value=1):
+        return func.coalesce(func.sum(case((condition, value), else_=0)), 0)
+
+    invoice_rows = select(
+        invoices.c.academic_year, term.label('term'),
+        func.count().label('invoice_count'),
+        func.coalesce(func.sum(invoices.c.total_amount), 0).label('total_amount'),
+        func.coalesce(func.sum(func.coalesce(invoices.c.amount_paid, 0)), 0).label('amount_paid'),
+        func.coalesce(func.sum(invoices.c.balance_due), 0).label('balance_due'),
+        total(invoices.c.status == InvoiceStatus.PAID.value).label('paid_count'),
+        total(invoices.c.status == InvoiceStatus.OVERDUE.value).label('overdue_count'),
+        total(invoices.c.status == InvoiceStatus.OVERDUE.value, invoices.c.balance_due).label('overdue_balance')
+    ).where(
+        invoices.c.school_id == school_id,
+        invoices.c.is_active == True,
+        invoices.c.status != InvoiceStatus.CANCELLED.value
+    ).group_by(invoices.c.academic_year, term)
+
+    payment_rows = select(
+        invoices.c.academic_year, term.label('term'),
+        total(payments.c.status == PaymentStatus.PENDING.value).label('pending_payments'),
+        total(payments.c.status == PaymentStatus.PENDING.value, payments.c.amount).label('pending_payment_amount'),
+        total(payments.c.status == PaymentStatus.APPROVED.value).label('approved_payments'),
+        total(payments.c.status == PaymentStatus.APPROVED.value, payments.c.amount).label('approved_payment_amount'),
+        total(payments.c.status == PaymentStatus.REJECTED.value).label('rejected_payments')
+    ).select_from(
+        payments.join(invoices, invoices.c.id == payments.c.invoice_id)
+    ).where(
+        payments.c.school_id == school_id,
+        payments.c.is_active == True
+    ).group_by(invoices.c.academic_year, term)
+
+    if academic_year:
+        invoice_rows = invoice_rows.where(invoices.c.academic_year == academic_year)
+        payment_rows = payment_rows.where(invoices.c.academic_year == academic_year)
+
+    totals = {}
+    for statement in (invoice_rows, payment_rows):
+        for row in db.session.execute(statement):
+            values = row._asdict()
+            key = (values.pop('academic_year'), values.pop('term'))
+            totals.setdefault(key, dict.fromkeys(FINANCIAL_SUMMARY_COLUMNS, 0)).update(
+                {name: int(value) for name, value in values.items()}
+            )
+    return totals
+
+
+def check_financial_summaries(school_id, academic_year=None, repair=False):
+    """Compare financial_summaries with totals recomputed from source rows.
+
+    Returns a list of {'academic_year', 'term', 'column', 'stored',
+    'actual'} differences. With ``repair`` the school's summaries (for the
+    year, if given) are replaced by the recomputed totals; the caller commits.
+    """
+    actual = compute_financial_totals(school_id, academic_year)
+    stored_query = FinancialSummary.query.filter_by(school_id=school_id)
+    if academic_year:
+        stored_query = stored_query.filter_by(academic_year=academic_year)
+    stored = {
+        (summary.academic_year, summary.term): {name: getattr(summary, name) for name in FINANCIAL_SUMMARY_COLUMNS}
+        for summary in stored_query
+    }
+
+    empty = dict.fromkeys(FINANCIAL_SUMMARY_COLUMNS, 0)
+    differences = []
+    for key in sorted(set(actual) | set(stored)):
+        expected = actual.get(key, empty)
+        found = stored.get(key, empty)
+        for name in FINANCIAL_SUMMARY_COLUMNS:
+            if expected[name] != found[name]:
+                differences.append({
+                    'academic_year': key[0], 'term': key[1] or None, 'column': name,
+                    'stored': found[name], 'actual': expected[name]
+                })
+
+    if repair and differences:
+        stored_query.delete(synchronize_session=False)
+        now = datetime.utcnow()
+        rows = [
+            dict(values, id=uuid.uuid4(), school_id=school_id, academic_year=key[0], term=key[1],
+                 created_at=now, updated_at=now, is_active=True)
+            for key, values in actual.items()
+        ]
+        if rows:
+            db.session.execute(FinancialSummary.__table__.insert(), rows)
+    return differences
+
+
+def financial_overview(school_id, academic_year=None):
+    """Dashboard totals per term read from financial_summaries (no invoice scans)."""
+    query = FinancialSummary.query_for_school(school_id)
+    if academic_year:
+        query = query.filter_by(academic_year=academic_year)
+    return [summary.to_dict() for summary in query.order_by(FinancialSummary.academic_year, FinancialSummary.term)]
+
+
+@click.command('check-financial-summaries')
+@click.option('--school-id', default=None, help='Check one school (default: every school).')
+@click.option('--repair', is_flag=True, help='Replace summaries that differ with recomputed totals.')
+@with_appcontext
+def check_financial_summaries_command(school_id, repair):
+    """Verify financial_summaries and receivable_aging against invoices and payment notifications."""
+    if school_id:
+        school_ids = [uuid.UUID(school_id)]
+    else:
+        school_ids = [row.id for row in db.session.query(School.id).order_by(School.id)]
+    mismatched = 0
+    for current in school_ids:
+        differences = check_financial_summaries(current, repair=repair)
+        differences += check_receivable_aging(current, repair=repair)
+        db.session.commit()
+        if differences:
+            mismatched += 1
+            click.echo('%s: %d differences%s' % (current, len(differences), ' (repaired)' if repair else ''))
+    click.echo('schools with differences: %d' % mismatched)
+
+
+@click.command('sweep-overdue-invoices')
+@click.option('--school-id', default=None, help='Sweep one school (default: every school).')
+@click.option('--batch-size', default=500, show_default=True)
+@click.option('--pause', default=0.0, show_default=True, help='Seconds to sleep between batches.')
+@with_appcontext
+def sweep_overdue_command(school_id, batch_size, pause):
+    """Mark past-due SENT invoices as OVERDUE, school by school."""
+    if school_id:
+        school_ids = [uuid.UUID(school_id)]
+    else:
+        school_ids = [row.id for row in db.session.query(School.id).order_by(School.id)]
+    as_of = date.today()
+    total = 0
+    for current in school_ids:
+        while True:
+            swept = sweep_overdue_batch(current, as_of=as_of, batch_size=batch_size)
+            # Commit per batch so row locks are released and a stopped sweep can be re-run
+            db.session.commit()
+            total += swept
+            if swept < batch_size:
+                break
+            if pause:
+                time.sleep(pause)
+    click.echo('invoices marked overdue: %d' % total)
+
+
+def register_commands(app):
+    app.cli.add_command(sweep_overdue_command)
+    app.cli.add_command(check_financial_summaries_command)
+
+
+__all__ = [
+    'sweep_overdue_batch', 'aging_summary', 'compute_receivable_aging', 'check_receivable_aging',
+    'compute_financial_totals', 'check_financial_summaries', 'financial_overview', 'register_commands',
+    'AGING_BUCKETS'
+]
@@ -0,0 +1,361 @@
+"""
+Bank Statement Reconciliation
+Streams a bank CSV or OFX export and hash-joins its credit lines against a
+school's pending PaymentNotification rows on reference, amount and a date
+window. Exact matches are approved in bulk (and applied to their invoices);
+near misses go to a review list. Memory is bounded by the number of pending
+notifications, not by the statement length.
+"""
+import csv
+import re
+from collections import namedtuple
+from functools import lru_cache
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import bindparam, case, func, select
+
+from shared.models.unified_models import (
+    db, Invoice, InvoiceStatus, PaymentNotification, PaymentStatus, FinancialSummary, ReceivableAging,
+    apply_financial_deltas, apply_aging_deltas
+)
+
+
+StatementLine = namedtuple('StatementLine', 'line_number reference amount posted_on description')
+
+CSV_COLUMNS = {
+    'reference': ('reference', 'ref', 'transaction reference', 'payment reference', 'narration'),
+    'amount': ('credit', 'credit amount', 'amount', 'deposit'),
+    'date': ('date', 'transaction date', 'value date', 'posted date', 'posting date'),
+    'description': ('description', 'narration', 'details', 'remarks'),
+}
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d-%b-%Y', '%d %b %Y', '%m/%d/%Y', '%Y%m%d')
+
+_NON_ALNUM = re.compile(r'[^A-Z0-9]')
+_OFX_TAG = re.compile(r'<(/?)([A-Z0-9.]+)>([^<\r\n]*)', re.IGNORECASE)
+
+
+def normalize_reference(value):
+    return _NON_ALNUM.sub('', (value or '').upper())
+
+
+def parse_amount(value, scale=100):
+    """Statement amount (e.g. '12,500.00') in the smallest currency unit, or None."""
+    text = (value or '').replace(',', '').replace(' ', '').strip()
+    if not text:
+        return None
+    try:
+        return int((Decimal(text) * scale).to_integral_value())
+    except InvalidOperation:
+        return None
+
+
+@lru_cache(maxsize=4096)
+def parse_date(value):
+    """Parse a statement date; statements repeat few distinct dates, so results are cached."""
+    text = (value or '').strip()
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, date_format).date()
+        except ValueError:
+            continue
+    return None
+
+
+def _pick_column(fieldnames, wanted, candidates):
+    if wanted:
+        return wanted
+    lowered = {name.strip().lower(): name for name in fieldnames}
+    for candidate in candidates:
+        if candidate in lowered:
+            return lowered[candidate]
+    return None
+
+
+def iter_csv_lines(stream, columns=None, amount_scale=100):
+    """Yield credit StatementLines from a CSV export, one row at a time.
+
+    ``columns`` optionally maps reference/amount/date/description to header
+    names; otherwise common bank headers are recognized.
+    """
+    columns = columns or {}
+    reader = csv.DictReader(stream)
+    fieldnames = reader.fieldnames or []
+    picked = {
+        key: _pick_column(fieldnames, columns.get(key), candidates)
+        for key, candidates in CSV_COLUMNS.items()
+    }
+    if not picked['amount'] or not picked['date']:
+        raise ValueError('Statement needs amount and date columns')
+
+    for line_number, row in enumerate(reader, start=2):
+        amount = parse_amount(row.get(picked['amount']), amount_scale)
+        if amount is None or amount <= 0:
+            continue
+        yield StatementLine(
+            line_number,
+            (row.get(picked['reference']) or '') if picked['reference'] else '',
+            amount,
+            parse_date(row.get(picked['date'])),
+            (row.get(picked['description']) or '') if picked['description'] else ''
+        )
+
+
+def iter_ofx_lines(stream, amount_scale=100):
+    """Yield credit StatementLines from an OFX (SGML or XML) export, one STMTTRN at a time."""
+    transaction = None
+    line_number = 0
+    for line_number, text in enumerate(stream, start=1):
+        for closing, tag, value in _OFX_TAG.findall(text):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if closing and transaction is not None:
+                    line = _ofx_line(transaction, amount_scale)
+                    if line:
+                        yield line
+                    transaction = None
+                elif not closing:
+                    transaction = {'_line': line_number}
+            elif transaction is not None and not closing:
+                transaction[tag] = value.strip()
+    if transaction is not None:
+        line = _ofx_line(transaction, amount_scale)
+        if line:
+            yield line
+
+
+def _ofx_line(transaction, amount_scale):
+    amount = parse_amount(transaction.get('TRNAMT'), amount_scale)
+    if amount is None or amount <= 0:
+        return None
+    return StatementLine(
+        transaction['_line'],
+        transaction.get('REFNUM') or transaction.get('CHECKNUM') or transaction.get('FITID', ''),
+        amount,
+        parse_date(transaction.get('DTPOSTED', '')[:8]),
+        ' '.join(filter(None, (transaction.get('NAME'), transaction.get('MEMO'))))
+    )
+
+
+class _PendingIndex:
+    """Hash tables over a school's pending notifications (the build side)."""
+
+    def __init__(self, notifications):
+        self.by_reference = {}
+        self.by_amount_day = {}
+        for notification in notifications:
+            reference = normalize_reference(notification.payment_reference)
+            if reference:
+                self.by_reference.setdefault(reference, []).append(notification)
+            key = (notification.amount, notification.created_at.date())
+            self.by_amount_day.setdefault(key, []).append(notification)
+        self.matched = set()
+
+    @staticmethod
+    def _in_window(notification, posted_on, window):
+        if posted_on is None:
+            return False
+        return abs((notification.created_at.date() - posted_on).days) <= window.days
+
+    def exact(self, line, window):
+        for candidate in self.by_reference.get(normalize_reference(line.reference), ()):
+            if (candidate.id not in self.matched and candidate.amount == line.amount
+                    and self._in_window(candidate, line.posted_on, window)):
+                self.matched.add(candidate.id)
+                return candidate
+        return None
+
+    def fuzzy(self, line, window, limit=3):
+        """Unmatched candidates sharing the reference or the amount, with reasons."""
+        suggestions = []
+        reference = normalize_reference(line.reference)
+        narration = normalize_reference(line.description)
+        for candidate in self.by_reference.get(reference, ()):
+            if candidate.id not in self.matched:
+                reasons = ['reference']
+                reasons.append('amount' if candidate.amount == line.amount else 'amount differs')
+                if not self._in_window(candidate, line.posted_on, window):
+                    reasons.append('outside date window')
+                suggestions.append((candidate, reasons))
+        if line.posted_on is None:
+            return suggestions[:limit]
+        for offset in range(-window.days, window.days + 1):
+            day = line.posted_on + timedelta(days=offset)
+            for candidate in self.by_amount_day.get((line.amount, day), ()):
+                if len(suggestions) >= limit:
+                    return suggestions
+                if candidate.id in self.matched or any(candidate is suggested for suggested, _ in suggestions):
+                    continue
+                candidate_reference = normalize_reference(candidate.payment_reference)
+                if candidate_reference and candidate_reference in narration:
+                    suggestions.append((candidate, ['amount', 'date', 'reference in narration']))
+                else:
+                    suggestions.append((candidate, ['amount', 'date']))
+        return suggestions[:limit]
+
+
+def reconcile_statement(school_id, stream, statement_format='csv', reviewer_id=None, date_window=3,
+                        amount_scale=100, columns=None, apply=True, max_review=1000, batch_size=1000):
+    """Reconcile a bank statement against the school's pending payment notifications.
+
+    A line matches exactly when its normalized reference and amount equal a
+    pending notification's and the notification was raised within
+    ``date_window`` days of the posting date. With ``apply``, exact matches
+    are approved and added to their invoices' amount_paid/balance_due (the
+    caller commits, so it is all one transaction). Lines without an exact
+    match are listed for review with up to three candidate notifications;
+    past ``max_review`` entries further lines are only counted.
+    """
+    if statement_format == 'csv':
+        lines = iter_csv_lines(stream, columns, amount_scale)
+    elif statement_format == 'ofx':
+        lines = iter_ofx_lines(stream, amount_scale)
+    else:
+        raise ValueError('Unsupported statement format: %s' % statement_format)
+
+    pending = db.session.query(
+        PaymentNotification.id, PaymentNotification.invoice_id, PaymentNotification.amount,
+        PaymentNotification.payment_reference, PaymentNotification.created_at
+    ).filter(
+        PaymentNotification.school_id == school_id,
+        PaymentNotification.status == PaymentStatus.PENDING.value,
+        PaymentNotification.is_active == True
+    ).all()
+    index = _PendingIndex(pending)
+    window = timedelta(days=date_window)
+
+    report = {
+        'lines': 0,
+        'matched': 0,
+        'approved': 0,
+        'amount_approved': 0,
+        'invoices_updated': 0,
+        'unmatched': 0,
+        'review': [],
+        'review_truncated': 0,
+        'applied': apply
+    }
+    matches = []
+    for line in lines:
+        report['lines'] += 1
+        notification = index.exact(line, window)
+        if notification is not None:
+            matches.append((notification.id, line.line_number))
+            continue
+        report['unmatched'] += 1
+        if len(report['review']) >= max_review:
+            # Review list is full; remaining lines are only counted
+            report['review_truncated'] += 1
+            continue
+        suggestions = index.fuzzy(line, window)
+        if not suggestions:
+            continue
+        report['review'].append({
+            'line': line.line_number,
+            'reference': line.reference,
+            'amount': line.amount,
+            'posted_on': line.posted_on.isoformat() if line.posted_on else None,
+            'description': line.description,
+            'candidates': [
+                {
+                    'payment_notification_id': str(candidate.id),
+                    'invoice_id': str(candidate.invoice_id),
+                    'reference': candidate.payment_reference,
+                    'amount': candidate.amount,
+                    'created_at': candidate.created_at.isoformat(),
+                    'reasons': reasons
+                }
+                for candidate, reasons in suggestions
+            ]
+        })
+
+    report['matched'] = len(matches)
+    if apply and matches:
+        _approve(school_id, matches, reviewer_id, report, batch_size)
+    return report
+
+
+def _approve(school_id, matches, reviewer_id, report, batch_size):
+    """Approve matched notifications still pending and apply them to their invoices.
+
+    Core updates bypass the model events, so the financial summary deltas
+    (payments moving from pending to approved, and each invoice's before and
+    after contribution) are applied here.
+    """
+    notifications = PaymentNotification.__table__
+    invoices = Invoice.__table__
+    now = datetime.utcnow()
+
+    paid = {}
+    approved = {}
+    for start in range(0, len(matches), batch_size):
+        chunk = matches[start:start + batch_size]
+        result = db.session.execute(
+            notifications.update().where(
+                notifications.c.id.in_([notification_id for notification_id, _ in chunk]),
+                notifications.c.status == PaymentStatus.PENDING.value
+            ).values(
+                status=PaymentStatus.APPROVED.value,
+                reviewed_by=reviewer_id,
+                reviewed_at=now,
+                review_notes='Matched bank statement line',
+                updated_at=now
+            ).returning(notifications.c.invoice_id, notifications.c.amount)
+        )
+        for row in result:
+            report['approved'] += 1
+            report['amount_approved'] += row.amount
+            paid[row.invoice_id] = paid.get(row.invoice_id, 0) + row.amount
+            approved[row.invoice_id] = approved.get(row.invoice_id, 0) + 1
+
+    if not paid:
+        return
+
+    def invoice_rows():
+        return db.session.execute(
+            select(
+                invoices.c.id, invoices.c.academic_year, invoices.c.term, invoices.c.status,
+                invoices.c.total_amount, invoices.c.amount_paid, invoices.c.balance_due, invoices.c.due_date,
+                invoices.c.is_active
+            ).where(invoices.c.id.in_(list(paid))).with_for_update()
+        ).all()
+
+    changes = []
+    aging = []
+    for row in invoice_rows():
+        contribution = FinancialSummary.invoice_contribution(
+            row.status, row.total_amount, row.amount_paid, row.balance_due, row.is_active
+        )
+        changes.append((row.academic_year, row.term, contribution, -1))
+        aging.append((row.due_date, ReceivableAging.invoice_contribution(row.status, row.balance_due, row.is_active), -1))
+        changes.append((row.academic_year, row.term, {
+            'pending_payments': -approved[row.id], 'pending_payment_amount': -paid[row.id],
+            'approved_payments': approved[row.id], 'approved_payment_amount': paid[row.id]
+        }, 1))
+
+    remaining = invoices.c.balance_due - bindparam('paid')
+    db.session.execute(
+        invoices.update().where(invoices.c.id == bindparam('invoice_id')).values(
+            amount_paid=func.coalesce(invoices.c.amount_paid, 0) + bindparam('paid'),
+            balance_due=case((remaining < 0, 0), else_=remaining),
+            status=case((remaining <= 0, InvoiceStatus.PAID.value), else_=invoices.c.status),
+            updated_at=now
+        ),
+        [{'invoice_id': invoice_id, 'paid': amount} for invoice_id, amount in paid.items()]
+    )
+
+    for row in invoice_rows():
+        contribution = FinancialSummary.invoice_contribution(
+            row.status, row.total_amount, row.amount_paid, row.balance_due, row.is_active
+        )
+        changes.append((row.academic_year, row.term, contribution, 1))
+        aging.append((row.due_date, ReceivableAging.invoice_contribution(row.status, row.balance_due, row.is_active), 1))
+    apply_financial_deltas(db.session, school_id, changes)
+    apply_aging_deltas(db.session, school_id, aging)
+    report['invoices_updated'] = len(paid)
+
+
+__all__ = [
+    'reconcile_statement', 'iter_csv_lines', 'iter_ofx_lines', 'StatementLine',
+    'normalize_reference', 'parse_amount'
+]
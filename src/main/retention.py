@@ -0,0 +1,313 @@
+"""
+Retention
+Per-table policies that delete, or move into <table>_archive, rows that
+have expired or aged out: user sessions, activation codes, notifications and
+messages. Each policy walks its table in primary-key order in small batches,
+locking only the rows of the batch (skipping rows others hold), commits after
+every batch, records its keyset position in retention_checkpoints, and can
+sleep between batches and stop after a time budget; the next run resumes
+from the checkpoint. Runs report rows and (estimated) bytes reclaimed.
+
+Policy ages can be overridden with the RETENTION_DAYS config mapping, e.g.
+{'messages': 730}.
+
+Scheduled run: flask run-retention [--policy NAME] [--max-seconds N]
+"""
+from datetime import datetime, timedelta
+import json
+import time
+import uuid
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import Column, DateTime, Index, Table, and_, bindparam, case, func, or_, select
+
+from shared.models.unified_models import (
+    db, ActivationCode, InboxCounter, Message, MessageDelivery, MessageRecipient, Notification,
+    NotificationFeed, RetentionCheckpoint, ThreadParticipant, UserSession
+)
+
+
+ROW_OVERHEAD_BYTES = 24  # tuple header + item pointer
+
+
+def archive_table(model):
+    """``<table>_archive`` with the model's columns (no foreign keys) plus archived_at."""
+    source = model.__table__
+    name = '%s_archive' % source.name
+    if name in db.metadata.tables:
+        return db.metadata.tables[name]
+    columns = [
+        Column(column.name, column.type, primary_key=column.primary_key, nullable=not column.primary_key)
+        for column in source.columns
+    ]
+    columns.append(Column('archived_at', DateTime, nullable=False))
+    indexes = []
+    if 'school_id' in source.columns:
+        indexes.append(Index('idx_%s_school_created' % name, 'school_id', 'created_at'))
+    return Table(name, db.metadata, *(columns + indexes))
+
+
+def estimate_row_bytes(row):
+    """Approximate on-disk size of a fetched row (values plus tuple overhead)."""
+    size = ROW_OVERHEAD_BYTES
+    for value in row:
+        if value is None:
+            continue
+        if isinstance(value, (str, bytes)):
+            size += len(value) + 1
+        elif isinstance(value, bool):
+            size += 1
+        elif isinstance(value, uuid.UUID):
+            size += 16
+        elif isinstance(value, (dict, list)):
+            size += len(json.dumps(value, default=str)) + 1
+        else:
+            size += 8
+    return size
+
+
+class RetentionPolicy:
+    """What to remove from one table and how.
+
+    ``condition(now, days)`` returns the SQL predicate for removable rows;
+    ``days`` is the policy's age, overridable through RETENTION_DAYS.
+    ``before_remove(ids)`` runs in the batch's transaction before the rows
+    go, for dependent rows. With ``archive`` rows are copied to the
+    model's archive table first.
+    """
+
+    def __init__(self, name, model, condition, days, archive=False, before_remove=None):
+        self.name = name
+        self.model = model
+        self.condition = condition
+        self.days = days
+        self.archive = archive
+        self.before_remove = before_remove
+        self.archive_table = archive_table(model) if archive else None
+
+    def age_days(self):
+        overrides = current_app.config.get('RETENTION_DAYS') or {}
+        return overrides.get(self.name, self.days)
+
+
+# ============================================================================
+# DEPENDENT ROWS
+# ============================================================================
+
+def _remove_message_dependents(message_ids):
+    """Drop recipients and delivery jobs of messages, keeping unread counters right."""
+    recipients = MessageRecipient.__table__
+    messages = Message.__table__
+    unread = db.session.execute(
+        select(
+            recipients.c.school_id, recipients.c.recipient_id, messages.c.thread_id,
+            func.count().label('unread')
+        ).select_from(
+            recipients.join(messages, messages.c.id == recipients.c.message_id)
+        ).where(
+            recipients.c.message_id.in_(message_ids),
+            recipients.c.is_read == False
+        ).group_by(recipients.c.school_id, recipients.c.recipient_id, messages.c.thread_id)
+    ).all()
+    if unread:
+        now = datetime.utcnow()
+        for table, condition in (
+            (ThreadParticipant.__table__, ThreadParticipant.__table__.c.thread_id == bindparam('thread')),
+            (InboxCounter.__table__, True)
+        ):
+            remaining = table.c.unread_count - bindparam('unread')
+            db.session.execute(
+                table.update().where(
+                    table.c.school_id == bindparam('school'),
+                    table.c.user_id == bindparam('user'),
+                    condition
+                ).values(unread_count=case((remaining < 0, 0), else_=remaining), updated_at=now),
+                [
+                    {'school': row.school_id, 'user': row.recipient_id, 'thread': row.thread_id, 'unread': row.unread}
+                    for row in unread
+                ]
+            )
+        from shared.models.messaging import unread_counter_cache
+        for row in unread:
+            unread_counter_cache.invalidate(row.school_id, [row.recipient_id])
+    db.session.execute(recipients.delete().where(recipients.c.message_id.in_(message_ids)))
+    deliveries = MessageDelivery.__table__
+    db.session.execute(deliveries.delete().where(deliveries.c.message_id.in_(message_ids)))
+
+
+def _remove_notification_dependents(notification_ids):
+    feeds = NotificationFeed.__table__
+    db.session.execute(feeds.delete().where(feeds.c.notification_id.in_(notification_ids)))
+
+
+POLICIES = (
+    RetentionPolicy(
+        'user_sessions', UserSession, days=7,
+        condition=lambda now, days: UserSession.expires_at < now - timedelta(days=days)
+    ),
+    RetentionPolicy(
+        'activation_codes', ActivationCode, days=1,
+        condition=lambda now, days: or_(
+            ActivationCode.expires_at < now - timedelta(days=days),
+            and_(ActivationCode.is_used == True, ActivationCode.updated_at < now - timedelta(days=days))
+        )
+    ),
+    RetentionPolicy(
+        'notifications', Notification, days=90, archive=True,
+        before_remove=_remove_notification_dependents,
+        # Expired ones go right away, the rest after ``days``
+        condition=lambda now, days: or_(
+            Notification.expires_at < now,
+            Notification.created_at < now - timedelta(days=days)
+        )
+    ),
+    RetentionPolicy(
+        'messages', Message, days=365, archive=True,
+        before_remove=_remove_message_dependents,
+        condition=lambda now, days: Message.sent_at < now - timedelta(days=days)
+    ),
+)
+POLICIES_BY_NAME = {policy.name: policy for policy in POLICIES}
+
+
+# ============================================================================
+# ENGINE
+# ============================================================================
+
+def _checkpoint(policy):
+    checkpoint = RetentionCheckpoint.query.filter_by(policy=policy.name).first()
+    if checkpoint is None:
+        checkpoint = RetentionCheckpoint(policy=policy.name, rows_removed=0, bytes_reclaimed=0)
+        db.session.add(checkpoint)
+        db.session.flush()
+    return checkpoint
+
+
+def run_policy(policy, batch_size=500, pause=0, deadline=None, max_batches=None, now=None):
+    """Apply one policy from its checkpoint until the table is done or the budget runs out.
+
+    ``deadline`` is a time.monotonic() value. Every batch is its own
+    transaction. Returns {'rows', 'bytes', 'batches', 'complete'}.
+    """
+    if isinstance(policy, str):
+        policy = POLICIES_BY_NAME[policy]
+    table = policy.model.__table__
+    now = now or datetime.utcnow()
+    condition = policy.condition(now, policy.age_days())
+    checkpoint = _checkpoint(policy)
+    if checkpoint.last_key is None:
+        checkpoint.pass_started_at = now
+    last_key = uuid.UUID(checkpoint.last_key) if checkpoint.last_key else None
+    db.session.commit()
+
+    report = {'rows': 0, 'bytes': 0, 'batches': 0, 'complete': False}
+    while True:
+        if max_batches is not None and report['batches'] >= max_batches:
+            break
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+        query = select(table).where(condition)
+        if last_key is not None:
+            query = query.where(table.c.id > last_key)
+        rows = db.session.execute(
+            query.order_by(table.c.id).limit(batch_size).with_for_update(skip_locked=True)
+        ).all()
+        ids = [row.id for row in rows]
+        reclaimed = 0
+        if ids:
+            if policy.archive:
+                archived_at = datetime.utcnow()
+                db.session.execute(policy.archive_table.insert(), [
+                    dict(row._mapping, archived_at=archived_at) for row in rows
+                ])
+            if policy.before_remove:
+                policy.before_remove(ids)
+            db.session.execute(table.delete().where(table.c.id.in_(ids)))
+            reclaimed = sum(estimate_row_bytes(row) for row in rows)
+            last_key = ids[-1]
+            report['rows'] += len(ids)
+            report['bytes'] += reclaimed
+            report['batches'] += 1
+
+        checkpoint = _checkpoint(policy)
+        checkpoint.last_run_at = datetime.utcnow()
+        checkpoint.rows_removed = (checkpoint.rows_removed or 0) + len(ids)
+        checkpoint.bytes_reclaimed = (checkpoint.bytes_reclaimed or 0) + reclaimed
+        report['complete'] = len(ids) < batch_size
+        if report['complete']:
+            # End of the table: the next run starts a fresh pass
+            checkpoint.last_key = None
+            checkpoint.last_completed_at = checkpoint.last_run_at
+        else:
+            checkpoint.last_key = str(last_key)
+        db.session.commit()
+        if report['complete']:
+            break
+        if pause:
+            time.sleep(pause)
+    return report
+
+
+def run_retention(policies=None, batch_size=500, pause=0, max_seconds=None):
+    """Run the given policy names (default: all) in order under one time budget.
+
+    Returns {policy name: report} plus a 'total' entry.
+    """
+    deadline = time.monotonic() + max_seconds if max_seconds else None
+    results = {}
+    for name in policies or [policy.name for policy in POLICIES]:
+        results[name] = run_policy(POLICIES_BY_NAME[name], batch_size=batch_size, pause=pause, deadline=deadline)
+    results['total'] = {
+        'rows': sum(report['rows'] for report in results.values()),
+        'bytes': sum(report['bytes'] for report in results.values())
+    }
+    return results
+
+
+def pending_counts(now=None):
+    """Rows each policy would remove right now (one COUNT per table)."""
+    now = now or datetime.utcnow()
+    return {
+        policy.name: db.session.execute(
+            select(func.count()).select_from(policy.model.__table__).where(policy.condition(now, policy.age_days()))
+        ).scalar()
+        for policy in POLICIES
+    }
+
+
+@click.command('run-retention')
+@click.option('--policy', 'policies', multiple=True, type=click.Choice(sorted(POLICIES_BY_NAME)),
+              help='Run only these policies (repeatable).')
+@click.option('--batch-size', default=500, show_default=True)
+@click.option('--pause', default=0.0, show_default=True, help='Seconds to sleep between batches.')
+@click.option('--max-seconds', default=None, type=float, help='Stop after this long; the next run resumes.')
+@click.option('--dry-run', is_flag=True, help='Only count removable rows.')
+@with_appcontext
+def run_retention_command(policies, batch_size, pause, max_seconds, dry_run):
+    """Delete or archive expired sessions, codes, notifications and messages."""
+    if dry_run:
+        for name, count in pending_counts().items():
+            if not policies or name in policies:
+                click.echo('%-18s %d rows' % (name, count))
+        return
+    results = run_retention(list(policies) or None, batch_size, pause, max_seconds)
+    for name, report in results.items():
+        if name == 'total':
+            continue
+        click.echo('%-18s %d rows, %.1f KB in %d batches%s' % (
+            name, report['rows'], report['bytes'] / 1024.0, report['batches'],
+            '' if report['complete'] else ' (paused, will resume)'
+        ))
+    click.echo('total              %d rows, %.1f KB' % (results['total']['rows'], results['total']['bytes'] / 1024.0))
+
+
+def register_commands(app):
+    app.cli.add_command(run_retention_command)
+
+
+__all__ = [
+    'RetentionPolicy', 'POLICIES', 'POLICIES_BY_NAME', 'run_policy', 'run_retention', 'pending_counts',
+    'archive_table', 'estimate_row_bytes', 'register_commands'
+]
@@ -0,0 +1,220 @@
+"""
+Score Sheet Upsert
+Saves a whole class's CA1/CA2/exam scores for one class subject with a single
+INSERT ... ON CONFLICT statement per table (PostgreSQL). Totals and grades
+(from the school's GradingScheme) are stored with the scores.
+"""
+from datetime import datetime
+import uuid
+
+from sqlalchemy import case, func, literal_column, or_, select
+from sqlalchemy.dialects.postgresql import insert
+
+from shared.models.grading import grade_case
+from shared.models.unified_models import (
+    db, Assessment, SubjectScore, ClassSubject, GradingScheme, grade_for_total
+)
+
+
+SCORE_COMPONENTS = ('first_ca', 'second_ca', 'exam')
+MAX_TOTAL_SCORE = 100
+
+
+def _validate(row, limits):
+    """Validate one sheet row, returning (clean values, errors)."""
+    errors = []
+    admission_number = (row.get('admission_number') or '').strip()
+    if not admission_number:
+        errors.append('admission_number is required')
+
+    values = {}
+    for component in SCORE_COMPONENTS:
+        value = row.get(component)
+        if value is None or value == '':
+            values[component] = None
+            continue
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            errors.append('%s must be a number' % component)
+            continue
+        if value < 0:
+            errors.append('%s cannot be negative' % component)
+        elif limits and component in limits and value > limits[component]:
+            errors.append('%s cannot exceed %s' % (component, limits[component]))
+        values[component] = value
+
+    total = sum(values.get(component) or 0 for component in SCORE_COMPONENTS)
+    if total > MAX_TOTAL_SCORE:
+        errors.append('total score cannot exceed %s' % MAX_TOTAL_SCORE)
+
+    values['admission_number'] = admission_number
+    values['student_id'] = row.get('student_id')
+    values['remarks'] = row.get('remarks') or None
+    values['total_score'] = total
+    return values, errors
+
+
+def save_score_sheet(school_id, class_subject_id, session, term, rows, limits=None):
+    """Upsert assessments and subject scores for every row of a score sheet.
+
+    ``rows`` are dicts with admission_number, optional student_id, first_ca,
+    second_ca, exam and remarks. A blank component keeps the stored score
+    (0 for a new row) and blank remarks keep the stored remarks; the
+    MAX_TOTAL_SCORE cap applies to the merged scores. ``limits`` optionally
+    caps each component, e.g. {'first_ca': 20, 'second_ca': 20, 'exam': 60}.
+
+    Returns one result per input row, in order, with a status of 'inserted',
+    'updated', 'unchanged' or 'invalid' (plus 'errors'). The caller commits.
+    """
+    class_subject = ClassSubject.get_by_id_and_school(class_subject_id, school_id)
+    if not class_subject:
+        raise ValueError('Class subject not found for this school')
+
+    results = []
+    valid = {}
+    valid_results = {}
+    for index, row in enumerate(rows):
+        values, errors = _validate(row, limits)
+        if not errors and values['admission_number'] in valid:
+            errors.append('duplicate admission_number in sheet')
+        result = {'row': index, 'admission_number': values['admission_number'],
+                  'status': 'invalid' if errors else 'unchanged', 'errors': errors}
+        results.append(result)
+        if not errors:
+            valid[values['admission_number']] = values
+            valid_results[values['admission_number']] = result
+    if not valid:
+        return results
+
+    # Blank cells keep stored scores, so the total cap applies to the merged row
+    assessment_table = Assessment.__table__
+    score_table = SubjectScore.__table__
+    stored = db.session.execute(
+        select(
+            assessment_table.c.admission_number,
+            *[score_table.c[component] for component in SCORE_COMPONENTS]
+        ).select_from(
+            score_table.join(assessment_table, assessment_table.c.id == score_table.c.assessment_id)
+        ).where(
+            assessment_table.c.school_id == school_id,
+            assessment_table.c.admission_number.in_(list(valid)),
+            assessment_table.c.session == session,
+            assessment_table.c.term == term,
+            score_table.c.class_subject_id == class_subject.id
+        ).order_by(assessment_table.c.admission_number).with_for_update(of=score_table)
+    )
+    for row in stored:
+        values = valid[row.admission_number]
+        total = sum(
+            (values[component] if values[component] is not None else getattr(row, component)) or 0
+            for component in SCORE_COMPONENTS
+        )
+        if total > MAX_TOTAL_SCORE:
+            del valid[row.admission_number]
+            valid_results[row.admission_number].update(
+                status='invalid', errors=['total score with stored scores cannot exceed %s' % MAX_TOTAL_SCORE]
+            )
+    if not valid:
+        return results
+
+    now = datetime.utcnow()
+    boundaries = GradingScheme.boundaries_for_school(school_id)
+
+    # 1. Assessments: one row per student for the term. Rows go in key order
+    # so concurrent sheets for the same class lock them in the same order
+    assessment_insert = insert(Assessment.__table__).values([
+        {
+            'id': uuid.uuid4(),
+            'school_id': school_id,
+            'admission_number': admission_number,
+            'student_id': values['student_id'],
+            'session': session,
+            'term': term,
+            'created_at': now,
+            'updated_at': now,
+            'is_active': True
+        }
+        for admission_number, values in sorted(valid.items())
+    ])
+    assessment_statement = assessment_insert.on_conflict_do_update(
+        constraint='uq_assessment_school_student_term',
+        set_={
+            'student_id': func.coalesce(assessment_insert.excluded.student_id, assessment_table.c.student_id),
+            'is_active': True
+        }
+    ).returning(assessment_table.c.id, assessment_table.c.admission_number)
+    assessment_ids = {
+        row.admission_number: row.id
+        for row in db.session.execute(assessment_statement)
+    }
+
+    # 2. Subject scores: update only rows whose values actually changed
+    score_insert = insert(score_table).values([
+        {
+            'id': uuid.uuid4(),
+            'school_id': school_id,
+            'assessment_id': assessment_ids[admission_number],
+            'class_subject_id': class_subject.id,
+            'subject_id': class_subject.subject_id,
+            'first_ca': values['first_ca'] or 0.0,
+            'second_ca': values['second_ca'] or 0.0,
+            'exam': values['exam'] or 0.0,
+            'total_score': values['total_score'],
+            'grade': grade_for_total(values['total_score'], boundaries),
+            'remarks': values['remarks'],
+            'created_at': now,
+            'updated_at': now,
+            'is_active': True
+        }
+        for admission_number, values in sorted(valid.items(), key=lambda item: assessment_ids[item[0]])
+    ])
+    excluded = score_insert.excluded
+    new_values = {}
+    for component in SCORE_COMPONENTS + ('remarks',):
+        # Blank cells keep the stored value instead of overwriting it
+        blank = [assessment_ids[admission_number] for admission_number, values in valid.items()
+                 if values[component] is None]
+        if not blank:
+            new_values[component] = excluded[component]
+        elif len(blank) == len(valid):
+            new_values[component] = score_table.c[component]
+        else:
+            new_values[component] = case(
+                (excluded.assessment_id.in_(blank), score_table.c[component]),
+                else_=excluded[component]
+            )
+    new_values['is_active'] = True
+    total = sum(new_values[component] for component in SCORE_COMPONENTS)
+    score_statement = score_insert.on_conflict_do_update(
+        constraint='uq_subject_score_assessment_subject',
+        set_=dict(
+            new_values,
+            total_score=total,
+            grade=grade_case(total, boundaries),
+            updated_at=excluded.updated_at
+        ),
+        where=or_(*[
+            score_table.c[column].is_distinct_from(value)
+            for column, value in new_values.items()
+            if value is not score_table.c[column]
+        ])
+    ).returning(
+        score_table.c.assessment_id,
+        # xmax is 0 only for freshly inserted rows
+        literal_column('(xmax = 0)').label('inserted')
+    )
+    statuses = {
+        row.assessment_id: 'inserted' if row.inserted else 'updated'
+        for row in db.session.execute(score_statement)
+    }
+
+    for result in results:
+        if result['status'] != 'invalid':
+            status = statuses.get(assessment_ids[result['admission_number']])
+            if status:
+                result['status'] = status
+    return results
+
+
+__all__ = ['save_score_sheet', 'SCORE_COMPONENTS', 'MAX_TOTAL_SCORE']
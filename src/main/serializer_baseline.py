@@ -0,0 +1,788 @@
+"""
+Serializer Baseline
+The hand-written to_dict methods the models had before serialization moved
+to compiled SPECS layouts, kept verbatim as plain functions so
+serializer_benchmark can check the compiled serializers against them.
+Not used at runtime.
+"""
+
+
+def _school(self):
+    return {
+        'id': str(self.id),
+        'name': self.name,
+        'slug': self.slug,
+        'email': self.email,
+        'phone': self.phone,
+        'website': self.website,
+        'address': {
+            'line1': self.address_line1,
+            'line2': self.address_line2,
+            'city': self.city,
+            'state': self.state,
+            'postal_code': self.postal_code,
+            'country': self.country
+        },
+        'domain': {
+            'subdomain': self.subdomain,
+            'custom_domain': self.custom_domain,
+            'ssl_enabled': self.ssl_enabled
+        },
+        'status': self.status,
+        'settings': {
+            'timezone': self.timezone,
+            'currency': self.currency,
+            'language': self.language,
+            'academic_year_start': self.academic_year_start,
+            'academic_year_end': self.academic_year_end,
+            'current_academic_year': self.current_academic_year
+        },
+        'branding': {
+            'logo_url': self.logo_url,
+            'banner_url': self.banner_url,
+            'primary_color': self.primary_color,
+            'secondary_color': self.secondary_color,
+            'motto': self.school_motto
+        },
+        'features_enabled': self.features_enabled or {},
+        'admin': {
+            'user_id': str(self.admin_user_id) if self.admin_user_id else None,
+            'name': self.admin_name,
+            'email': self.admin_email,
+            'phone': self.admin_phone
+        },
+        'created_at': self.created_at.isoformat() if self.created_at else None,
+        'updated_at': self.updated_at.isoformat() if self.updated_at else None
+    }
+
+
+def _user(self, include_sensitive=False):
+    return {
+        'id': str(self.id),
+        'phoneNumber': self.phone_number,
+        'phone_number': self.phone_number if include_sensitive else None,
+        'email': self.email,
+        'first_name': self.first_name,
+        'last_name': self.last_name,
+        'middle_name': self.middle_name,
+        'full_name': self.full_name,
+        'profile': {
+            'firstName': self.first_name,
+            'lastName': self.last_name,
+            'email': self.email,
+            'avatar': self.profile_picture_url
+        },
+        'date_of_birth': self.date_of_birth.isoformat() if self.date_of_birth else None,
+        'gender': self.gender,
+        'profile_picture_url': self.profile_picture_url,
+        'address': {
+            'line1': self.address_line1,
+            'line2': self.address_line2,
+            'city': self.city,
+            'state': self.state,
+            'postal_code': self.postal_code,
+            'country': self.country
+        } if self.address_line1 else None,
+        'status': self.status,
+        'is_verified': self.is_verified,
+        'last_login_at': self.last_login_at.isoformat() if self.last_login_at else None,
+        'metadata': self.user_metadata or {},
+        'created_at': self.created_at.isoformat() if self.created_at else None,
+        'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        'schools': []  # Placeholder for frontend compatibility
+    }
+
+
+def _role(self):
+    return {
+        'id': str(self.id),
+        'name': self.name,
+        'role_type': self.role_type,
+        'description': self.description,
+        'permissions': self.permissions or [],
+        'is_system_role': self.is_system_role,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _user_school_role(self):
+    return {
+        'id': str(self.id),
+        'user_id': str(self.user_id),
+        'school_id': str(self.school_id),
+        'role_id': str(self.role_id),
+        'role': self.role.to_dict() if self.role else None,
+        'assigned_by': str(self.assigned_by) if self.assigned_by else None,
+        'assigned_at': self.assigned_at.isoformat() if self.assigned_at else None,
+        'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+        'is_primary': self.is_primary,
+        'role_data': self.role_data or {},
+        'is_active': self.is_active
+    }
+
+
+def _student(self, include_classes=False, academic_year=None, include_user=True):
+    result = {
+        'id': str(self.id),
+        'user_id': str(self.user_id),
+        'school_id': str(self.school_id),
+        'student_id': self.student_id,
+        'admission_number': self.admission_number,
+        'admission_date': self.admission_date.isoformat() if self.admission_date else None,
+        'graduation_date': self.graduation_date.isoformat() if self.graduation_date else None,
+        'academic_status': self.academic_status,
+        'current_grade_level': self.current_grade_level,
+        'previous_school': self.previous_school,
+        'has_special_needs': self.has_special_needs,
+        'special_needs_description': self.special_needs_description,
+        'transportation_method': self.transportation_method,
+        'is_active': self.is_active,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+    # Include user information if requested
+    if include_user and self.user:
+        result['user'] = {
+            'first_name': self.user.first_name,
+            'last_name': self.user.last_name,
+            'middle_name': self.user.middle_name,
+            'email': self.user.email,
+            'phone_number': self.user.phone_number,
+            'date_of_birth': self.user.date_of_birth.isoformat() if self.user.date_of_birth else None,
+            'gender': self.user.gender
+        }
+        # Also add direct access for backward compatibility
+        result['first_name'] = self.user.first_name
+        result['last_name'] = self.user.last_name
+        result['full_name'] = self.user.full_name
+        result['email'] = self.user.email
+
+    # Include class information if requested
+    if include_classes:
+        try:
+            enrollments = self.get_current_classes(academic_year)
+            result['class_enrollments'] = [enrollment.to_dict() for enrollment in enrollments]
+
+            # For backward compatibility, include primary class info
+            primary_enrollment = enrollments[0] if enrollments else None
+            if primary_enrollment:
+                result['class_id'] = str(primary_enrollment.class_id)
+                result['primary_class'] = primary_enrollment.to_dict()
+            else:
+                result['class_id'] = None
+                result['primary_class'] = None
+        except:
+            result['class_enrollments'] = []
+            result['class_id'] = None
+            result['primary_class'] = None
+
+    return result
+
+
+def _parent(self):
+    return {
+        'id': str(self.id),
+        'user_id': str(self.user_id),
+        'school_id': str(self.school_id),
+        'relationship_type': self.relationship_type,
+        'is_primary_contact': self.is_primary_contact,
+        'is_emergency_contact': self.is_emergency_contact,
+        'is_financially_responsible': self.is_financially_responsible,
+        'communication_preferences': {
+            'receive_academic_updates': self.receive_academic_updates,
+            'receive_financial_updates': self.receive_financial_updates,
+            'receive_disciplinary_updates': self.receive_disciplinary_updates
+        },
+        'is_active': self.is_active,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _staff(self):
+    result = {
+        'id': str(self.id),
+        'user_id': str(self.user_id),
+        'school_id': str(self.school_id),
+        'staff_id': self.staff_id,
+        'employee_number': self.employee_number,
+        'designation': self.designation,
+        'hire_date': self.hire_date.isoformat() if self.hire_date else None,
+        'termination_date': self.termination_date.isoformat() if self.termination_date else None,
+        'employment_status': self.employment_status,
+        'employment_type': self.employment_type,
+        'highest_degree': self.highest_degree,
+        'certifications': self.certifications or [],
+        'subjects_taught': self.subjects_taught or [],
+        'grade_levels_taught': self.grade_levels_taught or [],
+        'department': self.department,
+        'track_id': None,  # TODO: Derive from department lookup
+        'is_subject_teacher': self.is_subject_teacher,
+        'is_class_teacher': self.is_class_teacher,
+        'class_teacher_for': str(self.class_teacher_for) if self.class_teacher_for else None,
+        'years_of_experience': self.years_of_experience,
+        'bank_name': self.bank_name,
+        'account_name': self.account_name,
+        'account_number': self.account_number,
+        'monthly_deduction': self.monthly_deduction,
+        'is_active': self.is_active,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+    # Include user information
+    if self.user:
+        result['first_name'] = self.user.first_name
+        result['last_name'] = self.user.last_name
+        result['middle_name'] = self.user.middle_name
+        result['full_name'] = self.user.full_name
+        result['email'] = self.user.email
+        result['phone_number'] = self.user.phone_number
+
+    return result
+
+
+def _education_track(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'name': self.name,
+        'description': self.description,
+        'is_active': self.is_active,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _department(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'name': self.name,
+        'track_id': str(self.track_id) if self.track_id else None,
+        'description': self.description,
+        'is_active': self.is_active,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _class(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'name': self.class_name,
+        'class_name': self.class_name,
+        'class_code': self.class_code,
+        'code': self.class_code,
+        'grade_level': self.grade_level,
+        'department_id': str(self.department_id) if self.department_id else None,
+        'track_id': str(self.track_id) if self.track_id else None,
+        'academic_year': self.academic_year,
+        'term': self.term,
+        'max_capacity': self.max_capacity,
+        'capacity': self.max_capacity,
+        'current_enrollment': self.current_enrollment,
+        'classroom_location': self.classroom_location,
+        'location': self.classroom_location,
+        'room_number': self.classroom_location,
+        'class_staff_id': str(self.class_staff_id) if self.class_staff_id else None,
+        'class_teacher_id': str(self.class_staff_id) if self.class_staff_id else None,  # Backward compatibility
+        'is_active': self.is_active,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _subject(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'name': self.subject_name,
+        'subject_name': self.subject_name,
+        'subject_code': self.subject_code,
+        'code': self.subject_code,
+        'description': self.description,
+        'is_core': self.is_core,
+        'credit_hours': self.credit_hours,
+        'category': self.category,
+        'academic_year': self.academic_year,
+        'is_active': self.is_active,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _class_subject(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'class_id': str(self.class_id),
+        'subject_id': str(self.subject_id),
+        'staff_id': str(self.staff_id) if self.staff_id else None,
+        'teacher_id': str(self.staff_id) if self.staff_id else None,  # Backward compatibility
+        'assigned_by': str(self.assigned_by) if self.assigned_by else None,
+        'assigned_at': self.assigned_at.isoformat() if self.assigned_at else None,
+        'class': self.class_obj.to_dict() if self.class_obj else None,
+        'subject': self.subject.to_dict() if self.subject else None,
+        'staff': self.staff.to_dict() if self.staff else None,
+        'teacher': self.staff.to_dict() if self.staff else None,  # Backward compatibility
+        'is_active': self.is_active,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _student_classes(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'student_id': str(self.student_id),
+        'class_id': str(self.class_id),
+        'track_id': str(self.track_id),
+        'admission_number': self.admission_number,
+        'academic_year': self.academic_year,
+        'term': self.term,
+        'enrollment_date': self.enrollment_date.isoformat() if self.enrollment_date else None,
+        'student': self.student.to_dict() if self.student else None,
+        'class': self.class_obj.to_dict() if self.class_obj else None,
+        'track': self.track.to_dict() if self.track else None,
+        'is_active': self.is_active,
+        'created_at': self.created_at.isoformat() if self.created_at else None,
+        'updated_at': self.updated_at.isoformat() if self.updated_at else None
+    }
+
+
+def _attendance(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'student_id': str(self.student_id),
+        'class_id': str(self.class_id),
+        'staff_id': str(self.staff_id),
+        'teacher_id': str(self.staff_id),  # Backward compatibility
+        'attendance_date': self.attendance_date.isoformat() if self.attendance_date else None,
+        'status': self.status,
+        'arrival_time': self.arrival_time.isoformat() if self.arrival_time else None,
+        'departure_time': self.departure_time.isoformat() if self.departure_time else None,
+        'notes': self.notes,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _exam(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'exam_name': self.exam_name,
+        'subject': self.subject,
+        'class_id': str(self.class_id),
+        'staff_id': str(self.staff_id),
+        'teacher_id': str(self.staff_id),  # Backward compatibility
+        'exam_date': self.exam_date.isoformat() if self.exam_date else None,
+        'duration_minutes': self.duration_minutes,
+        'total_marks': self.total_marks,
+        'passing_marks': self.passing_marks,
+        'exam_type': self.exam_type,
+        'term': self.term,
+        'academic_year': self.academic_year,
+        'is_active': self.is_active,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _exam_result(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'exam_id': str(self.exam_id),
+        'student_id': str(self.student_id),
+        'marks_obtained': self.marks_obtained,
+        'grade': self.grade,
+        'percentage': self.percentage,
+        'position': self.position,
+        'graded_by': str(self.graded_by),
+        'graded_at': self.graded_at.isoformat() if self.graded_at else None,
+        'remarks': self.remarks,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _student_feedback(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'student_id': str(self.student_id),
+        'staff_id': str(self.staff_id),
+        'teacher_id': str(self.staff_id),  # Backward compatibility
+        'feedback_type': self.feedback_type,
+        'subject': self.subject,
+        'content': self.content,
+        'rating': self.rating,
+        'feedback_date': self.feedback_date.isoformat() if self.feedback_date else None,
+        'term': self.term,
+        'academic_year': self.academic_year,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _assessment(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'admission_number': self.admission_number,
+        'student_id': str(self.student_id) if self.student_id else None,
+        'session': self.session,
+        'term': self.term,
+        'attendance': self.attendance,
+        'fluency': self.fluency,
+        'handwriting': self.handwriting,
+        'game': self.game,
+        'initiative': self.initiative,
+        'critical_thinking': self.critical_thinking,
+        'punctuality': self.punctuality,
+        'attentiveness': self.attentiveness,
+        'neatness': self.neatness,
+        'self_discipline': self.self_discipline,
+        'politeness': self.politeness,
+        'class_teacher_comment': self.class_teacher_comment,
+        'head_teacher_comment': self.head_teacher_comment,
+        'scores': [score.to_dict() for score in self.scores] if self.scores else [],
+        'created_at': self.created_at.isoformat() if self.created_at else None,
+        'updated_at': self.updated_at.isoformat() if self.updated_at else None
+    }
+
+
+def _subject_score(self):
+    # Calculate total score and grade on-the-fly
+    total = self.first_ca + self.second_ca + self.exam
+
+    # Calculate grade based on total score
+    if total >= 90:
+        grade = 'A+'
+    elif total >= 70:
+        grade = 'A'
+    elif total >= 60:
+        grade = 'B'
+    elif total >= 50:
+        grade = 'C'
+    elif total >= 45:
+        grade = 'D'
+    elif total >= 40:
+        grade = 'E'
+    else:
+        grade = 'F'
+
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'assessment_id': str(self.assessment_id),
+        'class_subject_id': str(self.class_subject_id),
+        'subject_id': str(self.subject_id) if self.subject_id else None,
+        'first_ca': self.first_ca,
+        'second_ca': self.second_ca,
+        'exam': self.exam,
+        'total_score': total,
+        'grade': grade,
+        'position': self.position,
+        'remarks': self.remarks,
+        'created_at': self.created_at.isoformat() if self.created_at else None,
+        'updated_at': self.updated_at.isoformat() if self.updated_at else None
+    }
+
+
+def _fee_structure(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'fee_name': self.fee_name,
+        'fee_type': self.fee_type,
+        'amount': self.amount,
+        'grade_levels': self.grade_levels or [],
+        'is_mandatory': self.is_mandatory,
+        'is_recurring': self.is_recurring,
+        'due_date': self.due_date.isoformat() if self.due_date else None,
+        'academic_year': self.academic_year,
+        'term': self.term,
+        'is_active': self.is_active,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _invoice(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'student_id': str(self.student_id),
+        'parent_id': str(self.parent_id),
+        'invoice_number': self.invoice_number,
+        'total_amount': self.total_amount,
+        'amount_paid': self.amount_paid,
+        'balance_due': self.balance_due,
+        'issue_date': self.issue_date.isoformat() if self.issue_date else None,
+        'due_date': self.due_date.isoformat() if self.due_date else None,
+        'status': self.status,
+        'term': self.term,
+        'academic_year': self.academic_year,
+        'notes': self.notes,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _payment_notification(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'invoice_id': str(self.invoice_id),
+        'parent_id': str(self.parent_id),
+        'amount': self.amount,
+        'payment_method': self.payment_method,
+        'payment_reference': self.payment_reference,
+        'proof_of_payment_url': self.proof_of_payment_url,
+        'notes': self.notes,
+        'status': self.status,
+        'reviewed_by': str(self.reviewed_by) if self.reviewed_by else None,
+        'reviewed_at': self.reviewed_at.isoformat() if self.reviewed_at else None,
+        'review_notes': self.review_notes,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _message_thread(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'subject': self.subject,
+        'thread_type': self.thread_type,
+        'participants': self.participants or [],
+        'last_message_at': self.last_message_at.isoformat() if self.last_message_at else None,
+        'message_count': self.message_count,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _message(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'thread_id': str(self.thread_id),
+        'sender_id': str(self.sender_id),
+        'content': self.content,
+        'message_type': self.message_type,
+        'attachments': self.attachments or [],
+        'sent_at': self.sent_at.isoformat() if self.sent_at else None,
+        'priority': self.priority,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _notification(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'title': self.title,
+        'content': self.content,
+        'notification_type': self.notification_type,
+        'recipients': self.recipients or [],
+        'priority': self.priority,
+        'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _examination(self):
+    # Get track and department names through class relationship
+    track_name = None
+    department_name = None
+    if self.class_obj:
+        if hasattr(self.class_obj, 'department') and self.class_obj.department:
+            department_name = self.class_obj.department.name
+            if hasattr(self.class_obj.department, 'track') and self.class_obj.department.track:
+                track_name = self.class_obj.department.track.name
+
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'title': self.title,
+        'exam_type': self.exam_type,
+        'subject_id': str(self.subject_id),
+        'subject_name': self.subject.subject_name if self.subject else None,
+        'class_id': str(self.class_id),
+        'class_name': self.class_obj.class_name if self.class_obj else None,
+        'track_name': track_name,
+        'department_name': department_name,
+        'term': self.term,
+        'session': self.session,
+        'created_by': str(self.created_by),
+        'is_published': self.is_published,
+        'start_time': self.start_time.isoformat() + 'Z' if self.start_time else None,
+        'end_time': self.end_time.isoformat() + 'Z' if self.end_time else None,
+        'duration_minutes': self.duration_minutes,
+        'total_marks': self.total_marks,
+        'question_count': len(self.questions),
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _question(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'examination_id': str(self.examination_id),
+        'instruction': self.instruction,
+        'question_text': self.question_text,
+        'question_image_url': self.question_image_url,
+        'options': {
+            'A': self.option_a,
+            'B': self.option_b,
+            'C': self.option_c,
+            'D': self.option_d,
+            'E': self.option_e
+        },
+        'correct_answer': self.correct_answer,
+        'marks': self.marks,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _examination_submission(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'examination_id': str(self.examination_id),
+        'student_id': str(self.student_id),
+        'status': self.status,
+        'score': self.score,
+        'started_at': self.started_at.isoformat() if self.started_at else None,
+        'submitted_at': self.submitted_at.isoformat() if self.submitted_at else None,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _academic_session(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'session_name': self.session_name,
+        'session_year': self.session_year,
+        'start_date': self.start_date.isoformat() if self.start_date else None,
+        'end_date': self.end_date.isoformat() if self.end_date else None,
+        'is_current_session': self.is_current_session,
+        'status': self.status,
+        'notes': self.notes,
+        'is_active': self.is_active,
+        'created_at': self.created_at.isoformat() if self.created_at else None,
+        'updated_at': self.updated_at.isoformat() if self.updated_at else None
+    }
+
+
+def _school_calendar(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'session_id': str(self.session_id) if self.session_id else None,
+        'academic_year': self.academic_year,
+        'term_number': self.term_number,
+        'term_name': self.term_name,
+        'term_start_date': self.term_start_date.isoformat() if self.term_start_date else None,
+        'term_end_date': self.term_end_date.isoformat() if self.term_end_date else None,
+        'holiday_start_date': self.holiday_start_date.isoformat() if self.holiday_start_date else None,
+        'holiday_end_date': self.holiday_end_date.isoformat() if self.holiday_end_date else None,
+        'is_current_term': self.is_current_term,
+        'notes': self.notes,
+        'is_active': self.is_active,
+        'created_at': self.created_at.isoformat() if self.created_at else None,
+        'updated_at': self.updated_at.isoformat() if self.updated_at else None
+    }
+
+
+def _user_session(self):
+    return {
+        'id': str(self.id),
+        'user_id': str(self.user_id),
+        'school_id': str(self.school_id) if self.school_id else None,
+        'role_id': str(self.role_id) if self.role_id else None,
+        'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+        'last_activity_at': self.last_activity_at.isoformat() if self.last_activity_at else None,
+        'is_expired': self.is_expired(),
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _activation_code(self):
+    return {
+        'id': str(self.id),
+        'phone_number': self.phone_number,
+        'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+        'is_used': self.is_used,
+        'attempts': self.attempts,
+        'is_expired': self.is_expired(),
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _school_timetable(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'day_of_week': self.day_of_week,
+        'activity_type': self.activity_type,
+        'start_time': self.start_time,
+        'end_time': self.end_time,
+        'title': self.title,
+        'description': self.description,
+        'is_active': self.is_active,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+def _class_timetable(self):
+    return {
+        'id': str(self.id),
+        'school_id': str(self.school_id),
+        'class_id': str(self.class_id),
+        'subject_id': str(self.subject_id),
+        'teacher_id': str(self.teacher_id) if self.teacher_id else None,
+        'day_of_week': self.day_of_week,
+        'start_time': self.start_time,
+        'end_time': self.end_time,
+        'room_number': self.room_number,
+        'subject_name': self.subject.subject_name if self.subject else None,
+        'teacher_name': self.teacher.user.full_name if self.teacher and self.teacher.user else None,
+        'is_active': self.is_active,
+        'created_at': self.created_at.isoformat() if self.created_at else None
+    }
+
+
+BASELINE = {
+    'School': _school,
+    'User': _user,
+    'Role': _role,
+    'UserSchoolRole': _user_school_role,
+    'Student': _student,
+    'Parent': _parent,
+    'Staff': _staff,
+    'EducationTrack': _education_track,
+    'Department': _department,
+    'Class': _class,
+    'Subject': _subject,
+    'ClassSubject': _class_subject,
+    'StudentClasses': _student_classes,
+    'Attendance': _attendance,
+    'Exam': _exam,
+    'ExamResult': _exam_result,
+    'StudentFeedback': _student_feedback,
+    'Assessment': _assessment,
+    'SubjectScore': _subject_score,
+    'FeeStructure': _fee_structure,
+    'Invoice': _invoice,
+    'PaymentNotification': _payment_notification,
+    'MessageThread': _message_thread,
+    'Message': _message,
+    'Notification': _notification,
+    'Examination': _examination,
+    'Question': _question,
+    'ExaminationSubmission': _examination_submission,
+    'AcademicSession': _academic_session,
+    'SchoolCalendar': _school_calendar,
+    'UserSession': _user_session,
+    'ActivationCode': _activation_code,
+    'SchoolTimetable': _school_timetable,
+    'ClassTimetable': _class_timetable
+}
+
+
+__all__ = ['BASELINE']
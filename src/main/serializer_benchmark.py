@@ -0,0 +1,157 @@
+"""
+Serializer Micro-Benchmark
+Checks the compiled per-model serializers against the output to_dict had
+before them on synthetic rows - the hand-written methods kept in
+serializer_baseline for SPECS models, the reflective column walk for the
+rest - and times the two. Intended layout changes are listed separately.
+
+Usage: python -m shared.models.serializer_benchmark [rows]
+"""
+import json
+import sys
+import time
+import uuid
+from datetime import datetime, date
+
+from sqlalchemy import Boolean, Date, DateTime, Float, Integer, JSON, LargeBinary
+from sqlalchemy.orm import configure_mappers
+
+from shared.models.unified_models import db, BaseModel
+from shared.models.serializers import SPECS
+from shared.models.serializer_baseline import BASELINE
+
+
+# Keys whose to_dict output changed on purpose; differences confined to them
+# are reported, not counted as mismatches
+INTENDED_DIFFERENCES = {
+    'Assessment': (
+        ('total_score', 'average_score', 'class_position'),
+        'adds the overall results written by the grading engine'
+    ),
+    'SubjectScore': (
+        ('total_score', 'grade'),
+        'total_score and grade are the stored columns (school GradingScheme), not recomputed'
+    ),
+}
+
+# to_dict options checked for models that take them
+VARIANTS = {
+    'User': ({}, {'include_sensitive': True}),
+    'Student': ({}, {'include_user': False}),
+}
+
+
+def reflective_to_dict(obj):
+    """The original BaseModel.to_dict implementation."""
+    return {
+        column.name: getattr(obj, column.name)
+        for column in obj.__table__.columns
+    }
+
+
+def reference_to_dict(obj, **options):
+    """What to_dict returned before compiled serializers."""
+    baseline = BASELINE.get(type(obj).__name__)
+    return baseline(obj, **options) if baseline else reflective_to_dict(obj)
+
+
+def _differing_keys(expected, actual):
+    return {key for key in set(expected) | set(actual) if key not in expected or key not in actual
+            or expected[key] != actual[key]}
+
+
+def _sample_value(column, index):
+    """Deterministic synthetic value for a column."""
+    if column.name == 'id' or column.name.endswith('_id') or column.name.endswith('_by'):
+        return uuid.UUID(int=index + 1)
+    column_type = column.type
+    if isinstance(column_type, DateTime):
+        return datetime(2024, 9, 1, 8, 30, index % 60)
+    if isinstance(column_type, Date):
+        return date(2024, 9, 1 + index % 28)
+    if isinstance(column_type, Boolean):
+        return bool(index % 2)
+    if isinstance(column_type, Integer):
+        return index % 100
+    if isinstance(column_type, Float):
+        return float(index % 40)
+    if isinstance(column_type, JSON):
+        return ['value-%d' % (index % 7)]
+    if isinstance(column_type, LargeBinary):
+        return (index + 1).to_bytes(4, 'little')
+    if column.type.python_type is uuid.UUID:
+        return uuid.UUID(int=index + 1)
+    return '%s-%d' % (column.name, index)
+
+
+def build_rows(count):
+    """Build ``count`` transient instances spread across every model."""
+    models = sorted(
+        (mapper.class_ for mapper in db.Model.registry.mappers
+         if issubclass(mapper.class_, BaseModel)),
+        key=lambda cls: cls.__name__,
+    )
+    rows = []
+    for index in range(count):
+        cls = models[index % len(models)]
+        obj = cls()
+        for column in cls.__table__.columns:
+            setattr(obj, column.key, _sample_value(column, index))
+        rows.append(obj)
+    return rows
+
+
+def compiled(obj):
+    return type(obj).__serializer__(obj)
+
+
+def _time(fn, rows):
+    started = time.perf_counter()
+    for obj in rows:
+        fn(obj)
+    return time.perf_counter() - started
+
+
+def main(count=100000):
+    configure_mappers()
+    rows = build_rows(count)
+
+    # Models added together with their SPECS layout have no earlier output
+    new_models = sorted(name for name in SPECS if name not in BASELINE)
+    rows = [obj for obj in rows if type(obj).__name__ not in new_models]
+
+    mismatches = 0
+    intended = {}
+    for obj in rows:
+        name = type(obj).__name__
+        for options in VARIANTS.get(name, ({},)):
+            expected = json.loads(json.dumps(reference_to_dict(obj, **options), default=str))
+            actual = json.loads(json.dumps(obj.to_dict(**options), default=str))
+            if list(expected.items()) == list(actual.items()):
+                continue
+            differing = _differing_keys(expected, actual)
+            if differing and differing <= set(INTENDED_DIFFERENCES.get(name, ((), None))[0]):
+                intended[name] = intended.get(name, 0) + 1
+                continue
+            mismatches += 1
+            if mismatches <= 5:
+                print('MISMATCH %s %r:\n  %s\n  %s' % (name, options, expected, actual))
+
+    reference_seconds = _time(reference_to_dict, rows)
+    compiled_seconds = _time(compiled, rows)
+    count = len(rows)
+
+    print('rows:        %d' % count)
+    print('mismatches:  %d' % mismatches)
+    for name, rows_differing in sorted(intended.items()):
+        keys, reason = INTENDED_DIFFERENCES[name]
+        print('intended:    %s %s (%d rows): %s' % (name, ', '.join(keys), rows_differing, reason))
+    print('no baseline: %s' % ', '.join(new_models))
+    print('baseline:    %.3fs (%.0f rows/s)' % (reference_seconds, count / reference_seconds))
+    print('compiled:    %.3fs (%.0f rows/s)' % (compiled_seconds, count / compiled_seconds))
+    print('speedup:     %.2fx' % (reference_seconds / compiled_seconds))
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000))
@@ -0,0 +1,651 @@
+"""
+Compiled Model Serializers
+Builds one specialized serialization function per model class when its mapper
+is configured, replacing per-call reflection over ``__table__.columns``.
+"""
+
+
+# ============================================================================
+# SPEC DSL
+# ============================================================================
+
+class Spec:
+    """Serialization layout for a model - the single definition of its to_dict output.
+
+    Model to_dict methods delegate to the serializer compiled from it. Entries
+    are emitted in order, so the list order is the key order of the output:
+
+    * ``'key'``                  - raw column value
+    * ``'key:kind'``             - column value converted by ``kind``
+    * ``'key=attr:kind'``        - column ``attr`` emitted under ``key``
+    * ``('key', [entries])``     - nested dictionary
+    * ``('key', [entries], cond)`` - nested dictionary, ``None`` unless ``cond``
+    * ``('key', 'expr', code)``  - arbitrary expression
+    * ``When(cond, [entries])``  - keys added only when ``cond`` holds
+    * ``Merge(cond, code)``      - dictionary returned by ``code`` merged in
+
+    Kinds: ``uuid``, ``uuid?``, ``iso``, ``isoz``, ``list``, ``dict``,
+    ``nested`` (related object) and ``many`` (related collection).
+    Expressions see ``o`` (instance), ``d`` (column values), ``cls``,
+    ``_ser`` (compiled serializer dispatch), declared lets and params.
+    """
+
+    def __init__(self, fields, params='', lets=(), toggles=None):
+        self.fields = fields
+        self.params = params
+        self.lets = lets
+        # Projection keys that switch a to_dict parameter instead of embedding
+        self.toggles = toggles or {}
+
+
+class When:
+    """Conditional block of keys."""
+
+    def __init__(self, cond, fields):
+        self.cond = cond
+        self.fields = fields
+
+
+class Merge:
+    """Conditional merge of a dictionary produced by an expression."""
+
+    def __init__(self, cond, code):
+        self.cond = cond
+        self.code = code
+
+
+class _AttrView:
+    """Mapping facade over an instance whose columns are not all loaded."""
+
+    __slots__ = ('_obj',)
+
+    def __init__(self, obj):
+        self._obj = obj
+
+    def __getitem__(self, key):
+        return getattr(self._obj, key)
+
+
+def _ser(obj, **options):
+    """Serialize any mapped instance through its compiled serializer."""
+    return type(obj).__serializer__(obj, **options)
+
+
+# ============================================================================
+# MODEL LAYOUTS
+# ============================================================================
+
+SPECS = {
+    'School': Spec([
+        'id:uuid', 'name', 'slug', 'email', 'phone', 'website',
+        ('address', [
+            'line1=address_line1', 'line2=address_line2', 'city', 'state',
+            'postal_code', 'country',
+        ]),
+        ('domain', ['subdomain', 'custom_domain', 'ssl_enabled']),
+        'status',
+        ('settings', [
+            'timezone', 'currency', 'language', 'academic_year_start',
+            'academic_year_end', 'current_academic_year',
+        ]),
+        ('branding', [
+            'logo_url', 'banner_url', 'primary_color', 'secondary_color',
+            'motto=school_motto',
+        ]),
+        'features_enabled:dict',
+        ('admin', [
+            'user_id=admin_user_id:uuid?', 'name=admin_name',
+            'email=admin_email', 'phone=admin_phone',
+        ]),
+        'created_at:iso', 'updated_at:iso',
+    ]),
+    'User': Spec([
+        'id:uuid', 'phoneNumber=phone_number',
+        ('phone_number', 'expr', "d['phone_number'] if include_sensitive else None"),
+        'email', 'first_name', 'last_name', 'middle_name',
+        ('full_name', 'expr', 'o.full_name'),
+        ('profile', [
+            'firstName=first_name', 'lastName=last_name', 'email',
+            'avatar=profile_picture_url',
+        ]),
+        'date_of_birth:iso', 'gender', 'profile_picture_url',
+        ('address', [
+            'line1=address_line1', 'line2=address_line2', 'city', 'state',
+            'postal_code', 'country',
+        ], "d['address_line1']"),
+        'status', 'is_verified', 'last_login_at:iso',
+        'metadata=user_metadata:dict', 'created_at:iso', 'updated_at:iso',
+        ('schools', 'expr', '[]'),
+    ], params='include_sensitive=False'),
+    'Role': Spec([
+        'id:uuid', 'name', 'role_type', 'description', 'permissions:list',
+        'is_system_role', 'created_at:iso',
+    ]),
+    'UserSchoolRole': Spec([
+        'id:uuid', 'user_id:uuid', 'school_id:uuid', 'role_id:uuid',
+        'role:nested', 'assigned_by:uuid?', 'assigned_at:iso', 'expires_at:iso',
+        'is_primary', 'role_data:dict', 'is_active',
+    ]),
+    'Student': Spec([
+        'id:uuid', 'user_id:uuid', 'school_id:uuid', 'student_id',
+        'admission_number', 'admission_date:iso', 'graduation_date:iso',
+        'academic_status', 'current_grade_level', 'previous_school',
+        'has_special_needs', 'special_needs_description',
+        'transportation_method', 'is_active', 'created_at:iso',
+        When('u', [
+            ('user', 'expr',
+             "{'first_name': u.first_name, 'last_name': u.last_name, "
+             "'middle_name': u.middle_name, 'email': u.email, "
+             "'phone_number': u.phone_number, "
+             "'date_of_birth': u.date_of_birth.isoformat() if u.date_of_birth else None, "
+             "'gender': u.gender}"),
+            ('first_name', 'expr', 'u.first_name'),
+            ('last_name', 'expr', 'u.last_name'),
+            ('full_name', 'expr', 'u.full_name'),
+            ('email', 'expr', 'u.email'),
+        ]),
+        Merge('include_classes', 'o._class_fields(academic_year)'),
+    ], params='include_classes=False, academic_year=None, include_user=True',
+       lets=[('u', 'o.user if include_user else None')],
+       toggles={'user': 'include_user'}),
+    'Parent': Spec([
+        'id:uuid', 'user_id:uuid', 'school_id:uuid', 'relationship_type',
+        'is_primary_contact', 'is_emergency_contact',
+        'is_financially_responsible',
+        ('communication_preferences', [
+            'receive_academic_updates', 'receive_financial_updates',
+            'receive_disciplinary_updates',
+        ]),
+        'is_active', 'created_at:iso',
+    ]),
+    'Staff': Spec([
+        'id:uuid', 'user_id:uuid', 'school_id:uuid', 'staff_id',
+        'employee_number', 'designation', 'hire_date:iso',
+        'termination_date:iso', 'employment_status', 'employment_type',
+        'highest_degree', 'certifications:list', 'subjects_taught:list',
+        'grade_levels_taught:list', 'department',
+        ('track_id', 'expr', 'None'),
+        'is_subject_teacher', 'is_class_teacher', 'class_teacher_for:uuid?',
+        'years_of_experience', 'bank_name', 'account_name', 'account_number',
+        'monthly_deduction', 'is_active', 'created_at:iso',
+        When('u', [
+            ('first_name', 'expr', 'u.first_name'),
+            ('last_name', 'expr', 'u.last_name'),
+            ('middle_name', 'expr', 'u.middle_name'),
+            ('full_name', 'expr', 'u.full_name'),
+            ('email', 'expr', 'u.email'),
+            ('phone_number', 'expr', 'u.phone_number'),
+        ]),
+    ], params='include_user=True',
+       lets=[('u', 'o.user if include_user else None')],
+       toggles={'user': 'include_user'}),
+    'EducationTrack': Spec([
+        'id:uuid', 'school_id:uuid', 'name', 'description', 'is_active',
+        'created_at:iso',
+    ]),
+    'Department': Spec([
+        'id:uuid', 'school_id:uuid', 'name', 'track_id:uuid?', 'description',
+        'is_active', 'created_at:iso',
+    ]),
+    'Class': Spec([
+        'id:uuid', 'school_id:uuid', 'name=class_name', 'class_name',
+        'class_code', 'code=class_code', 'grade_level', 'department_id:uuid?',
+        'track_id:uuid?', 'academic_year', 'term', 'max_capacity',
+        'capacity=max_capacity', 'current_enrollment', 'classroom_location',
+        'location=classroom_location', 'room_number=classroom_location',
+        'class_staff_id:uuid?', 'class_teacher_id=class_staff_id:uuid?',
+        'is_active', 'created_at:iso',
+    ]),
+    'Subject': Spec([
+        'id:uuid', 'school_id:uuid', 'name=subject_name', 'subject_name',
+        'subject_code', 'code=subject_code', 'description', 'is_core',
+        'credit_hours', 'category', 'academic_year', 'is_active',
+        'created_at:iso',
+    ]),
+    'ClassSubject': Spec([
+        'id:uuid', 'school_id:uuid', 'class_id:uuid', 'subject_id:uuid',
+        'staff_id:uuid?', 'teacher_id=staff_id:uuid?', 'assigned_by:uuid?',
+        'assigned_at:iso', 'class=class_obj:nested', 'subject:nested',
+        'staff:nested', 'teacher=staff:nested', 'is_active', 'created_at:iso',
+    ]),
+    'StudentClasses': Spec([
+        'id:uuid', 'school_id:uuid', 'student_id:uuid', 'class_id:uuid',
+        'track_id:uuid', 'admission_number', 'academic_year', 'term',
+        'enrollment_date:iso', 'student:nested', 'class=class_obj:nested',
+        'track:nested', 'is_active', 'created_at:iso', 'updated_at:iso',
+    ]),
+    'Attendance': Spec([
+        'id:uuid', 'school_id:uuid', 'student_id:uuid', 'class_id:uuid',
+        'staff_id:uuid', 'teacher_id=staff_id:uuid', 'attendance_date:iso',
+        'status', 'arrival_time:iso', 'departure_time:iso', 'notes',
+        'created_at:iso',
+    ]),
+    'AttendanceSummary': Spec([
+        'id:uuid', 'school_id:uuid', 'student_id:uuid', 'class_id:uuid',
+        'term_id:uuid', 'present_count', 'absent_count', 'late_count',
+        'excused_count', ('days_recorded', 'expr', 'o.days_recorded'),
+        ('attendance_rate', 'expr', 'o.attendance_rate'), 'updated_at:iso',
+    ]),
+    'AttendanceBitmap': Spec([
+        'id:uuid', 'school_id:uuid', 'student_id:uuid', 'class_id:uuid',
+        'term_id:uuid', ('days', 'expr', 'o.day_counts()'), 'updated_at:iso',
+    ]),
+    'Exam': Spec([
+        'id:uuid', 'school_id:uuid', 'exam_name', 'subject', 'class_id:uuid',
+        'staff_id:uuid', 'teacher_id=staff_id:uuid', 'exam_date:iso',
+        'duration_minutes', 'total_marks', 'passing_marks', 'exam_type',
+        'term', 'academic_year', 'is_active', 'created_at:iso',
+    ]),
+    'ExamResult': Spec([
+        'id:uuid', 'school_id:uuid', 'exam_id:uuid', 'student_id:uuid',
+        'marks_obtained', 'grade', 'percentage', 'position', 'graded_by:uuid',
+        'graded_at:iso', 'remarks', 'created_at:iso',
+    ]),
+    'StudentFeedback': Spec([
+        'id:uuid', 'school_id:uuid', 'student_id:uuid', 'staff_id:uuid',
+        'teacher_id=staff_id:uuid', 'feedback_type', 'subject', 'content',
+        'rating', 'feedback_date:iso', 'term', 'academic_year',
+        'created_at:iso',
+    ]),
+    'Assessment': Spec([
+        'id:uuid', 'school_id:uuid', 'admission_number', 'student_id:uuid?',
+        'session', 'term', 'attendance', 'fluency', 'handwriting', 'game',
+        'initiative', 'critical_thinking', 'punctuality', 'attentiveness',
+        'neatness', 'self_discipline', 'politeness', 'class_teacher_comment',
+        'head_teacher_comment', 'total_score', 'average_score',
+        'class_position', 'scores:many', 'created_at:iso', 'updated_at:iso',
+    ]),
+    'SubjectScore': Spec([
+        'id:uuid', 'school_id:uuid', 'assessment_id:uuid',
+        'class_subject_id:uuid', 'subject_id:uuid?', 'first_ca', 'second_ca',
+        'exam', 'total_score', 'grade', 'position', 'remarks', 'created_at:iso',
+        'updated_at:iso',
+    ]),
+    'GradingScheme': Spec([
+        'id:uuid', 'school_id:uuid', 'name', 'boundaries:list', 'is_default',
+        'is_active', 'created_at:iso',
+    ]),
+    'FeeStructure': Spec([
+        'id:uuid', 'school_id:uuid', 'fee_name', 'fee_type', 'amount',
+        'grade_levels:list', 'is_mandatory', 'is_recurring', 'due_date:iso',
+        'academic_year', 'term', 'is_active', 'created_at:iso',
+    ]),
+    'Invoice': Spec([
+        'id:uuid', 'school_id:uuid', 'student_id:uuid', 'parent_id:uuid',
+        'invoice_number', 'total_amount', 'amount_paid', 'balance_due',
+        'issue_date:iso', 'due_date:iso', 'status', 'term', 'academic_year',
+        'notes', 'created_at:iso',
+    ]),
+    'FinancialSummary': Spec([
+        'id:uuid', 'school_id:uuid', 'academic_year',
+        ('term', 'expr', "d['term'] or None"),
+        ('invoices', [
+            'count=invoice_count', 'total_amount', 'amount_paid', 'balance_due',
+            'paid_count', 'overdue_count', 'overdue_balance',
+        ]),
+        ('payments', [
+            'pending=pending_payments', 'pending_amount=pending_payment_amount',
+            'approved=approved_payments', 'approved_amount=approved_payment_amount',
+            'rejected=rejected_payments',
+        ]),
+        'updated_at:iso',
+    ]),
+    'PaymentNotification': Spec([
+        'id:uuid', 'school_id:uuid', 'invoice_id:uuid', 'parent_id:uuid',
+        'amount', 'payment_method', 'payment_reference',
+        'proof_of_payment_url', 'notes', 'status', 'reviewed_by:uuid?',
+        'reviewed_at:iso', 'review_notes', 'created_at:iso',
+    ]),
+    'MessageThread': Spec([
+        'id:uuid', 'school_id:uuid', 'subject', 'thread_type',
+        'participants:list', 'last_message_at:iso', 'message_count',
+        'created_at:iso',
+    ]),
+    'Message': Spec([
+        'id:uuid', 'school_id:uuid', 'thread_id:uuid', 'sender_id:uuid',
+        'content', 'message_type', 'attachments:list', 'sent_at:iso',
+        'priority', 'created_at:iso',
+    ]),
+    'MessageDelivery': Spec([
+        'id:uuid', 'school_id:uuid', 'thread_id:uuid', 'message_id:uuid',
+        'audience', 'status', 'total_recipients', 'delivered_count',
+        ('progress', 'expr', 'round(o.progress, 4)'),
+        'attempts', 'error', 'started_at:iso', 'completed_at:iso',
+        'created_at:iso',
+    ]),
+    'Notification': Spec([
+        'id:uuid', 'school_id:uuid', 'title', 'content', 'notification_type',
+        'recipients:list', 'priority', 'expires_at:iso', 'created_at:iso',
+    ]),
+    'Examination': Spec([
+        'id:uuid', 'school_id:uuid', 'title', 'exam_type', 'subject_id:uuid',
+        ('subject_name', 'expr', 'info[0]'),
+        'class_id:uuid',
+        ('class_name', 'expr', 'info[1]'),
+        ('track_name', 'expr', 'info[2]'),
+        ('department_name', 'expr', 'info[3]'),
+        'term', 'session', 'created_by:uuid', 'is_published',
+        'start_time:isoz', 'end_time:isoz', 'duration_minutes', 'total_marks',
+        ('question_count', 'expr', 'info[4]'),
+        'created_at:iso',
+    ], params='summary=None', lets=[('info', 'summary or o._summary()')]),
+    'Question': Spec([
+        'id:uuid', 'school_id:uuid', 'examination_id:uuid', 'instruction',
+        'question_text', 'question_image_url',
+        ('options', [
+            'A=option_a', 'B=option_b', 'C=option_c', 'D=option_d',
+            'E=option_e',
+        ]),
+        'correct_answer', 'marks', 'created_at:iso',
+    ]),
+    'ExaminationSubmission': Spec([
+        'id:uuid', 'school_id:uuid', 'examination_id:uuid', 'student_id:uuid',
+        'status', 'score', 'started_at:iso', 'submitted_at:iso',
+        'created_at:iso',
+    ]),
+    'AcademicSession': Spec([
+        'id:uuid', 'school_id:uuid', 'session_name', 'session_year',
+        'start_date:iso', 'end_date:iso', 'is_current_session', 'status',
+        'notes', 'is_active', 'created_at:iso', 'updated_at:iso',
+    ]),
+    'SchoolCalendar': Spec([
+        'id:uuid', 'school_id:uuid', 'session_id:uuid?', 'academic_year',
+        'term_number', 'term_name', 'term_start_date:iso', 'term_end_date:iso',
+        'holiday_start_date:iso', 'holiday_end_date:iso', 'is_current_term',
+        'notes', 'is_active', 'created_at:iso', 'updated_at:iso',
+    ]),
+    'UserSession': Spec([
+        'id:uuid', 'user_id:uuid', 'school_id:uuid?', 'role_id:uuid?',
+        'expires_at:iso', 'last_activity_at:iso',
+        ('is_expired', 'expr', 'o.is_expired()'),
+        'created_at:iso',
+    ]),
+    'ActivationCode': Spec([
+        'id:uuid', 'phone_number', 'expires_at:iso', 'is_used', 'attempts',
+        ('is_expired', 'expr', 'o.is_expired()'),
+        'created_at:iso',
+    ]),
+    'SchoolTimetable': Spec([
+        'id:uuid', 'school_id:uuid', 'day_of_week', 'activity_type',
+        'start_time', 'end_time', 'title', 'description', 'is_active',
+        'created_at:iso',
+    ]),
+    'ClassTimetable': Spec([
+        'id:uuid', 'school_id:uuid', 'class_id:uuid', 'subject_id:uuid',
+        'teacher_id:uuid?', 'day_of_week', 'start_time', 'end_time',
+        'room_number',
+        ('subject_name', 'expr', 'o._subject_name()'),
+        ('teacher_name', 'expr',
+         'teacher.user.full_name if teacher and teacher.user else None'),
+        'is_active', 'created_at:iso',
+    ], lets=[('teacher', 'o.teacher')]),
+}
+
+
+# ============================================================================
+# COMPILER
+# ============================================================================
+
+_KINDS = {
+    'raw': '{v}',
+    'uuid': 'str({v})',
+    'uuid?': '(str({v}) if {v} else None)',
+    'iso': '({v}.isoformat() if {v} else None)',
+    'isoz': "({v}.isoformat() + 'Z' if {v} else None)",
+    'list': '({v} or [])',
+    'dict': '({v} or {{}})',
+    'nested': '(_ser({v}) if {v} else None)',
+    'many': '([_ser(x) for x in {v}] if {v} else [])',
+}
+
+
+class _Compiler:
+    """Turns a Spec into Python source for a single model class."""
+
+    def __init__(self, cls, columns):
+        self.cls = cls
+        self.columns = columns
+        self.used = set()
+        self.bound = {}
+        self.lets = []
+
+    def value(self, entry):
+        """Return (key, expression source) for a flat or nested entry."""
+        if isinstance(entry, tuple):
+            if len(entry) == 3 and entry[1] == 'expr':
+                return entry[0], entry[2]
+            key, fields = entry[0], entry[1]
+            body = '{' + ', '.join('%r: %s' % self.value(f) for f in fields) + '}'
+            if len(entry) == 3:
+                return key, '(%s if %s else None)' % (body, entry[2])
+            return key, body
+
+        key, attr, kind = _parse(entry)
+        if attr in self.columns:
+            self.used.add(attr)
+            ref = 'd[%r]' % attr
+        else:
+            # Relationships are read once into a local so they load only once
+            ref = self.bound.get(attr)
+            if ref is None:
+                ref = self.bound[attr] = '_%s' % attr
+                self.lets.append((ref, 'o.%s' % attr))
+        return key, _KINDS[kind].format(v=ref)
+
+    def compile(self, spec, project=False):
+        """Generate the serializer, or the projector when ``project`` is set.
+
+        Projectors take a ``rel`` mapping of already-projected related objects
+        and emit embedded relationship keys only when present in it.
+        """
+        lines = []
+        literal = []
+        tail = []
+        for entry in spec.fields:
+            if project and _parse(entry)[2] in _EMBEDS:
+                key = _parse(entry)[0]
+                tail.append('    if %r in rel:' % key)
+                tail.append('        r[%r] = rel[%r]' % (key, key))
+            elif isinstance(entry, When):
+                tail.append('    if %s:' % entry.cond)
+                for field in entry.fields:
+                    tail.append('        r[%r] = %s' % self.value(field))
+            elif isinstance(entry, Merge):
+                tail.append('    if %s:' % entry.cond)
+                tail.append('        r.update(%s)' % entry.code)
+            elif tail:
+                tail.append('    r[%r] = %s' % self.value(entry))
+            else:
+                literal.append('        %r: %s,' % self.value(entry))
+
+        params = ', ' + spec.params if spec.params else ''
+        if project:
+            params = ', rel' + params
+        lines.append('def serialize(o%s):' % params)
+        lines.append('    d = o.__dict__')
+        lines.append('    if not d.keys() >= _KEYS:')
+        lines.append('        d = _AttrView(o)')
+        for name, code in list(spec.lets) + self.lets:
+            lines.append('    %s = %s' % (name, code))
+        lines.append('    r = {')
+        lines.extend(literal)
+        lines.append('    }')
+        lines.extend(tail)
+        lines.append('    return r')
+        return '\n'.join(lines)
+
+
+_EMBEDS = ('nested', 'many')
+
+
+def _parse(entry):
+    """Split a flat entry into (key, attr, kind); non-flat entries give kind None."""
+    if not isinstance(entry, str):
+        return None, None, None
+    key, _, kind = entry.partition(':')
+    key, _, attr = key.partition('=')
+    return key, attr or key, kind or 'raw'
+
+
+def _column_source(cls):
+    """Source equivalent to the reflective BaseModel.to_dict for ``cls``."""
+    names = [column.name for column in cls.__table__.columns]
+    body = ''.join('        %r: d[%r],\n' % (name, name) for name in names)
+    source = (
+        'def serialize(o):\n'
+        '    d = o.__dict__\n'
+        '    if not d.keys() >= _KEYS:\n'
+        '        d = _AttrView(o)\n'
+        '    return {\n' + body + '    }'
+    )
+    return source, frozenset(names)
+
+
+def compile_serializer(cls, project=False):
+    """Build and return the specialized serializer (or projector) for a mapped class."""
+    spec = SPECS.get(cls.__name__)
+    if spec is None:
+        source, keys = _column_source(cls)
+        if project:
+            source = source.replace('def serialize(o):', 'def serialize(o, rel):', 1)
+    else:
+        columns = {attr.key for attr in cls.__mapper__.column_attrs}
+        compiler = _Compiler(cls, columns)
+        source = compiler.compile(spec, project)
+        keys = frozenset(compiler.used)
+
+    namespace = {'_KEYS': keys, '_AttrView': _AttrView, '_ser': _ser, 'cls': cls}
+    exec(compile(source, '<serializer %s>' % cls.__name__, 'exec'), namespace)
+    serialize = namespace['serialize']
+    serialize.__qualname__ = '%s.%s' % (cls.__name__, '__projector__' if project else '__serializer__')
+    serialize.source = source
+    return serialize
+
+
+def serialize(obj, **options):
+    """Serialize a single model instance via its compiled serializer."""
+    return type(obj).__serializer__(obj, **options)
+
+
+def serialize_many(objs, **options):
+    """Serialize a sequence of model instances via their compiled serializers."""
+    return [type(obj).__serializer__(obj, **options) for obj in objs]
+
+
+# ============================================================================
+# PROJECTION
+# ============================================================================
+
+_relations_cache = {}
+_depth_cache = {}
+_IN_PROGRESS = object()
+
+
+def relations(cls):
+    """Map each embedded relationship key of ``cls`` to (attr, kind, target class).
+
+    Alias keys (e.g. ``teacher`` for ``staff``) map to the same attribute.
+    """
+    found = _relations_cache.get(cls)
+    if found is None:
+        found = {}
+        spec = SPECS.get(cls.__name__)
+        for entry in spec.fields if spec else ():
+            key, attr, kind = _parse(entry)
+            if kind in _EMBEDS:
+                target = cls.__mapper__.relationships[attr].mapper.class_
+                found[key] = (attr, kind, target)
+        _relations_cache[cls] = found
+    return found
+
+
+def _depth_fields(cls, depth):
+    """Field spec embedding every relationship (aliases excluded) down to ``depth``."""
+    cache_key = (cls, depth)
+    fields = _depth_cache.get(cache_key)
+    if fields is None:
+        items = []
+        if depth > 0:
+            seen = set()
+            for key, (attr, kind, target) in relations(cls).items():
+                if attr not in seen:
+                    seen.add(attr)
+                    items.append((key, _depth_fields(target, depth - 1)))
+            spec = SPECS.get(cls.__name__)
+            items.extend((key, ()) for key in (spec.toggles if spec else ()))
+        fields = _depth_cache[cache_key] = tuple(sorted(items))
+    return fields
+
+
+def _freeze(fields):
+    """Normalize a field spec (dict, list of keys or True) into a hashable tuple."""
+    if isinstance(fields, dict):
+        return tuple(sorted((key, _freeze(value)) for key, value in fields.items()))
+    if isinstance(fields, (list, tuple, set, frozenset)):
+        return tuple(sorted((key, ()) for key in fields))
+    return ()
+
+
+def _project(obj, fields, memo):
+    cls = type(obj)
+    memo_key = (id(obj), fields)
+    cached = memo.get(memo_key)
+    if cached is _IN_PROGRESS:
+        # Cycle back to an object still being projected higher up the tree
+        return {'id': str(obj.id)}
+    if cached is not None:
+        return cached[1]
+    memo[memo_key] = _IN_PROGRESS
+
+    spec = SPECS.get(cls.__name__)
+    embedded = relations(cls)
+    toggles = spec.toggles if spec else {}
+    options = {param: False for param in toggles.values()}
+    rel = {}
+    resolved = {}
+    for key, sub_fields in fields:
+        if key in toggles:
+            options[toggles[key]] = True
+            continue
+        if key not in embedded:
+            raise ValueError('Unknown relation %r for %s' % (key, cls.__name__))
+        attr, kind, _ = embedded[key]
+        if (attr, sub_fields) not in resolved:
+            value = getattr(obj, attr)
+            if kind == 'many':
+                resolved[attr, sub_fields] = [_project(item, sub_fields, memo) for item in value] if value else []
+            else:
+                resolved[attr, sub_fields] = _project(value, sub_fields, memo) if value else None
+        rel[key] = resolved[attr, sub_fields]
+
+    result = cls.__projector__(obj, rel, **options)
+    # Hold the instance so id() stays unique for the whole pass
+    memo[memo_key] = (obj, result)
+    return result
+
+
+def project(obj, fields=None, depth=1):
+    """Serialize ``obj`` embedding only the relationships asked for.
+
+    ``fields`` is a nested spec such as ``{'class': {'track': True}, 'staff': True}``
+    or a list of relationship keys; without it every relationship is embedded
+    down to ``depth`` levels, skipping alias keys. Unrequested relationships are
+    never loaded and each related object is projected once per call.
+    """
+    return project_many([obj], fields, depth)[0]
+
+
+def project_many(objs, fields=None, depth=1):
+    """Project a sequence of instances, sharing one memo across the whole pass."""
+    memo = {}
+    frozen = _freeze(fields) if fields is not None else None
+    return [
+        _project(obj, frozen if frozen is not None else _depth_fields(type(obj), depth), memo)
+        for obj in objs
+    ]
+
+
+__all__ = [
+    'Spec', 'When', 'Merge', 'SPECS', 'compile_serializer', 'serialize', 'serialize_many',
+    'relations', 'project', 'project_many',
+]
@@ -0,0 +1,305 @@
+"""
+Session Validation
+Validates session tokens from an in-process TTL cache and coalesces
+last_activity_at writes. A cached session costs no query; activity
+timestamps are buffered per session and written with one UPDATE for all
+sessions touched since the last flush, every few seconds from a background
+thread (and once more at exit). A failed flush is logged and its times are
+kept for the next one. Logout and
+revocation invalidate the cache entry immediately (and again after commit or
+rollback); other processes drop it within the TTL.
+
+Config: SESSION_CACHE_TTL (seconds, default 60), SESSION_ACTIVITY_FLUSH_INTERVAL
+(seconds, default 5).
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import case, event
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session, object_session
+
+from shared.models.unified_models import db, UserSession
+
+
+logger = logging.getLogger(__name__)
+
+CachedSession = namedtuple('CachedSession', 'id user_id school_id role_id expires_at')
+
+
+class ActivityBuffer:
+    """Latest activity time per session id, written out in one UPDATE per flush."""
+
+    def __init__(self, interval=5, chunk_size=1000):
+        self.interval = interval
+        self.chunk_size = chunk_size
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._flusher = None
+        self.flushes = 0
+        self.rows_flushed = 0
+        self.failures = 0
+
+    def start(self, app):
+        """Flush every ``interval`` seconds on a daemon thread, and once more at exit."""
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(
+                target=self._run, args=(app,), name='session-activity-flush', daemon=True
+            )
+        self._flusher.start()
+        atexit.register(self._flush_in, app)
+
+    def _run(self, app):
+        while True:
+            time.sleep(min(self.interval, 1))
+            if time.monotonic() - self._last_flush < self.interval:
+                continue
+            try:
+                self._flush_in(app)
+            except Exception:
+                logger.exception('Session activity flush failed')
+
+    def _flush_in(self, app):
+        with app.app_context():
+            self.flush()
+
+    def record(self, session_id, at=None):
+        """Buffer an activity time; flushes first if the interval has passed."""
+        if self._flusher is None:
+            self.start(current_app._get_current_object())
+        with self._lock:
+            self._pending[session_id] = at or datetime.utcnow()
+            due = time.monotonic() - self._last_flush >= self.interval
+        if due:
+            self.flush()
+
+    def flush(self):
+        """Write buffered activity times; returns the number of sessions written.
+
+        Runs in its own short transaction so it never joins (or waits for)
+        the request's. Times only ever move forward. A database error is
+        logged, not raised, and the unwritten times go back into the buffer.
+        """
+        if not self._flush_lock.acquire(blocking=False):
+            return 0  # Another thread is flushing
+        try:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                self._last_flush = time.monotonic()
+            if not pending:
+                return 0
+            table = UserSession.__table__
+            items = list(pending.items())
+            try:
+                with db.engine.begin() as connection:
+                    for start in range(0, len(items), self.chunk_size):
+                        chunk = dict(items[start:start + self.chunk_size])
+                        latest = case(chunk, value=table.c.id)
+                        connection.execute(table.update().where(
+                            table.c.id.in_(list(chunk)),
+                            (table.c.last_activity_at.is_(None)) | (table.c.last_activity_at < latest)
+                        ).values(last_activity_at=latest))
+            except SQLAlchemyError:
+                logger.exception('Writing %d session activity times failed', len(items))
+                self.failures += 1
+                self._restore(pending)
+                return 0
+            self.flushes += 1
+            self.rows_flushed += len(items)
+            return len(items)
+        finally:
+            self._flush_lock.release()
+
+    def _restore(self, pending):
+        """Put unwritten times back, keeping any newer time recorded since."""
+        with self._lock:
+            for session_id, at in pending.items():
+                current = self._pending.get(session_id)
+                if current is None or current < at:
+                    self._pending[session_id] = at
+
+    def discard(self, session_ids):
+        with self._lock:
+            for session_id in session_ids:
+                self._pending.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._pending)
+
+
+class SessionCache:
+    """LRU of validated sessions keyed by session_token, each entry with a TTL."""
+
+    def __init__(self, ttl=60, max_entries=100000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # token -> (CachedSession, valid until (monotonic))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, token):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(token)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[token]
+            self.misses += 1
+        return None
+
+    def put(self, token, cached, ttl=None):
+        with self._lock:
+            self._entries[token] = (cached, time.monotonic() + (self.ttl if ttl is None else ttl))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, token=None):
+        """Drop one token, or every entry when token is None."""
+        with self._lock:
+            if token is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(token, None)
+            self.invalidations += 1
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for token in [token for token, (cached, _) in self._entries.items() if cached.user_id == user_id]:
+                del self._entries[token]
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'invalidations': self.invalidations
+            }
+
+
+session_cache = SessionCache()
+activity_buffer = ActivityBuffer()
+
+
+def _configure():
+    config = current_app.config
+    session_cache.ttl = config.get('SESSION_CACHE_TTL', session_cache.ttl)
+    activity_buffer.interval = config.get('SESSION_ACTIVITY_FLUSH_INTERVAL', activity_buffer.interval)
+
+
+def validate_session(token, touch=True):
+    """Return the CachedSession for a live token, or None.
+
+    Hits are served from memory; a miss loads the session by session_token.
+    With ``touch`` the request's activity is buffered for the next flush.
+    """
+    if not token:
+        return None
+    now = datetime.utcnow()
+    cached = session_cache.get(token)
+    if cached is None:
+        row = db.session.query(
+            UserSession.id, UserSession.user_id, UserSession.school_id, UserSession.role_id,
+            UserSession.expires_at
+        ).filter(
+            UserSession.session_token == token,
+            UserSession.is_active == True
+        ).first()
+        if row is None or row.expires_at <= now:
+            return None
+        cached = CachedSession(row.id, row.user_id, row.school_id, row.role_id, row.expires_at)
+        # Never cache a session past its own expiry
+        _configure()
+        session_cache.put(token, cached, min(session_cache.ttl, (row.expires_at - now).total_seconds()))
+    elif cached.expires_at <= now:
+        session_cache.invalidate(token)
+        return None
+    if touch:
+        activity_buffer.record(cached.id, now)
+    return cached
+
+
+def revoke_session(token):
+    """Deactivate a session (logout); returns False if no such session. The caller commits."""
+    revoked = UserSession.query.filter_by(session_token=token, is_active=True).update(
+        {'is_active': False, 'updated_at': datetime.utcnow()}, synchronize_session=False
+    )
+    _invalidate_after_commit(token=token)
+    return revoked > 0
+
+
+def revoke_user_sessions(user_id):
+    """Deactivate all of a user's sessions (password change, account lock). The caller commits."""
+    revoked = UserSession.query.filter_by(user_id=user_id, is_active=True).update(
+        {'is_active': False, 'updated_at': datetime.utcnow()}, synchronize_session=False
+    )
+    _invalidate_after_commit(user_id=user_id)
+    return revoked
+
+
+# ============================================================================
+# INVALIDATION
+# ============================================================================
+
+_DIRTY_KEY = 'session_cache_dirty'
+
+
+def _invalidate_after_commit(token=None, user_id=None):
+    if token is not None:
+        session_cache.invalidate(token)
+    if user_id is not None:
+        session_cache.invalidate_user(user_id)
+    db.session.info.setdefault(_DIRTY_KEY, set()).add((token, user_id))
+
+
+def _on_session_change(mapper, connection, target):
+    session_cache.invalidate(target.session_token)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_DIRTY_KEY, set()).add((target.session_token, None))
+
+
+def _invalidate_dirty(session):
+    for token, user_id in session.info.pop(_DIRTY_KEY, ()):
+        if token is not None:
+            session_cache.invalidate(token)
+        if user_id is not None:
+            session_cache.invalidate_user(user_id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _on_commit(session):
+    _invalidate_dirty(session)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _on_rollback(session):
+    # Sessions validated after the write may have cached the rolled-back row
+    _invalidate_dirty(session)
+
+
+for _event in ('after_update', 'after_delete'):
+    event.listen(UserSession, _event, _on_session_change)
+
+
+__all__ = [
+    'CachedSession', 'SessionCache', 'ActivityBuffer', 'session_cache', 'activity_buffer',
+    'validate_session', 'revoke_session', 'revoke_user_sessions'
+]
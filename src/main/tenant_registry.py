@@ -0,0 +1,198 @@
+"""
+Tenant Registry
+In-memory map of request Host -> school id, plus each school's serialized
+settings and compiled feature flags. Entries expire after a TTL and are
+invalidated by SQLAlchemy events whenever a School row changes.
+
+Schools are loaded on a short-lived session of their own rather than
+db.session: hosts are resolved before the request's tenant is known, and a
+connection db.session checked out then would stay bound to no tenant for
+the rest of the request.
+"""
+import threading
+import time
+
+from sqlalchemy import event, or_, select
+from sqlalchemy.orm import Session, object_session
+
+from shared.models.unified_models import db, School
+
+
+class TenantEntry:
+    """Cached view of one school."""
+
+    __slots__ = ('school_id', 'settings', 'features', 'expires_at')
+
+    def __init__(self, school_id, settings, features, expires_at):
+        self.school_id = school_id
+        self.settings = settings
+        self.features = features
+        self.expires_at = expires_at
+
+    def is_enabled(self, feature):
+        return feature in self.features
+
+
+def compile_features(features_enabled):
+    """Compile the features_enabled JSON into a frozenset of enabled flag names."""
+    return frozenset(name for name, enabled in (features_enabled or {}).items() if enabled)
+
+
+def normalize_host(host):
+    """Lowercase a Host header and strip its port."""
+    host = (host or '').strip().lower()
+    if host.startswith('['):
+        return host  # IPv6 literal, never a tenant domain
+    return host.split(':', 1)[0].rstrip('.')
+
+
+class TenantRegistry:
+    """TTL cache of host mappings and school settings."""
+
+    def __init__(self, ttl=300, negative_ttl=30, base_domain=None):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.base_domain = normalize_host(base_domain) if base_domain else None
+        self._hosts = {}  # host -> (school_id or None, expires_at)
+        self._schools = {}  # school_id -> TenantEntry
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _subdomain(self, host):
+        if self.base_domain and host.endswith('.' + self.base_domain):
+            label = host[:-len(self.base_domain) - 1]
+            if label and '.' not in label:
+                return label
+        return None
+
+    def resolve_host(self, host):
+        """Resolve a Host header to a school id; None when no school serves it."""
+        host = normalize_host(host)
+        if not host:
+            return None
+        now = time.monotonic()
+        cached = self._hosts.get(host)
+        if cached is not None and cached[1] > now:
+            self.hits += 1
+            return cached[0]
+
+        self.misses += 1
+        subdomain = self._subdomain(host)
+        conditions = [School.custom_domain == host]
+        if subdomain:
+            conditions.append(School.subdomain == subdomain)
+        entry = self._load(now, or_(*conditions))
+
+        if entry is None:
+            with self._lock:
+                self._hosts[host] = (None, now + self.negative_ttl)
+            return None
+        with self._lock:
+            self._hosts[host] = (entry.school_id, now + self.ttl)
+        return entry.school_id
+
+    def get(self, school_id):
+        """Get the cached entry for a school, loading it when missing or expired."""
+        now = time.monotonic()
+        entry = self._schools.get(school_id)
+        if entry is not None and entry.expires_at > now:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        return self._load(now, School.id == school_id)
+
+    def settings(self, school_id):
+        """Serialized School.to_dict() for a school, or None. Shared; treat as read-only."""
+        entry = self.get(school_id)
+        return entry.settings if entry else None
+
+    def is_enabled(self, school_id, feature):
+        """Whether a feature flag is enabled for a school."""
+        entry = self.get(school_id)
+        return bool(entry and feature in entry.features)
+
+    def _load(self, now, *criteria):
+        """Load an active school matching ``criteria`` and cache it; None when there is none.
+
+        Uses its own session, so no tenant-less connection is left checked
+        out on db.session (see the module docstring).
+        """
+        with Session(db.engine) as session:
+            school = session.scalars(
+                select(School).where(*criteria, School.is_active == True).limit(1)
+            ).first()
+            return self._store(school, now) if school else None
+
+    def _store(self, school, now):
+        entry = TenantEntry(
+            school.id,
+            school.to_dict(),
+            compile_features(school.features_enabled),
+            now + self.ttl
+        )
+        with self._lock:
+            self._schools[school.id] = entry
+        return entry
+
+    def invalidate(self, school_id=None):
+        """Drop a school's entry and host mappings (everything when school_id is None).
+
+        Negative host entries are dropped too, since a changed school may now
+        serve a host that previously resolved to nothing.
+        """
+        with self._lock:
+            if school_id is None:
+                self._schools.clear()
+                self._hosts.clear()
+                return
+            self._schools.pop(school_id, None)
+            for host, (mapped_id, _) in list(self._hosts.items()):
+                if mapped_id is None or mapped_id == school_id:
+                    del self._hosts[host]
+
+    def stats(self):
+        return {
+            'schools': len(self._schools),
+            'hosts': len(self._hosts),
+            'hits': self.hits,
+            'misses': self.misses
+        }
+
+
+tenant_registry = TenantRegistry()
+
+
+# ============================================================================
+# INVALIDATION
+# ============================================================================
+
+_DIRTY_KEY = 'tenant_registry_dirty_schools'
+
+
+def _on_school_change(mapper, connection, target):
+    tenant_registry.invalidate(target.id)
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault(_DIRTY_KEY, set()).add(target.id)
+
+
+@event.listens_for(Session, 'after_commit')
+def _on_commit(session):
+    for school_id in session.info.pop(_DIRTY_KEY, ()):
+        tenant_registry.invalidate(school_id)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _on_rollback(session):
+    # Entries reloaded after the flush may hold the rolled-back changes
+    for school_id in session.info.pop(_DIRTY_KEY, ()):
+        tenant_registry.invalidate(school_id)
+
+
+for _event in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(School, _event, _on_school_change)
+
+
+__all__ = ['TenantEntry', 'TenantRegistry', 'tenant_registry', 'compile_features', 'normalize_host']
@@ -3,11 +3,17 @@ Unified Database Models for Multi-School Management System
 Using shared database with school_id tenant isolation for cost efficiency.
 """
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import Column, String, Integer, Boolean, DateTime, Date, Text, JSON, ForeignKey, Index, UniqueConstraint, Float
+from sqlalchemy import Column, String, Integer, BigInteger, Boolean, DateTime, Date, Text, JSON, LargeBinary, ForeignKey, Index, UniqueConstraint, Float, event, func, tuple_, select, literal, or_, true, inspect
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship, backref
+from sqlalchemy.orm import relationship, backref, aliased, object_session
+from sqlalchemy.orm.attributes import set_committed_value
+from collections import defaultdict
 from datetime import datetime, date
 from enum import Enum
+import base64
+import json
+import threading
 import uuid
 
 # Initialize SQLAlchemy
@@ -27,11 +33,8 @@ class BaseModel(db.Model):
     is_active = Column(Boolean, default=True, nullable=False)
     
     def to_dict(self):
-        """Convert model instance to dictionary."""
-        return {
-            column.name: getattr(self, column.name)
-            for column in self.__table__.columns
-        }
+        """Convert model instance to dictionary using its compiled serializer (see serializers.SPECS)."""
+        return type(self).__serializer__(self)
     
     def update(self, **kwargs):
         """Update model instance with provided kwargs."""
@@ -56,6 +59,78 @@ class TenantAwareModel(BaseModel):
     def get_by_id_and_school(cls, entity_id, school_id):
         """Get entity by ID and school."""
         return cls.query.filter_by(id=entity_id, school_id=school_id, is_active=True).first()
+    
+    @classmethod
+    def paginate_for_school(cls, school_id, order_by=('created_at',), cursor=None, limit=50,
+                            descending=False, include_total=False, query=None, **filters):
+        """Keyset-paginate a school's entities.
+        
+        ``order_by`` names non-null columns and should follow a composite index
+        after its equality columns, e.g. Attendance ordered by ('attendance_date',)
+        for idx_attendance_school_date, or PaymentNotification filtered by
+        status='pending' and ordered by ('created_at',) for idx_payment_school_status.
+        ``id`` is always appended as a tie-breaker. Pages seek past the previous
+        page's last key instead of using OFFSET, so every page costs the same.
+        
+        Returns {'items', 'next_cursor', 'has_more'}, plus 'total' (a COUNT
+        query) only when ``include_total`` is set.
+        """
+        columns = [getattr(cls, name) for name in order_by if name != 'id'] + [cls.id]
+        base = query if query is not None else cls.query_for_school(school_id)
+        if filters:
+            base = base.filter_by(**filters)
+        
+        page_query = base
+        if cursor:
+            values = _decode_cursor(cursor, columns)
+            key = tuple_(*columns)
+            page_query = page_query.filter(key < tuple_(*values) if descending else key > tuple_(*values))
+        ordering = [column.desc() if descending else column.asc() for column in columns]
+        rows = page_query.order_by(*ordering).limit(limit + 1).all()
+        
+        has_more = len(rows) > limit
+        items = rows[:limit]
+        page = {
+            'items': items,
+            'next_cursor': _encode_cursor(items[-1], columns) if has_more else None,
+            'has_more': has_more
+        }
+        if include_total:
+            page['total'] = base.order_by(None).count()
+        return page
+
+
+def _encode_cursor(obj, columns):
+    """Opaque cursor holding an object's ordering key."""
+    values = []
+    for column in columns:
+        value = getattr(obj, column.key)
+        values.append(value.isoformat() if isinstance(value, (datetime, date)) else
+                      str(value) if isinstance(value, uuid.UUID) else value)
+    payload = json.dumps([[column.key for column in columns], values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def _decode_cursor(cursor, columns):
+    """Ordering key from a cursor; ValueError if it is malformed or for another ordering."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        names, values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if names != [column.key for column in columns]:
+            raise ValueError('cursor ordering mismatch')
+        decoded = []
+        for column, value in zip(columns, values):
+            column_type = column.property.columns[0].type
+            if isinstance(column_type, DateTime):
+                value = datetime.fromisoformat(value)
+            elif isinstance(column_type, Date):
+                value = date.fromisoformat(value)
+            elif isinstance(column_type, UUID):
+                value = uuid.UUID(value)
+            decoded.append(value)
+        return decoded
+    except (TypeError, ValueError, AttributeError) as error:
+        raise ValueError('Invalid pagination cursor') from error
 
 
 # ============================================================================
@@ -103,6 +178,13 @@ class AttendanceStatus(Enum):
     ABSENT = "absent"
     LATE = "late"
     EXCUSED = "excused"
+
+
+class DeliveryStatus(Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
 # ============================================================================
 # CORE SYSTEM MODELS (Shared across all schools)
 # ============================================================================
@@ -157,54 +239,6 @@ class School(BaseModel):
     
     # Feature Flags
     features_enabled = Column(JSON, default=dict)
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'name': self.name,
-            'slug': self.slug,
-            'email': self.email,
-            'phone': self.phone,
-            'website': self.website,
-            'address': {
-                'line1': self.address_line1,
-                'line2': self.address_line2,
-                'city': self.city,
-                'state': self.state,
-                'postal_code': self.postal_code,
-                'country': self.country
-            },
-            'domain': {
-                'subdomain': self.subdomain,
-                'custom_domain': self.custom_domain,
-                'ssl_enabled': self.ssl_enabled
-            },
-            'status': self.status,
-            'settings': {
-                'timezone': self.timezone,
-                'currency': self.currency,
-                'language': self.language,
-                'academic_year_start': self.academic_year_start,
-                'academic_year_end': self.academic_year_end,
-                'current_academic_year': self.current_academic_year
-            },
-            'branding': {
-                'logo_url': self.logo_url,
-                'banner_url': self.banner_url,
-                'primary_color': self.primary_color,
-                'secondary_color': self.secondary_color,
-                'motto': self.school_motto
-            },
-            'features_enabled': self.features_enabled or {},
-            'admin': {
-                'user_id': str(self.admin_user_id) if self.admin_user_id else None,
-                'name': self.admin_name,
-                'email': self.admin_email,
-                'phone': self.admin_phone
-            },
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
 
 
 class User(BaseModel):
@@ -262,43 +296,18 @@ class User(BaseModel):
     
     def get_schools(self):
         """Get all schools this user belongs to."""
-        return [role.school_id for role in self.school_roles if role.is_active]
+        if 'school_roles' not in inspect(self).unloaded:
+            return [role.school_id for role in self.school_roles if role.is_active]
+        # Avoid loading every role object just for its school_id
+        return [
+            row.school_id for row in db.session.query(UserSchoolRole.school_id).filter(
+                UserSchoolRole.user_id == self.id,
+                UserSchoolRole.is_active == True
+            )
+        ]
     
     def to_dict(self, include_sensitive=False):
-        return {
-            'id': str(self.id),
-            'phoneNumber': self.phone_number,
-            'phone_number': self.phone_number if include_sensitive else None,
-            'email': self.email,
-            'first_name': self.first_name,
-            'last_name': self.last_name,
-            'middle_name': self.middle_name,
-            'full_name': self.full_name,
-            'profile': {
-                'firstName': self.first_name,
-                'lastName': self.last_name,
-                'email': self.email,
-                'avatar': self.profile_picture_url
-            },
-            'date_of_birth': self.date_of_birth.isoformat() if self.date_of_birth else None,
-            'gender': self.gender,
-            'profile_picture_url': self.profile_picture_url,
-            'address': {
-                'line1': self.address_line1,
-                'line2': self.address_line2,
-                'city': self.city,
-                'state': self.state,
-                'postal_code': self.postal_code,
-                'country': self.country
-            } if self.address_line1 else None,
-            'status': self.status,
-            'is_verified': self.is_verified,
-            'last_login_at': self.last_login_at.isoformat() if self.last_login_at else None,
-            'metadata': self.user_metadata or {},
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
-            'schools': []  # Placeholder for frontend compatibility
-        }
+        return type(self).__serializer__(self, include_sensitive=include_sensitive)
 
 
 class Role(BaseModel):
@@ -310,17 +319,8 @@ class Role(BaseModel):
     description = Column(Text, nullable=True)
     permissions = Column(JSON, default=list)
     is_system_role = Column(Boolean, default=False)
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'name': self.name,
-            'role_type': self.role_type,
-            'description': self.description,
-            'permissions': self.permissions or [],
-            'is_system_role': self.is_system_role,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+
+
 # ============================================================================
 # TENANT-AWARE MODELS (School-specific data)
 # ============================================================================
@@ -349,21 +349,6 @@ class UserSchoolRole(TenantAwareModel):
         UniqueConstraint('user_id', 'school_id', 'role_id', name='unique_user_school_role'),
         Index('idx_user_school_active', 'user_id', 'school_id', 'is_active'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'user_id': str(self.user_id),
-            'school_id': str(self.school_id),
-            'role_id': str(self.role_id),
-            'role': self.role.to_dict() if self.role else None,
-            'assigned_by': str(self.assigned_by) if self.assigned_by else None,
-            'assigned_at': self.assigned_at.isoformat() if self.assigned_at else None,
-            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
-            'is_primary': self.is_primary,
-            'role_data': self.role_data or {},
-            'is_active': self.is_active
-        }
 
 
 class Student(TenantAwareModel):
@@ -416,61 +401,90 @@ class Student(TenantAwareModel):
         return enrollments[0] if enrollments else None
     
     def to_dict(self, include_classes=False, academic_year=None, include_user=True):
-        result = {
-            'id': str(self.id),
-            'user_id': str(self.user_id),
-            'school_id': str(self.school_id),
-            'student_id': self.student_id,
-            'admission_number': self.admission_number,
-            'admission_date': self.admission_date.isoformat() if self.admission_date else None,
-            'graduation_date': self.graduation_date.isoformat() if self.graduation_date else None,
-            'academic_status': self.academic_status,
-            'current_grade_level': self.current_grade_level,
-            'previous_school': self.previous_school,
-            'has_special_needs': self.has_special_needs,
-            'special_needs_description': self.special_needs_description,
-            'transportation_method': self.transportation_method,
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+        return type(self).__serializer__(self, include_classes=include_classes, academic_year=academic_year, include_user=include_user)
+    
+    @classmethod
+    def to_dict_many(cls, students, include_classes=False, academic_year=None, include_user=True):
+        """Serialize a list of students with a fixed number of queries.
         
-        # Include user information if requested
-        if include_user and self.user:
-            result['user'] = {
-                'first_name': self.user.first_name,
-                'last_name': self.user.last_name,
-                'middle_name': self.user.middle_name,
-                'email': self.user.email,
-                'phone_number': self.user.phone_number,
-                'date_of_birth': self.user.date_of_birth.isoformat() if self.user.date_of_birth else None,
-                'gender': self.user.gender
-            }
-            # Also add direct access for backward compatibility
-            result['first_name'] = self.user.first_name
-            result['last_name'] = self.user.last_name
-            result['full_name'] = self.user.full_name
-            result['email'] = self.user.email
+        Same output as calling to_dict on each student, but users, enrollments,
+        classes and tracks are each fetched with a single query for the whole list.
+        """
+        from shared.models.serializers import serialize
+        students = list(students)
+        if not students:
+            return []
+        
+        # Enrollments embed the student's default to_dict, which includes the user
+        if include_user or include_classes:
+            preload_many_to_one(students, 'user')
         
-        # Include class information if requested
+        enrollments = defaultdict(list)
+        failed = False
         if include_classes:
             try:
-                enrollments = self.get_current_classes(academic_year)
-                result['class_enrollments'] = [enrollment.to_dict() for enrollment in enrollments]
-                
-                # For backward compatibility, include primary class info
-                primary_enrollment = enrollments[0] if enrollments else None
-                if primary_enrollment:
-                    result['class_id'] = str(primary_enrollment.class_id)
-                    result['primary_class'] = primary_enrollment.to_dict()
+                enrollments = cls._load_enrollments(students, academic_year)
+            except Exception:
+                failed = True
+        
+        results = []
+        for student in students:
+            result = serialize(student, include_user=include_user)
+            if include_classes:
+                if failed:
+                    result.update({'class_enrollments': [], 'class_id': None, 'primary_class': None})
                 else:
-                    result['class_id'] = None
-                    result['primary_class'] = None
-            except:
-                result['class_enrollments'] = []
-                result['class_id'] = None
-                result['primary_class'] = None
+                    rows = enrollments[(student.id, student.school_id)]
+                    class_enrollments = [serialize(enrollment) for enrollment in rows]
+                    result['class_enrollments'] = class_enrollments
+                    result['class_id'] = str(rows[0].class_id) if rows else None
+                    result['primary_class'] = class_enrollments[0] if rows else None
+            results.append(result)
+        return results
+    
+    @staticmethod
+    def _load_enrollments(students, academic_year=None):
+        """Fetch active enrollments for students grouped by (student_id, school_id)."""
+        from shared.models.unified_models import StudentClasses
+        by_id = {student.id: student for student in students}
+        query = StudentClasses.query.filter(
+            StudentClasses.student_id.in_(list(by_id)),
+            StudentClasses.school_id.in_({student.school_id for student in students}),
+            StudentClasses.is_active == True
+        )
+        if academic_year:
+            query = query.filter_by(academic_year=academic_year)
+        
+        grouped = defaultdict(list)
+        rows = query.all()
+        for enrollment in rows:
+            student = by_id[enrollment.student_id]
+            if enrollment.school_id != student.school_id:
+                continue
+            set_committed_value(enrollment, 'student', student)
+            grouped[(student.id, student.school_id)].append(enrollment)
         
-        return result
+        preload_many_to_one(rows, 'class_obj')
+        preload_many_to_one(rows, 'track')
+        return grouped
+    
+    def _class_fields(self, academic_year=None):
+        """Class enrollment keys added by to_dict(include_classes=True)."""
+        try:
+            enrollments = self.get_current_classes(academic_year)
+            fields = {'class_enrollments': [enrollment.to_dict() for enrollment in enrollments]}
+            
+            # For backward compatibility, include primary class info
+            primary_enrollment = enrollments[0] if enrollments else None
+            if primary_enrollment:
+                fields['class_id'] = str(primary_enrollment.class_id)
+                fields['primary_class'] = primary_enrollment.to_dict()
+            else:
+                fields['class_id'] = None
+                fields['primary_class'] = None
+            return fields
+        except:
+            return {'class_enrollments': [], 'class_id': None, 'primary_class': None}
 
 
 class Parent(TenantAwareModel):
@@ -497,24 +511,6 @@ class Parent(TenantAwareModel):
         UniqueConstraint('user_id', 'school_id', name='unique_parent_user_school'),
         Index('idx_parent_school_active', 'school_id', 'is_active'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'user_id': str(self.user_id),
-            'school_id': str(self.school_id),
-            'relationship_type': self.relationship_type,
-            'is_primary_contact': self.is_primary_contact,
-            'is_emergency_contact': self.is_emergency_contact,
-            'is_financially_responsible': self.is_financially_responsible,
-            'communication_preferences': {
-                'receive_academic_updates': self.receive_academic_updates,
-                'receive_financial_updates': self.receive_financial_updates,
-                'receive_disciplinary_updates': self.receive_disciplinary_updates
-            },
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
 
 
 class ParentStudent(TenantAwareModel):
@@ -587,46 +583,8 @@ class Staff(TenantAwareModel):
         Index('idx_staff_school_designation', 'school_id', 'designation', 'is_active'),
     )
     
-    def to_dict(self):
-        result = {
-            'id': str(self.id),
-            'user_id': str(self.user_id),
-            'school_id': str(self.school_id),
-            'staff_id': self.staff_id,
-            'employee_number': self.employee_number,
-            'designation': self.designation,
-            'hire_date': self.hire_date.isoformat() if self.hire_date else None,
-            'termination_date': self.termination_date.isoformat() if self.termination_date else None,
-            'employment_status': self.employment_status,
-            'employment_type': self.employment_type,
-            'highest_degree': self.highest_degree,
-            'certifications': self.certifications or [],
-            'subjects_taught': self.subjects_taught or [],
-            'grade_levels_taught': self.grade_levels_taught or [],
-            'department': self.department,
-            'track_id': None,  # TODO: Derive from department lookup
-            'is_subject_teacher': self.is_subject_teacher,
-            'is_class_teacher': self.is_class_teacher,
-            'class_teacher_for': str(self.class_teacher_for) if self.class_teacher_for else None,
-            'years_of_experience': self.years_of_experience,
-            'bank_name': self.bank_name,
-            'account_name': self.account_name,
-            'account_number': self.account_number,
-            'monthly_deduction': self.monthly_deduction,
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
-
-        # Include user information
-        if self.user:
-            result['first_name'] = self.user.first_name
-            result['last_name'] = self.user.last_name
-            result['middle_name'] = self.user.middle_name
-            result['full_name'] = self.user.full_name
-            result['email'] = self.user.email
-            result['phone_number'] = self.user.phone_number
-            
-        return result
+    def to_dict(self, include_user=True):
+        return type(self).__serializer__(self, include_user=include_user)
 
 # Keep Teacher as an alias for backward compatibility
 Teacher = Staff
@@ -643,16 +601,6 @@ class EducationTrack(TenantAwareModel):
         UniqueConstraint('name', 'school_id', name='unique_track_school'),
         Index('idx_track_school', 'school_id'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'name': self.name,
-            'description': self.description,
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
 
 
 class Department(TenantAwareModel):
@@ -670,17 +618,6 @@ class Department(TenantAwareModel):
         UniqueConstraint('name', 'school_id', 'track_id', name='unique_dept_school_track'),
         Index('idx_dept_school_track', 'school_id', 'track_id'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'name': self.name,
-            'track_id': str(self.track_id) if self.track_id else None,
-            'description': self.description,
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
 
 
 class Class(TenantAwareModel):
@@ -726,31 +663,6 @@ class Class(TenantAwareModel):
         Index('idx_class_school_grade', 'school_id', 'grade_level', 'academic_year'),
         Index('idx_class_school_dept', 'school_id', 'department_id'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'name': self.class_name,
-            'class_name': self.class_name,
-            'class_code': self.class_code,
-            'code': self.class_code,
-            'grade_level': self.grade_level,
-            'department_id': str(self.department_id) if self.department_id else None,
-            'track_id': str(self.track_id) if self.track_id else None,
-            'academic_year': self.academic_year,
-            'term': self.term,
-            'max_capacity': self.max_capacity,
-            'capacity': self.max_capacity,
-            'current_enrollment': self.current_enrollment,
-            'classroom_location': self.classroom_location,
-            'location': self.classroom_location,
-            'room_number': self.classroom_location,
-            'class_staff_id': str(self.class_staff_id) if self.class_staff_id else None,
-            'class_teacher_id': str(self.class_staff_id) if self.class_staff_id else None,  # Backward compatibility
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
 
 
 class Subject(TenantAwareModel):
@@ -777,23 +689,6 @@ class Subject(TenantAwareModel):
         Index('idx_subject_school_category', 'school_id', 'category'),
         Index('idx_subject_school_core', 'school_id', 'is_core'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'name': self.subject_name,
-            'subject_name': self.subject_name,
-            'subject_code': self.subject_code,
-            'code': self.subject_code,
-            'description': self.description,
-            'is_core': self.is_core,
-            'credit_hours': self.credit_hours,
-            'category': self.category,
-            'academic_year': self.academic_year,
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
 
 
 class ClassSubject(TenantAwareModel):
@@ -833,24 +728,6 @@ class ClassSubject(TenantAwareModel):
         Index('idx_class_subject_school', 'school_id', 'class_id', 'subject_id'),
         Index('idx_class_subject_staff', 'staff_id', 'school_id'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'class_id': str(self.class_id),
-            'subject_id': str(self.subject_id),
-            'staff_id': str(self.staff_id) if self.staff_id else None,
-            'teacher_id': str(self.staff_id) if self.staff_id else None,  # Backward compatibility
-            'assigned_by': str(self.assigned_by) if self.assigned_by else None,
-            'assigned_at': self.assigned_at.isoformat() if self.assigned_at else None,
-            'class': self.class_obj.to_dict() if self.class_obj else None,
-            'subject': self.subject.to_dict() if self.subject else None,
-            'staff': self.staff.to_dict() if self.staff else None,
-            'teacher': self.staff.to_dict() if self.staff else None,  # Backward compatibility
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
 
 
 class StudentClasses(TenantAwareModel):
@@ -884,25 +761,6 @@ class StudentClasses(TenantAwareModel):
         Index('idx_student_classes_class', 'class_id', 'is_active'),
         Index('idx_student_classes_year', 'academic_year', 'school_id'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'student_id': str(self.student_id),
-            'class_id': str(self.class_id),
-            'track_id': str(self.track_id),
-            'admission_number': self.admission_number,
-            'academic_year': self.academic_year,
-            'term': self.term,
-            'enrollment_date': self.enrollment_date.isoformat() if self.enrollment_date else None,
-            'student': self.student.to_dict() if self.student else None,
-            'class': self.class_obj.to_dict() if self.class_obj else None,
-            'track': self.track.to_dict() if self.track else None,
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
 
 
 # ============================================================================
@@ -947,22 +805,210 @@ class Attendance(TenantAwareModel):
         Index('idx_attendance_school_date', 'school_id', 'attendance_date'),
         Index('idx_attendance_class_date', 'class_id', 'attendance_date'),
     )
+
+
+ATTENDANCE_COUNT_COLUMNS = {
+    AttendanceStatus.PRESENT.value: 'present_count',
+    AttendanceStatus.ABSENT.value: 'absent_count',
+    AttendanceStatus.LATE.value: 'late_count',
+    AttendanceStatus.EXCUSED.value: 'excused_count',
+}
+
+
+class AttendanceSummary(TenantAwareModel):
+    """Per student, class and term attendance counts - tenant-aware.
     
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'student_id': str(self.student_id),
-            'class_id': str(self.class_id),
-            'staff_id': str(self.staff_id),
-            'teacher_id': str(self.staff_id),  # Backward compatibility
-            'attendance_date': self.attendance_date.isoformat() if self.attendance_date else None,
-            'status': self.status,
-            'arrival_time': self.arrival_time.isoformat() if self.arrival_time else None,
-            'departure_time': self.departure_time.isoformat() if self.departure_time else None,
-            'notes': self.notes,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    Maintained from Attendance writes; rebuild with
+    shared.models.attendance.rebuild_attendance_summaries.
+    """
+    __tablename__ = 'attendance_summaries'
+    
+    student_id = Column(UUID(as_uuid=True), ForeignKey('students.id'), nullable=False)
+    class_id = Column(UUID(as_uuid=True), ForeignKey('classes.id'), nullable=False)
+    term_id = Column(UUID(as_uuid=True), ForeignKey('school_calendar.id'), nullable=False)
+    
+    # Counts of active attendance rows by status
+    present_count = Column(Integer, nullable=False, default=0)
+    absent_count = Column(Integer, nullable=False, default=0)
+    late_count = Column(Integer, nullable=False, default=0)
+    excused_count = Column(Integer, nullable=False, default=0)
+    
+    # Relationships
+    student = relationship('Student')
+    class_obj = relationship('Class')
+    term = relationship('SchoolCalendar')
+    
+    __table_args__ = (
+        UniqueConstraint('school_id', 'term_id', 'class_id', 'student_id', name='uq_attendance_summary_term_student'),
+    )
+    
+    @property
+    def days_recorded(self):
+        return (self.present_count or 0) + (self.absent_count or 0) + (self.late_count or 0) + (self.excused_count or 0)
+    
+    @property
+    def attendance_rate(self):
+        """Percentage of recorded days the student attended (present or late)."""
+        days = self.days_recorded
+        if not days:
+            return None
+        return round(((self.present_count or 0) + (self.late_count or 0)) * 100.0 / days, 1)
+    
+    @staticmethod
+    def term_select(school_id, on_date, *columns):
+        """SELECT of ``columns`` from the school term containing ``on_date`` (latest start wins)."""
+        calendar = SchoolCalendar.__table__
+        return select(*(columns or (calendar.c.id,))).where(
+            calendar.c.school_id == school_id,
+            calendar.c.is_active == True,
+            calendar.c.term_start_date <= on_date,
+            or_(calendar.c.term_end_date.is_(None), calendar.c.term_end_date >= on_date)
+        ).order_by(calendar.c.term_start_date.desc()).limit(1)
+    
+    @classmethod
+    def delta_statement(cls, school_id, student_id, class_id, on_date, status, delta):
+        """Upsert adding ``delta`` to one status count; no-op when no term covers the date."""
+        count_column = ATTENDANCE_COUNT_COLUMNS.get(status)
+        if count_column is None:
+            return None
+        table = cls.__table__
+        calendar = SchoolCalendar.__table__
+        now = datetime.utcnow()
+        row = [
+            ('id', literal(uuid.uuid4(), UUID(as_uuid=True))),
+            ('school_id', calendar.c.school_id),
+            ('student_id', literal(student_id, UUID(as_uuid=True))),
+            ('class_id', literal(class_id, UUID(as_uuid=True))),
+            ('term_id', calendar.c.id),
+        ] + [
+            (name, literal(delta if name == count_column else 0, Integer))
+            for name in ATTENDANCE_COUNT_COLUMNS.values()
+        ] + [
+            ('created_at', literal(now, DateTime)),
+            ('updated_at', literal(now, DateTime)),
+            ('is_active', true()),
+        ]
+        statement = pg_insert(table).from_select(
+            [name for name, _ in row],
+            cls.term_select(school_id, on_date, *[value.label(name) for name, value in row])
+        )
+        return statement.on_conflict_do_update(
+            constraint='uq_attendance_summary_term_student',
+            set_={
+                count_column: table.c[count_column] + statement.excluded[count_column],
+                'updated_at': statement.excluded.updated_at
+            }
+        )
+
+
+class AttendanceBitmap(TenantAwareModel):
+    """Per student, class and term attendance bitsets - tenant-aware.
+    
+    Bit n of each status column is set when the student had that status on
+    the term's n-th school day (Mon-Fri, counted from term_start_date).
+    Maintained from Attendance writes; see shared.models.attendance.
+    """
+    __tablename__ = 'attendance_bitmaps'
+    
+    student_id = Column(UUID(as_uuid=True), ForeignKey('students.id'), nullable=False)
+    class_id = Column(UUID(as_uuid=True), ForeignKey('classes.id'), nullable=False)
+    term_id = Column(UUID(as_uuid=True), ForeignKey('school_calendar.id'), nullable=False)
+    
+    # Little-endian bitsets, one per status
+    present_bits = Column(LargeBinary, nullable=False, default=b'')
+    absent_bits = Column(LargeBinary, nullable=False, default=b'')
+    late_bits = Column(LargeBinary, nullable=False, default=b'')
+    excused_bits = Column(LargeBinary, nullable=False, default=b'')
+    
+    __table_args__ = (
+        UniqueConstraint('school_id', 'term_id', 'class_id', 'student_id', name='uq_attendance_bitmap_term_student'),
+    )
+    
+    @staticmethod
+    def pack(bits):
+        return bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    
+    @staticmethod
+    def unpack(data):
+        return int.from_bytes(data or b'', 'little')
+    
+    def bits(self, status):
+        """The bitset for one status as an int."""
+        return self.unpack(getattr(self, status + '_bits'))
+    
+    def day_counts(self):
+        return {status: bin(self.bits(status)).count('1') for status in ATTENDANCE_COUNT_COLUMNS}
+
+
+_ATTENDANCE_KEY = ('student_id', 'class_id', 'attendance_date', 'status', 'is_active')
+
+
+def _attendance_key(target, previous=False):
+    """The summary-relevant values of an Attendance row, before or after a flush."""
+    values = {}
+    state = inspect(target)
+    for name in _ATTENDANCE_KEY:
+        history = state.attrs[name].history
+        if previous and history.deleted:
+            values[name] = history.deleted[0]
+        else:
+            values[name] = getattr(target, name)
+    return values
+
+
+def _apply_attendance_delta(connection, school_id, values, delta):
+    if not values['is_active']:
+        return
+    statement = AttendanceSummary.delta_statement(
+        school_id, values['student_id'], values['class_id'],
+        values['attendance_date'], values['status'], delta
+    )
+    if statement is not None:
+        connection.execute(statement)
+
+
+def _keep_previous_value(target, value, oldvalue, initiator):
+    return value
+
+
+# active_history loads the old value when an expired attribute is set, so
+# after_update can still take the row out of its previous summary bucket
+for _name in _ATTENDANCE_KEY:
+    event.listen(getattr(Attendance, _name), 'set', _keep_previous_value, active_history=True, retval=True)
+
+
+def _refresh_attendance_bitmaps(connection, school_id, *keys):
+    from shared.models.attendance import refresh_attendance_bitmap
+    seen = set()
+    for values in keys:
+        scope = (values['student_id'], values['class_id'], values['attendance_date'])
+        if scope not in seen:
+            seen.add(scope)
+            refresh_attendance_bitmap(school_id, *scope, connection=connection)
+
+
+@event.listens_for(Attendance, 'after_insert')
+def _attendance_inserted(mapper, connection, target):
+    current = _attendance_key(target)
+    _apply_attendance_delta(connection, target.school_id, current, 1)
+    _refresh_attendance_bitmaps(connection, target.school_id, current)
+
+
+@event.listens_for(Attendance, 'after_update')
+def _attendance_updated(mapper, connection, target):
+    previous = _attendance_key(target, previous=True)
+    current = _attendance_key(target)
+    if previous != current:
+        _apply_attendance_delta(connection, target.school_id, previous, -1)
+        _apply_attendance_delta(connection, target.school_id, current, 1)
+        _refresh_attendance_bitmaps(connection, target.school_id, previous, current)
+
+
+@event.listens_for(Attendance, 'after_delete')
+def _attendance_deleted(mapper, connection, target):
+    previous = _attendance_key(target, previous=True)
+    _apply_attendance_delta(connection, target.school_id, previous, -1)
+    _refresh_attendance_bitmaps(connection, target.school_id, previous)
 
 
 class Exam(TenantAwareModel):
@@ -1007,26 +1053,6 @@ class Exam(TenantAwareModel):
         Index('idx_exam_school_class', 'school_id', 'class_id', 'exam_date'),
         Index('idx_exam_school_subject', 'school_id', 'subject', 'academic_year'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'exam_name': self.exam_name,
-            'subject': self.subject,
-            'class_id': str(self.class_id),
-            'staff_id': str(self.staff_id),
-            'teacher_id': str(self.staff_id),  # Backward compatibility
-            'exam_date': self.exam_date.isoformat() if self.exam_date else None,
-            'duration_minutes': self.duration_minutes,
-            'total_marks': self.total_marks,
-            'passing_marks': self.passing_marks,
-            'exam_type': self.exam_type,
-            'term': self.term,
-            'academic_year': self.academic_year,
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
 
 
 class ExamResult(TenantAwareModel):
@@ -1062,22 +1088,6 @@ class ExamResult(TenantAwareModel):
         Index('idx_result_school_exam', 'school_id', 'exam_id'),
         Index('idx_result_student_school', 'student_id', 'school_id'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'exam_id': str(self.exam_id),
-            'student_id': str(self.student_id),
-            'marks_obtained': self.marks_obtained,
-            'grade': self.grade,
-            'percentage': self.percentage,
-            'position': self.position,
-            'graded_by': str(self.graded_by),
-            'graded_at': self.graded_at.isoformat() if self.graded_at else None,
-            'remarks': self.remarks,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
 
 
 class StudentFeedback(TenantAwareModel):
@@ -1119,23 +1129,6 @@ class StudentFeedback(TenantAwareModel):
         Index('idx_feedback_school_student', 'school_id', 'student_id', 'feedback_date'),
         Index('idx_feedback_school_staff', 'school_id', 'staff_id', 'feedback_date'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'student_id': str(self.student_id),
-            'staff_id': str(self.staff_id),
-            'teacher_id': str(self.staff_id),  # Backward compatibility
-            'feedback_type': self.feedback_type,
-            'subject': self.subject,
-            'content': self.content,
-            'rating': self.rating,
-            'feedback_date': self.feedback_date.isoformat() if self.feedback_date else None,
-            'term': self.term,
-            'academic_year': self.academic_year,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
 
 
 # ============================================================================
@@ -1173,6 +1166,11 @@ class Assessment(TenantAwareModel):
     class_teacher_comment = Column(Text, nullable=True)
     head_teacher_comment = Column(Text, nullable=True)
     
+    # Overall results (written by the results engine)
+    total_score = Column(Float, nullable=True)  # Sum of subject totals
+    average_score = Column(Float, nullable=True)  # Average of subject totals
+    class_position = Column(Integer, nullable=True)  # Overall position in class
+    
     # Relationships
     student = relationship('Student', backref='assessments', foreign_keys=[student_id])
     scores = relationship('SubjectScore', back_populates='assessment', cascade='all, delete-orphan')
@@ -1185,32 +1183,6 @@ class Assessment(TenantAwareModel):
     
     def __repr__(self):
         return f"<Assessment {self.admission_number} - {self.session} {self.term}>"
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'admission_number': self.admission_number,
-            'student_id': str(self.student_id) if self.student_id else None,
-            'session': self.session,
-            'term': self.term,
-            'attendance': self.attendance,
-            'fluency': self.fluency,
-            'handwriting': self.handwriting,
-            'game': self.game,
-            'initiative': self.initiative,
-            'critical_thinking': self.critical_thinking,
-            'punctuality': self.punctuality,
-            'attentiveness': self.attentiveness,
-            'neatness': self.neatness,
-            'self_discipline': self.self_discipline,
-            'politeness': self.politeness,
-            'class_teacher_comment': self.class_teacher_comment,
-            'head_teacher_comment': self.head_teacher_comment,
-            'scores': [score.to_dict() for score in self.scores] if self.scores else [],
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
 
 
 class SubjectScore(TenantAwareModel):
@@ -1252,64 +1224,57 @@ class SubjectScore(TenantAwareModel):
     def __repr__(self):
         return f"<SubjectScore ClassSubject:{self.class_subject_id} Assessment:{self.assessment_id}>"
     
-    def calculate_total_and_grade(self):
-        """Calculate total score and assign grade."""
-        self.total_score = self.first_ca + self.second_ca + self.exam
-        
-        # Grade calculation (adjust thresholds as needed)
-        if self.total_score >= 90:
-            self.grade = 'A+'
-        elif self.total_score >= 80:
-            self.grade = 'A'
-        elif self.total_score >= 70:
-            self.grade = 'B+'
-        elif self.total_score >= 60:
-            self.grade = 'B'
-        elif self.total_score >= 50:
-            self.grade = 'C+'
-        elif self.total_score >= 40:
-            self.grade = 'C'
-        elif self.total_score >= 30:
-            self.grade = 'D'
-        else:
-            self.grade = 'F'
+    def calculate_total_and_grade(self, boundaries=None):
+        """Calculate total score and assign the grade from the school's GradingScheme."""
+        self.total_score = (self.first_ca or 0) + (self.second_ca or 0) + (self.exam or 0)
+        if boundaries is None:
+            boundaries = GradingScheme.boundaries_for_school(self.school_id)
+        self.grade = grade_for_total(self.total_score, boundaries)
+
+
+# Report card thresholds, used when a school has no grading scheme of its own
+DEFAULT_GRADE_BOUNDARIES = [
+    {'min_score': 90, 'grade': 'A+'},
+    {'min_score': 70, 'grade': 'A'},
+    {'min_score': 60, 'grade': 'B'},
+    {'min_score': 50, 'grade': 'C'},
+    {'min_score': 45, 'grade': 'D'},
+    {'min_score': 40, 'grade': 'E'},
+    {'min_score': 0, 'grade': 'F'},
+]
+
+
+def grade_for_total(total, boundaries):
+    """Grade of the highest boundary ``total`` reaches; below them all, the lowest grade."""
+    ordered = sorted(boundaries, key=lambda boundary: boundary['min_score'], reverse=True)
+    for boundary in ordered:
+        if total >= boundary['min_score']:
+            return boundary['grade']
+    return ordered[-1]['grade'] if ordered else None
+
+
+class GradingScheme(TenantAwareModel):
+    """Grade boundaries for a school - tenant-aware."""
+    __tablename__ = 'grading_schemes'
     
-    def to_dict(self):
-        # Calculate total score and grade on-the-fly
-        total = self.first_ca + self.second_ca + self.exam
-        
-        # Calculate grade based on total score
-        if total >= 90:
-            grade = 'A+'
-        elif total >= 70:
-            grade = 'A'
-        elif total >= 60:
-            grade = 'B'
-        elif total >= 50:
-            grade = 'C'
-        elif total >= 45:
-            grade = 'D'
-        elif total >= 40:
-            grade = 'E'
-        else:
-            grade = 'F'
-        
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'assessment_id': str(self.assessment_id),
-            'class_subject_id': str(self.class_subject_id),
-            'subject_id': str(self.subject_id) if self.subject_id else None,
-            'first_ca': self.first_ca,
-            'second_ca': self.second_ca,
-            'exam': self.exam,
-            'total_score': total,
-            'grade': grade,
-            'position': self.position,
-            'remarks': self.remarks,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
+    name = Column(String(100), nullable=False, default='Default')
+    
+    # Boundaries (JSON array of {"min_score": 70, "grade": "A"}; highest first)
+    boundaries = Column(JSON, default=list)
+    is_default = Column(Boolean, default=True)
+    
+    __table_args__ = (
+        UniqueConstraint('school_id', 'name', name='unique_grading_scheme_school'),
+        Index('idx_grading_scheme_school', 'school_id', 'is_default'),
+    )
+    
+    @classmethod
+    def boundaries_for_school(cls, school_id):
+        """Get the school's default grade boundaries, or DEFAULT_GRADE_BOUNDARIES."""
+        scheme = cls.query_for_school(school_id).filter_by(is_default=True).first()
+        if scheme and scheme.boundaries:
+            return scheme.boundaries
+        return DEFAULT_GRADE_BOUNDARIES
 
 
 # ============================================================================
@@ -1339,23 +1304,6 @@ class FeeStructure(TenantAwareModel):
         Index('idx_fee_school_year', 'school_id', 'academic_year'),
         Index('idx_fee_school_type', 'school_id', 'fee_type'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'fee_name': self.fee_name,
-            'fee_type': self.fee_type,
-            'amount': self.amount,
-            'grade_levels': self.grade_levels or [],
-            'is_mandatory': self.is_mandatory,
-            'is_recurring': self.is_recurring,
-            'due_date': self.due_date.isoformat() if self.due_date else None,
-            'academic_year': self.academic_year,
-            'term': self.term,
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
 
 
 class Invoice(TenantAwareModel):
@@ -1390,25 +1338,6 @@ class Invoice(TenantAwareModel):
         Index('idx_invoice_school_parent', 'school_id', 'parent_id'),
         Index('idx_invoice_school_status', 'school_id', 'status', 'due_date'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'student_id': str(self.student_id),
-            'parent_id': str(self.parent_id),
-            'invoice_number': self.invoice_number,
-            'total_amount': self.total_amount,
-            'amount_paid': self.amount_paid,
-            'balance_due': self.balance_due,
-            'issue_date': self.issue_date.isoformat() if self.issue_date else None,
-            'due_date': self.due_date.isoformat() if self.due_date else None,
-            'status': self.status,
-            'term': self.term,
-            'academic_year': self.academic_year,
-            'notes': self.notes,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
 
 
 class InvoiceItem(TenantAwareModel):
@@ -1433,6 +1362,22 @@ class InvoiceItem(TenantAwareModel):
     )
 
 
+class InvoiceNumberSequence(TenantAwareModel):
+    """Per-school invoice number counter - tenant-aware.
+    
+    Numbers are handed out in blocks (see shared.models.invoice_numbers);
+    next_value only ever moves forward, so numbers are never reused.
+    """
+    __tablename__ = 'invoice_number_sequences'
+    
+    prefix = Column(String(30), nullable=False, unique=True)
+    next_value = Column(Integer, nullable=False, default=1)
+    
+    __table_args__ = (
+        UniqueConstraint('school_id', name='unique_invoice_number_sequence_school'),
+    )
+
+
 class PaymentNotification(TenantAwareModel):
     """Payment notifications from parents - tenant-aware."""
     __tablename__ = 'payment_notifications'
@@ -1461,24 +1406,262 @@ class PaymentNotification(TenantAwareModel):
         Index('idx_payment_school_status', 'school_id', 'status', 'created_at'),
         Index('idx_payment_school_parent', 'school_id', 'parent_id'),
     )
+
+
+FINANCIAL_SUMMARY_COLUMNS = (
+    'invoice_count', 'total_amount', 'amount_paid', 'balance_due', 'paid_count',
+    'overdue_count', 'overdue_balance', 'pending_payments', 'pending_payment_amount',
+    'approved_payments', 'approved_payment_amount', 'rejected_payments'
+)
+
+
+class FinancialSummary(TenantAwareModel):
+    """Per school and term invoice and payment totals - tenant-aware.
     
-    def to_dict(self):
+    Maintained transactionally from Invoice and PaymentNotification writes;
+    cancelled and inactive rows are excluded. term is '' for invoices
+    without a term. Verify with shared.models.receivables.check_financial_summaries.
+    """
+    __tablename__ = 'financial_summaries'
+    
+    academic_year = Column(String(10), nullable=False)
+    term = Column(String(10), nullable=False, default='')
+    
+    # Invoices
+    invoice_count = Column(Integer, nullable=False, default=0)
+    total_amount = Column(Integer, nullable=False, default=0)
+    amount_paid = Column(Integer, nullable=False, default=0)
+    balance_due = Column(Integer, nullable=False, default=0)
+    paid_count = Column(Integer, nullable=False, default=0)
+    overdue_count = Column(Integer, nullable=False, default=0)
+    overdue_balance = Column(Integer, nullable=False, default=0)
+    
+    # Payment notifications
+    pending_payments = Column(Integer, nullable=False, default=0)
+    pending_payment_amount = Column(Integer, nullable=False, default=0)
+    approved_payments = Column(Integer, nullable=False, default=0)
+    approved_payment_amount = Column(Integer, nullable=False, default=0)
+    rejected_payments = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        UniqueConstraint('school_id', 'academic_year', 'term', name='uq_financial_summary_term'),
+    )
+    
+    @staticmethod
+    def invoice_contribution(status, total_amount, amount_paid, balance_due, is_active=True):
+        """Column deltas one invoice adds to its term's summary."""
+        if not is_active or status == InvoiceStatus.CANCELLED.value:
+            return {}
+        overdue = status == InvoiceStatus.OVERDUE.value
         return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'invoice_id': str(self.invoice_id),
-            'parent_id': str(self.parent_id),
-            'amount': self.amount,
-            'payment_method': self.payment_method,
-            'payment_reference': self.payment_reference,
-            'proof_of_payment_url': self.proof_of_payment_url,
-            'notes': self.notes,
-            'status': self.status,
-            'reviewed_by': str(self.reviewed_by) if self.reviewed_by else None,
-            'reviewed_at': self.reviewed_at.isoformat() if self.reviewed_at else None,
-            'review_notes': self.review_notes,
-            'created_at': self.created_at.isoformat() if self.created_at else None
+            'invoice_count': 1,
+            'total_amount': total_amount or 0,
+            'amount_paid': amount_paid or 0,
+            'balance_due': balance_due or 0,
+            'paid_count': 1 if status == InvoiceStatus.PAID.value else 0,
+            'overdue_count': 1 if overdue else 0,
+            'overdue_balance': (balance_due or 0) if overdue else 0
         }
+    
+    @staticmethod
+    def payment_contribution(status, amount, is_active=True):
+        """Column deltas one payment notification adds to its invoice's term summary."""
+        if not is_active:
+            return {}
+        if status == PaymentStatus.PENDING.value:
+            return {'pending_payments': 1, 'pending_payment_amount': amount or 0}
+        if status == PaymentStatus.APPROVED.value:
+            return {'approved_payments': 1, 'approved_payment_amount': amount or 0}
+        if status == PaymentStatus.REJECTED.value:
+            return {'rejected_payments': 1}
+        return {}
+    
+    @classmethod
+    def delta_statement(cls, school_id, academic_year, term, deltas):
+        """Upsert adding ``deltas`` to a term's counters."""
+        table = cls.__table__
+        now = datetime.utcnow()
+        values = dict.fromkeys(FINANCIAL_SUMMARY_COLUMNS, 0)
+        values.update(deltas)
+        values.update(
+            id=uuid.uuid4(), school_id=school_id, academic_year=academic_year, term=term or '',
+            created_at=now, updated_at=now, is_active=True
+        )
+        statement = pg_insert(table).values(**values)
+        update = {name: table.c[name] + statement.excluded[name] for name in deltas}
+        update['updated_at'] = statement.excluded.updated_at
+        return statement.on_conflict_do_update(constraint='uq_financial_summary_term', set_=update)
+
+
+RECEIVABLE_AGING_COLUMNS = ('open_count', 'open_balance')
+
+
+class ReceivableAging(TenantAwareModel):
+    """Open invoice count and balance per school and due date - tenant-aware.
+    
+    Maintained transactionally from Invoice writes like FinancialSummary.
+    Rows are keyed by due date rather than by bucket, so aging never goes
+    stale: shared.models.receivables.aging_summary groups these few rows
+    into buckets for any as_of date. Verify with
+    shared.models.receivables.check_receivable_aging.
+    """
+    __tablename__ = 'receivable_aging'
+    
+    due_date = Column(Date, nullable=False)
+    open_count = Column(Integer, nullable=False, default=0)
+    open_balance = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        UniqueConstraint('school_id', 'due_date', name='uq_receivable_aging_due_date'),
+    )
+    
+    OPEN_STATUSES = (InvoiceStatus.SENT.value, InvoiceStatus.OVERDUE.value)
+    
+    @classmethod
+    def invoice_contribution(cls, status, balance_due, is_active=True):
+        """Column deltas one invoice adds to its due date's row."""
+        if not is_active or status not in cls.OPEN_STATUSES or not balance_due or balance_due <= 0:
+            return {}
+        return {'open_count': 1, 'open_balance': balance_due}
+    
+    @classmethod
+    def delta_statement(cls, school_id, due_date, deltas):
+        """Upsert adding ``deltas`` to a due date's counters."""
+        table = cls.__table__
+        now = datetime.utcnow()
+        values = dict.fromkeys(RECEIVABLE_AGING_COLUMNS, 0)
+        values.update(deltas)
+        values.update(
+            id=uuid.uuid4(), school_id=school_id, due_date=due_date,
+            created_at=now, updated_at=now, is_active=True
+        )
+        statement = pg_insert(table).values(**values)
+        update = {name: table.c[name] + statement.excluded[name] for name in deltas}
+        update['updated_at'] = statement.excluded.updated_at
+        return statement.on_conflict_do_update(constraint='uq_receivable_aging_due_date', set_=update)
+
+
+def _previous_values(target, names):
+    """Attribute values before the current flush (current values when unchanged)."""
+    state = inspect(target)
+    values = {}
+    for name in names:
+        history = state.attrs[name].history
+        values[name] = history.deleted[0] if history.deleted else getattr(target, name)
+    return values
+
+
+def apply_financial_deltas(connection, school_id, changes):
+    """Apply (academic_year, term, contribution, sign) changes, merged per term."""
+    merged = {}
+    for academic_year, term, contribution, sign in changes:
+        deltas = merged.setdefault((academic_year, term or ''), {})
+        for name, value in contribution.items():
+            deltas[name] = deltas.get(name, 0) + sign * value
+    for (academic_year, term), deltas in merged.items():
+        deltas = {name: value for name, value in deltas.items() if value}
+        if deltas:
+            connection.execute(FinancialSummary.delta_statement(school_id, academic_year, term, deltas))
+
+
+def apply_aging_deltas(connection, school_id, changes):
+    """Apply (due_date, contribution, sign) changes to receivable_aging, merged per due date."""
+    merged = {}
+    for due_date, contribution, sign in changes:
+        deltas = merged.setdefault(due_date, {})
+        for name, value in contribution.items():
+            deltas[name] = deltas.get(name, 0) + sign * value
+    for due_date, deltas in merged.items():
+        deltas = {name: value for name, value in deltas.items() if value}
+        if deltas:
+            connection.execute(ReceivableAging.delta_statement(school_id, due_date, deltas))
+
+
+_INVOICE_SUMMARY_FIELDS = (
+    'academic_year', 'term', 'status', 'total_amount', 'amount_paid', 'balance_due', 'due_date', 'is_active'
+)
+_PAYMENT_SUMMARY_FIELDS = ('invoice_id', 'status', 'amount', 'is_active')
+
+
+def _invoice_change(values, sign):
+    contribution = FinancialSummary.invoice_contribution(
+        values['status'], values['total_amount'], values['amount_paid'], values['balance_due'], values['is_active']
+    )
+    return values['academic_year'], values['term'], contribution, sign
+
+
+def _aging_change(values, sign):
+    contribution = ReceivableAging.invoice_contribution(values['status'], values['balance_due'], values['is_active'])
+    return values['due_date'], contribution, sign
+
+
+def _payment_change(connection, values, sign):
+    invoices = Invoice.__table__
+    invoice = connection.execute(
+        select(invoices.c.academic_year, invoices.c.term).where(invoices.c.id == values['invoice_id'])
+    ).first()
+    if invoice is None:
+        return None
+    contribution = FinancialSummary.payment_contribution(values['status'], values['amount'], values['is_active'])
+    return invoice.academic_year, invoice.term, contribution, sign
+
+
+@event.listens_for(Invoice, 'after_insert')
+def _invoice_inserted(mapper, connection, target):
+    current = {name: getattr(target, name) for name in _INVOICE_SUMMARY_FIELDS}
+    apply_financial_deltas(connection, target.school_id, [_invoice_change(current, 1)])
+    apply_aging_deltas(connection, target.school_id, [_aging_change(current, 1)])
+
+
+@event.listens_for(Invoice, 'after_update')
+def _invoice_updated(mapper, connection, target):
+    previous = _previous_values(target, _INVOICE_SUMMARY_FIELDS)
+    current = {name: getattr(target, name) for name in _INVOICE_SUMMARY_FIELDS}
+    if previous != current:
+        apply_financial_deltas(connection, target.school_id, [
+            _invoice_change(previous, -1), _invoice_change(current, 1)
+        ])
+        apply_aging_deltas(connection, target.school_id, [
+            _aging_change(previous, -1), _aging_change(current, 1)
+        ])
+
+
+@event.listens_for(Invoice, 'after_delete')
+def _invoice_deleted(mapper, connection, target):
+    previous = _previous_values(target, _INVOICE_SUMMARY_FIELDS)
+    apply_financial_deltas(connection, target.school_id, [_invoice_change(previous, -1)])
+    apply_aging_deltas(connection, target.school_id, [_aging_change(previous, -1)])
+
+
+@event.listens_for(PaymentNotification, 'after_insert')
+def _payment_inserted(mapper, connection, target):
+    current = {name: getattr(target, name) for name in _PAYMENT_SUMMARY_FIELDS}
+    change = _payment_change(connection, current, 1)
+    if change:
+        apply_financial_deltas(connection, target.school_id, [change])
+
+
+@event.listens_for(PaymentNotification, 'after_update')
+def _payment_updated(mapper, connection, target):
+    previous = _previous_values(target, _PAYMENT_SUMMARY_FIELDS)
+    current = {name: getattr(target, name) for name in _PAYMENT_SUMMARY_FIELDS}
+    if previous != current:
+        changes = [_payment_change(connection, previous, -1), _payment_change(connection, current, 1)]
+        apply_financial_deltas(connection, target.school_id, [change for change in changes if change])
+
+
+@event.listens_for(PaymentNotification, 'after_delete')
+def _payment_deleted(mapper, connection, target):
+    change = _payment_change(connection, _previous_values(target, _PAYMENT_SUMMARY_FIELDS), -1)
+    if change:
+        apply_financial_deltas(connection, target.school_id, [change])
+
+
+for _model, _names in ((Invoice, _INVOICE_SUMMARY_FIELDS), (PaymentNotification, _PAYMENT_SUMMARY_FIELDS)):
+    for _name in _names:
+        event.listen(getattr(_model, _name), 'set', _keep_previous_value, active_history=True, retval=True)
+
+
 # ============================================================================
 # COMMUNICATION MODELS
 # ============================================================================
@@ -1501,18 +1684,6 @@ class MessageThread(TenantAwareModel):
     __table_args__ = (
         Index('idx_thread_school_type', 'school_id', 'thread_type', 'last_message_at'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'subject': self.subject,
-            'thread_type': self.thread_type,
-            'participants': self.participants or [],
-            'last_message_at': self.last_message_at.isoformat() if self.last_message_at else None,
-            'message_count': self.message_count,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
 
 
 class Message(TenantAwareModel):
@@ -1539,20 +1710,6 @@ class Message(TenantAwareModel):
         Index('idx_message_school_thread', 'school_id', 'thread_id', 'sent_at'),
         Index('idx_message_school_sender', 'school_id', 'sender_id', 'sent_at'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'thread_id': str(self.thread_id),
-            'sender_id': str(self.sender_id),
-            'content': self.content,
-            'message_type': self.message_type,
-            'attachments': self.attachments or [],
-            'sent_at': self.sent_at.isoformat() if self.sent_at else None,
-            'priority': self.priority,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
 
 
 class MessageRecipient(TenantAwareModel):
@@ -1576,6 +1733,75 @@ class MessageRecipient(TenantAwareModel):
     )
 
 
+class ThreadParticipant(TenantAwareModel):
+    """User -> thread index with the user's unread count - tenant-aware.
+
+    Mirrors MessageThread.participants (and announcement recipients) so a
+    user's inbox is one range scan of idx_participant_school_user_recent
+    instead of a JSON scan of every thread.
+    """
+    __tablename__ = 'thread_participants'
+    
+    thread_id = Column(UUID(as_uuid=True), ForeignKey('message_threads.id'), nullable=False)
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
+    
+    # Denormalized from the thread for ordering
+    last_message_at = Column(DateTime, nullable=False)
+    unread_count = Column(Integer, default=0)
+    last_read_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        UniqueConstraint('school_id', 'user_id', 'thread_id', name='unique_thread_participant'),
+        Index('idx_participant_school_user_recent', 'school_id', 'user_id', 'last_message_at'),
+    )
+
+
+class InboxCounter(TenantAwareModel):
+    """Per-user unread message total (sum of the user's ThreadParticipant.unread_count) - tenant-aware."""
+    __tablename__ = 'inbox_counters'
+    
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
+    unread_count = Column(Integer, default=0)
+    
+    __table_args__ = (
+        UniqueConstraint('school_id', 'user_id', name='unique_inbox_counter'),
+    )
+
+
+class MessageDelivery(TenantAwareModel):
+    """Background fan-out of one message to its recipients - tenant-aware.
+
+    The row id is the delivery job id handed back to the sender; progress
+    counters are committed after every chunk so any process can report them.
+    """
+    __tablename__ = 'message_deliveries'
+    
+    thread_id = Column(UUID(as_uuid=True), ForeignKey('message_threads.id'), nullable=False)
+    message_id = Column(UUID(as_uuid=True), ForeignKey('messages.id'), nullable=False)
+    audience = Column(String(50), nullable=False)  # parents, staff, all
+    
+    # Job state
+    status = Column(String(20), default=DeliveryStatus.QUEUED.value)
+    total_recipients = Column(Integer, default=0)
+    delivered_count = Column(Integer, default=0)
+    attempts = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index('idx_delivery_school_status', 'school_id', 'status', 'created_at'),
+    )
+    
+    @property
+    def progress(self):
+        if self.status == DeliveryStatus.COMPLETED.value:
+            return 1.0
+        if not self.total_recipients:
+            return 0.0
+        return min(1.0, (self.delivered_count or 0) / self.total_recipients)
+
+
 class Notification(TenantAwareModel):
     """System notifications - tenant-aware."""
     __tablename__ = 'notifications'
@@ -1595,19 +1821,32 @@ class Notification(TenantAwareModel):
     __table_args__ = (
         Index('idx_notification_school_type', 'school_id', 'notification_type', 'created_at'),
     )
+
+
+class NotificationFeed(TenantAwareModel):
+    """Per-user copy of a published notification - tenant-aware.
+
+    Written once at publish time with role targets already expanded, so a
+    user's feed is one range scan of idx_feed_school_user_recent; expires_at
+    is carried in the index so expired entries are skipped without a join.
+    """
+    __tablename__ = 'notification_feeds'
     
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'title': self.title,
-            'content': self.content,
-            'notification_type': self.notification_type,
-            'recipients': self.recipients or [],
-            'priority': self.priority,
-            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    user_id = Column(UUID(as_uuid=True), ForeignKey('users.id'), nullable=False)
+    notification_id = Column(UUID(as_uuid=True), ForeignKey('notifications.id'), nullable=False)
+    
+    # Denormalized from the notification for filtering
+    notification_type = Column(String(50), nullable=False)
+    expires_at = Column(DateTime, nullable=True)
+    
+    # Read status
+    is_read = Column(Boolean, default=False)
+    read_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        UniqueConstraint('school_id', 'user_id', 'notification_id', name='unique_notification_feed'),
+        Index('idx_feed_school_user_recent', 'school_id', 'user_id', 'created_at', 'expires_at'),
+    )
 
 
 # ============================================================================
@@ -1646,38 +1885,100 @@ class Examination(TenantAwareModel):
         Index('idx_exam_school_context', 'school_id', 'class_id', 'subject_id', 'term', 'session'),
     )
     
-    def to_dict(self):
-        # Get track and department names through class relationship
-        track_name = None
-        department_name = None
-        if self.class_obj:
-            if hasattr(self.class_obj, 'department') and self.class_obj.department:
-                department_name = self.class_obj.department.name
-                if hasattr(self.class_obj.department, 'track') and self.class_obj.department.track:
-                    track_name = self.class_obj.department.track.name
+    def _summary(self):
+        """Get (subject_name, class_name, track_name, department_name, question_count)."""
+        session = object_session(self)
+        tree = None
+        if session is not None and self.school_id:
+            from shared.models.academic_cache import academic_cache
+            tree = academic_cache.get(self.school_id)
         
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'title': self.title,
-            'exam_type': self.exam_type,
-            'subject_id': str(self.subject_id),
-            'subject_name': self.subject.subject_name if self.subject else None,
-            'class_id': str(self.class_id),
-            'class_name': self.class_obj.class_name if self.class_obj else None,
-            'track_name': track_name,
-            'department_name': department_name,
-            'term': self.term,
-            'session': self.session,
-            'created_by': str(self.created_by),
-            'is_published': self.is_published,
-            'start_time': self.start_time.isoformat() + 'Z' if self.start_time else None,
-            'end_time': self.end_time.isoformat() + 'Z' if self.end_time else None,
-            'duration_minutes': self.duration_minutes,
-            'total_marks': self.total_marks,
-            'question_count': len(self.questions),
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+        if tree is not None and self.class_id in tree.classes and self.subject_id in tree.subjects:
+            # Names from the cached academic hierarchy
+            subject_name = tree.subject_name(self.subject_id)
+            class_name = tree.class_name(self.class_id)
+            track_name, department_name = tree.class_path(self.class_id)
+        else:
+            # Get track and department names through class relationship
+            track_name = None
+            department_name = None
+            if self.class_obj:
+                if hasattr(self.class_obj, 'department') and self.class_obj.department:
+                    department_name = self.class_obj.department.name
+                    if hasattr(self.class_obj.department, 'track') and self.class_obj.department.track:
+                        track_name = self.class_obj.department.track.name
+            subject_name = self.subject.subject_name if self.subject else None
+            class_name = self.class_obj.class_name if self.class_obj else None
+        
+        # Count without loading every question unless they are already loaded
+        if 'questions' in self.__dict__ or session is None:
+            question_count = len(self.questions)
+        else:
+            question_count = session.query(func.count(Question.id)).filter(
+                Question.examination_id == self.id
+            ).scalar()
+        
+        return subject_name, class_name, track_name, department_name, question_count
+    
+    @classmethod
+    def listing_query(cls, school_id):
+        """Query exams with names and question aggregates for a school in a single statement.
+        
+        Rows are (examination, subject_name, class_name, track_name, department_name,
+        question_count, question_marks); pass row[1:6] to to_dict(summary=...).
+        """
+        question_stats = db.session.query(
+            Question.examination_id.label('examination_id'),
+            func.count(Question.id).label('question_count'),
+            func.sum(Question.marks).label('question_marks')
+        ).filter(
+            Question.school_id == school_id
+        ).group_by(Question.examination_id).subquery()
+        
+        track = aliased(EducationTrack)
+        return db.session.query(
+            cls,
+            Subject.subject_name,
+            Class.class_name,
+            track.name,
+            Department.name,
+            func.coalesce(question_stats.c.question_count, 0),
+            func.coalesce(question_stats.c.question_marks, 0)
+        ).outerjoin(
+            Subject, Subject.id == cls.subject_id
+        ).outerjoin(
+            Class, Class.id == cls.class_id
+        ).outerjoin(
+            Department, Department.id == Class.department_id
+        ).outerjoin(
+            track, track.id == Department.track_id
+        ).outerjoin(
+            question_stats, question_stats.c.examination_id == cls.id
+        ).filter(
+            cls.school_id == school_id,
+            cls.is_active == True
+        )
+    
+    @classmethod
+    def list_for_school(cls, school_id, **filters):
+        """Serialized exam listing for a school in one query, newest first.
+        
+        Each item matches to_dict() plus 'question_marks', the sum of question marks.
+        """
+        from shared.models.serializers import serialize
+        query = cls.listing_query(school_id).filter(
+            *[getattr(cls, key) == value for key, value in filters.items()]
+        ).order_by(cls.created_at.desc())
+        
+        results = []
+        for row in query.all():
+            result = serialize(row[0], summary=tuple(row[1:6]))
+            result['question_marks'] = float(row[6])
+            results.append(result)
+        return results
+    
+    def to_dict(self, summary=None):
+        return type(self).__serializer__(self, summary=summary)
 
 
 class Question(TenantAwareModel):
@@ -1705,26 +2006,6 @@ class Question(TenantAwareModel):
     __table_args__ = (
         Index('idx_question_exam', 'examination_id'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'examination_id': str(self.examination_id),
-            'instruction': self.instruction,
-            'question_text': self.question_text,
-            'question_image_url': self.question_image_url,
-            'options': {
-                'A': self.option_a,
-                'B': self.option_b,
-                'C': self.option_c,
-                'D': self.option_d,
-                'E': self.option_e
-            },
-            'correct_answer': self.correct_answer,
-            'marks': self.marks,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
 
 
 class ExaminationSubmission(TenantAwareModel):
@@ -1746,19 +2027,6 @@ class ExaminationSubmission(TenantAwareModel):
     __table_args__ = (
         Index('idx_submission_exam_student', 'examination_id', 'student_id'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'examination_id': str(self.examination_id),
-            'student_id': str(self.student_id),
-            'status': self.status,
-            'score': self.score,
-            'started_at': self.started_at.isoformat() if self.started_at else None,
-            'submitted_at': self.submitted_at.isoformat() if self.submitted_at else None,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
 
 
 # ============================================================================
@@ -1791,22 +2059,6 @@ class AcademicSession(TenantAwareModel):
         Index('idx_academic_sessions_year', 'session_year'),
         Index('idx_academic_sessions_current', 'is_current_session'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'session_name': self.session_name,
-            'session_year': self.session_year,
-            'start_date': self.start_date.isoformat() if self.start_date else None,
-            'end_date': self.end_date.isoformat() if self.end_date else None,
-            'is_current_session': self.is_current_session,
-            'status': self.status,
-            'notes': self.notes,
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
 
 
 class SchoolCalendar(TenantAwareModel):
@@ -1841,25 +2093,6 @@ class SchoolCalendar(TenantAwareModel):
         Index('idx_school_calendar_current_term', 'is_current_term'),
         Index('idx_school_calendar_dates', 'term_start_date', 'term_end_date'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'session_id': str(self.session_id) if self.session_id else None,
-            'academic_year': self.academic_year,
-            'term_number': self.term_number,
-            'term_name': self.term_name,
-            'term_start_date': self.term_start_date.isoformat() if self.term_start_date else None,
-            'term_end_date': self.term_end_date.isoformat() if self.term_end_date else None,
-            'holiday_start_date': self.holiday_start_date.isoformat() if self.holiday_start_date else None,
-            'holiday_end_date': self.holiday_end_date.isoformat() if self.holiday_end_date else None,
-            'is_current_term': self.is_current_term,
-            'notes': self.notes,
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'updated_at': self.updated_at.isoformat() if self.updated_at else None
-        }
 
 
 # ============================================================================
@@ -1889,18 +2122,6 @@ class UserSession(BaseModel):
     
     def is_expired(self):
         return datetime.utcnow() > self.expires_at
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'user_id': str(self.user_id),
-            'school_id': str(self.school_id) if self.school_id else None,
-            'role_id': str(self.role_id) if self.role_id else None,
-            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
-            'last_activity_at': self.last_activity_at.isoformat() if self.last_activity_at else None,
-            'is_expired': self.is_expired(),
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
 
 
 class ActivationCode(BaseModel):
@@ -1917,17 +2138,31 @@ class ActivationCode(BaseModel):
     
     def is_expired(self):
         return datetime.utcnow() > self.expires_at
+
+
+# ============================================================================
+# MAINTENANCE MODELS (Shared)
+# ============================================================================
+
+class RetentionCheckpoint(BaseModel):
+    """Progress of one retention policy - shared table.
+
+    ``last_key`` is the keyset position inside the current pass, so an
+    interrupted or time-boxed run resumes where it stopped.
+    """
+    __tablename__ = 'retention_checkpoints'
     
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'phone_number': self.phone_number,
-            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
-            'is_used': self.is_used,
-            'attempts': self.attempts,
-            'is_expired': self.is_expired(),
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    policy = Column(String(50), unique=True, nullable=False)
+    last_key = Column(String(64), nullable=True)
+    
+    # Totals across all runs
+    rows_removed = Column(BigInteger, default=0)
+    bytes_reclaimed = Column(BigInteger, default=0)
+    
+    # Run metadata
+    pass_started_at = Column(DateTime, nullable=True)
+    last_run_at = Column(DateTime, nullable=True)
+    last_completed_at = Column(DateTime, nullable=True)
 
 
 # ============================================================================
@@ -1949,20 +2184,6 @@ class SchoolTimetable(TenantAwareModel):
         Index('idx_school_timetable_day', 'school_id', 'day_of_week'),
         Index('idx_school_timetable_activity', 'school_id', 'activity_type'),
     )
-    
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'day_of_week': self.day_of_week,
-            'activity_type': self.activity_type,
-            'start_time': self.start_time,
-            'end_time': self.end_time,
-            'title': self.title,
-            'description': self.description,
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
 
 
 class ClassTimetable(TenantAwareModel):
@@ -1987,31 +2208,65 @@ class ClassTimetable(TenantAwareModel):
         Index('idx_class_timetable_teacher', 'school_id', 'teacher_id'),
     )
     
-    def to_dict(self):
-        return {
-            'id': str(self.id),
-            'school_id': str(self.school_id),
-            'class_id': str(self.class_id),
-            'subject_id': str(self.subject_id),
-            'teacher_id': str(self.teacher_id) if self.teacher_id else None,
-            'day_of_week': self.day_of_week,
-            'start_time': self.start_time,
-            'end_time': self.end_time,
-            'room_number': self.room_number,
-            'subject_name': self.subject.subject_name if self.subject else None,
-            'teacher_name': self.teacher.user.full_name if self.teacher and self.teacher.user else None,
-            'is_active': self.is_active,
-            'created_at': self.created_at.isoformat() if self.created_at else None
-        }
+    def _subject_name(self):
+        """Subject name from the cached academic hierarchy, falling back to the relationship."""
+        if object_session(self) is not None and self.school_id:
+            from shared.models.academic_cache import academic_cache
+            tree = academic_cache.get(self.school_id)
+            if self.subject_id in tree.subjects:
+                return tree.subject_name(self.subject_id)
+        return self.subject.subject_name if self.subject else None
+
+
+# ============================================================================
+# SERIALIZATION
+# ============================================================================
+
+@event.listens_for(BaseModel, 'mapper_configured', propagate=True)
+def _compile_model_serializer(mapper, cls):
+    """Attach specialized serializers to each model as its mapper is configured."""
+    from shared.models.serializers import compile_serializer
+    cls.__serializer__ = compile_serializer(cls)
+    cls.__projector__ = compile_serializer(cls, project=True)
 
 
 # ============================================================================
 # HELPER FUNCTIONS
 # ============================================================================
 
+def preload_many_to_one(objects, attr):
+    """Populate a many-to-one relationship for many objects with a single query.
+    
+    Objects that already have the relationship loaded are left alone. Returns
+    the loaded targets keyed by primary key.
+    """
+    pending = [obj for obj in objects if attr not in obj.__dict__]
+    if not pending:
+        return {}
+    
+    prop = type(pending[0]).__mapper__.relationships[attr]
+    column = next(iter(prop.local_columns))
+    key = prop.parent.get_property_by_column(column).key
+    target = prop.mapper.class_
+    
+    ids = {getattr(obj, key) for obj in pending} - {None}
+    loaded = {row.id: row for row in target.query.filter(target.id.in_(ids)).all()} if ids else {}
+    for obj in pending:
+        set_committed_value(obj, attr, loaded.get(getattr(obj, key)))
+    return loaded
+
+
 def init_database(app):
     """Initialize database with app context."""
     db.init_app(app)
+    
+    from shared.models import attendance, messaging, notifications, provisioning, receivables, retention
+    attendance.register_commands(app)
+    messaging.register_commands(app)
+    notifications.register_commands(app)
+    provisioning.register_commands(app)
+    receivables.register_commands(app)
+    retention.register_commands(app)
     return db
 
 
@@ -2021,8 +2276,108 @@ def create_all_tables(app):
         db.create_all()
 
 
+class TenantConnectionStats:
+    """Counters for tenant context binding on pooled connections."""
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.sets = 0
+        self.resets = 0
+        self.saved = 0
+    
+    def record(self, checkouts=0, sets=0, resets=0, saved=0):
+        with self._lock:
+            self.checkouts += checkouts
+            self.sets += sets
+            self.resets += resets
+            self.saved += saved
+    
+    def to_dict(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'sets': self.sets,
+                'resets': self.resets,
+                'saved': self.saved
+            }
+
+
+tenant_connection_stats = TenantConnectionStats()
+
+_TENANT_SETTING_SQL = "SELECT set_config('app.current_school_id', %s, false)"
+
+
+def _current_tenant():
+    """School id of the current request, or None outside a request."""
+    from flask import g, has_app_context
+    if has_app_context():
+        school_id = getattr(g, 'current_school_id', None)
+        return str(school_id) if school_id else None
+    return None
+
+
+def _apply_tenant(dbapi_connection, school_id):
+    """Set app.current_school_id outside any transaction so a later rollback keeps it."""
+    autocommit = getattr(dbapi_connection, 'autocommit', None)
+    if autocommit is not None:
+        dbapi_connection.autocommit = True
+    try:
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute(_TENANT_SETTING_SQL, (school_id or '',))
+        finally:
+            cursor.close()
+        if autocommit is None:
+            dbapi_connection.commit()
+    finally:
+        if autocommit is not None:
+            dbapi_connection.autocommit = autocommit
+
+
+def bind_tenant_connections(engine):
+    """Apply the request's tenant to PostgreSQL connections as they are checked out.
+    
+    The tenant last applied is remembered per DBAPI connection, so checkouts that
+    already carry the right tenant skip the round trip. A connection returned to
+    the pool keeps its setting only until its next checkout, which overwrites it,
+    or clears it when that checkout has no tenant, so no caller ever sees another
+    tenant's context.
+    """
+    if engine.dialect.name != 'postgresql':
+        return
+    
+    @event.listens_for(engine, 'checkout')
+    def _bind_tenant(dbapi_connection, connection_record, connection_proxy):
+        school_id = _current_tenant()
+        current = connection_record.info.get('tenant')
+        if school_id == current:
+            tenant_connection_stats.record(checkouts=1, saved=1 if school_id else 0)
+            return
+        
+        _apply_tenant(dbapi_connection, school_id)
+        connection_record.info['tenant'] = school_id
+        if school_id:
+            tenant_connection_stats.record(checkouts=1, sets=1)
+        else:
+            tenant_connection_stats.record(checkouts=1, resets=1)
+
+
 def setup_tenant_middleware(app):
-    """Setup tenant context middleware for automatic school_id filtering."""
+    """Setup tenant context middleware for automatic school_id filtering.
+    
+    Call this before registering other before_request hooks that query the
+    database, so the tenant is known when their connection is checked out.
+    """
+    
+    # Tenant context is applied lazily when a request first checks out a connection
+    with app.app_context():
+        bind_tenant_connections(db.engine)
+    
+    from shared.models.tenant_registry import tenant_registry
+    tenant_registry.ttl = app.config.get('TENANT_REGISTRY_TTL', tenant_registry.ttl)
+    if app.config.get('TENANT_BASE_DOMAIN'):
+        tenant_registry.base_domain = app.config['TENANT_BASE_DOMAIN'].lower()
     
     @app.before_request
     def set_tenant_context():
@@ -2039,22 +2394,20 @@ def setup_tenant_middleware(app):
         if not school_id and hasattr(g, 'current_user_session'):
             school_id = g.current_user_session.get('school_id')
         
-        # 3. Try domain resolution (for tenant service)
+        # 3. Try domain resolution (cached; no queries once the host is known)
         if not school_id:
             host = request.headers.get('Host', '')
-            # This would resolve school from domain
-            # school = resolve_school_from_domain(host)
-            # school_id = school.id if school else None
-        
-        # Set the tenant context
-        g.current_school_id = school_id
+            school_id = tenant_registry.resolve_host(host)
         
-        # Set PostgreSQL session variable for RLS
+        # Ignore malformed ids rather than passing them on to RLS
         if school_id:
             try:
-                db.session.execute(f"SET app.current_school_id = '{school_id}'")
-            except Exception:
-                pass  # Ignore if not using PostgreSQL RLS
+                school_id = uuid.UUID(str(school_id))
+            except ValueError:
+                school_id = None
+        
+        # Set the tenant context
+        g.current_school_id = school_id
 
 
 def setup_row_level_security():
@@ -2072,6 +2425,9 @@ def setup_row_level_security():
         "ALTER TABLE fee_structures ENABLE ROW LEVEL SECURITY;",
         "ALTER TABLE invoices ENABLE ROW LEVEL SECURITY;",
         "ALTER TABLE invoice_items ENABLE ROW LEVEL SECURITY;",
+        "ALTER TABLE invoice_number_sequences ENABLE ROW LEVEL SECURITY;",
+        "ALTER TABLE financial_summaries ENABLE ROW LEVEL SECURITY;",
+        "ALTER TABLE receivable_aging ENABLE ROW LEVEL SECURITY;",
         "ALTER TABLE payment_notifications ENABLE ROW LEVEL SECURITY;",
         "ALTER TABLE message_threads ENABLE ROW LEVEL SECURITY;",
         "ALTER TABLE messages ENABLE ROW LEVEL SECURITY;",
@@ -2079,6 +2435,13 @@ def setup_row_level_security():
         "ALTER TABLE notifications ENABLE ROW LEVEL SECURITY;",
         "ALTER TABLE user_school_roles ENABLE ROW LEVEL SECURITY;",
         "ALTER TABLE parent_student_relationships ENABLE ROW LEVEL SECURITY;",
+        "ALTER TABLE grading_schemes ENABLE ROW LEVEL SECURITY;",
+        "ALTER TABLE attendance_summaries ENABLE ROW LEVEL SECURITY;",
+        "ALTER TABLE attendance_bitmaps ENABLE ROW LEVEL SECURITY;",
+        "ALTER TABLE message_deliveries ENABLE ROW LEVEL SECURITY;",
+        "ALTER TABLE notification_feeds ENABLE ROW LEVEL SECURITY;",
+        "ALTER TABLE thread_participants ENABLE ROW LEVEL SECURITY;",
+        "ALTER TABLE inbox_counters ENABLE ROW LEVEL SECURITY;",
         
         # Create policies for automatic school_id filtering
         """CREATE POLICY tenant_isolation_students ON students
@@ -2125,6 +2488,18 @@ def setup_row_level_security():
            FOR ALL TO application_role
            USING (school_id = current_setting('app.current_school_id')::UUID);""",
            
+        """CREATE POLICY tenant_isolation_invoice_number_sequences ON invoice_number_sequences
+           FOR ALL TO application_role
+           USING (school_id = current_setting('app.current_school_id')::UUID);""",
+           
+        """CREATE POLICY tenant_isolation_financial_summaries ON financial_summaries
+           FOR ALL TO application_role
+           USING (school_id = current_setting('app.current_school_id')::UUID);""",
+           
+        """CREATE POLICY tenant_isolation_receivable_aging ON receivable_aging
+           FOR ALL TO application_role
+           USING (school_id = current_setting('app.current_school_id')::UUID);""",
+           
         """CREATE POLICY tenant_isolation_payment_notifications ON payment_notifications
            FOR ALL TO application_role
            USING (school_id = current_setting('app.current_school_id')::UUID);""",
@@ -2141,10 +2516,26 @@ def setup_row_level_security():
            FOR ALL TO application_role
            USING (school_id = current_setting('app.current_school_id')::UUID);""",
            
+        """CREATE POLICY tenant_isolation_thread_participants ON thread_participants
+           FOR ALL TO application_role
+           USING (school_id = current_setting('app.current_school_id')::UUID);""",
+           
+        """CREATE POLICY tenant_isolation_inbox_counters ON inbox_counters
+           FOR ALL TO application_role
+           USING (school_id = current_setting('app.current_school_id')::UUID);""",
+           
+        """CREATE POLICY tenant_isolation_message_deliveries ON message_deliveries
+           FOR ALL TO application_role
+           USING (school_id = current_setting('app.current_school_id')::UUID);""",
+           
         """CREATE POLICY tenant_isolation_notifications ON notifications
            FOR ALL TO application_role
            USING (school_id = current_setting('app.current_school_id')::UUID);""",
            
+        """CREATE POLICY tenant_isolation_notification_feeds ON notification_feeds
+           FOR ALL TO application_role
+           USING (school_id = current_setting('app.current_school_id')::UUID);""",
+           
         """CREATE POLICY tenant_isolation_user_school_roles ON user_school_roles
            FOR ALL TO application_role
            USING (school_id = current_setting('app.current_school_id')::UUID);""",
@@ -2152,6 +2543,18 @@ def setup_row_level_security():
         """CREATE POLICY tenant_isolation_parent_student_relationships ON parent_student_relationships
            FOR ALL TO application_role
            USING (school_id = current_setting('app.current_school_id')::UUID);""",
+           
+        """CREATE POLICY tenant_isolation_grading_schemes ON grading_schemes
+           FOR ALL TO application_role
+           USING (school_id = current_setting('app.current_school_id')::UUID);""",
+           
+        """CREATE POLICY tenant_isolation_attendance_summaries ON attendance_summaries
+           FOR ALL TO application_role
+           USING (school_id = current_setting('app.current_school_id')::UUID);""",
+           
+        """CREATE POLICY tenant_isolation_attendance_bitmaps ON attendance_bitmaps
+           FOR ALL TO application_role
+           USING (school_id = current_setting('app.current_school_id')::UUID);""",
     ]
     
     return policies
@@ -2163,12 +2566,15 @@ __all__ = [
     'School', 'User', 'Role', 'UserSchoolRole',
     'Student', 'Parent', 'ParentStudent', 'Staff', 'Teacher', 'Class',
     'EducationTrack', 'Department', 'Subject', 'ClassSubject', 'StudentClasses',
-    'Attendance', 'Exam', 'ExamResult', 'StudentFeedback',
-    'Assessment', 'SubjectScore',
-    'FeeStructure', 'Invoice', 'InvoiceItem', 'PaymentNotification',
-    'MessageThread', 'Message', 'MessageRecipient', 'Notification',
+    'Attendance', 'AttendanceSummary', 'AttendanceBitmap', 'ATTENDANCE_COUNT_COLUMNS', 'Exam', 'ExamResult', 'StudentFeedback',
+    'Assessment', 'SubjectScore', 'GradingScheme', 'DEFAULT_GRADE_BOUNDARIES', 'grade_for_total',
+    'FeeStructure', 'Invoice', 'InvoiceItem', 'InvoiceNumberSequence', 'PaymentNotification',
+    'FinancialSummary', 'FINANCIAL_SUMMARY_COLUMNS', 'apply_financial_deltas',
+    'ReceivableAging', 'RECEIVABLE_AGING_COLUMNS', 'apply_aging_deltas',
+    'MessageThread', 'Message', 'MessageRecipient', 'ThreadParticipant', 'InboxCounter', 'MessageDelivery', 'Notification', 'NotificationFeed',
     'AcademicSession', 'SchoolCalendar',
     'SchoolTimetable', 'ClassTimetable',
-    'UserSession', 'ActivationCode',
-    'init_database', 'create_all_tables', 'setup_tenant_middleware', 'setup_row_level_security'
+    'UserSession', 'ActivationCode', 'RetentionCheckpoint',
+    'preload_many_to_one', 'init_database', 'create_all_tables', 'setup_tenant_middleware', 'setup_row_level_security',
+    'bind_tenant_connections', 'tenant_connection_stats'
 ]
\ No newline at end of file